@@ -0,0 +1,148 @@
+'''
+Name:
+    Misorientation
+Description:
+    Analyses the orientations of grains: misorientation angles and axes
+    between pairs of grains, reduced by the crystal's symmetry to the
+    disorientation, the smallest rotation between them.
+
+    Orientations are rotation matrices taking crystal directions to the
+    sample frame, as in Polycrystal.orientations. For grains a and b the
+    misorientation is ga^T gb, and every product with a symmetry operator is
+    an equivalent rotation. As the trace of a rotation fixes its angle and
+    the trace is unchanged by cycling products, every pair is reduced with
+    one batched product over all pairs and operators.
+'''
+import numpy as np
+from scipy import linalg as sp_linalg
+from scipy import spatial
+from scipy.spatial.transform import Rotation as R
+import cartesian_edits as ce
+
+# Proper rotation groups of the Laue classes, by crystal system.
+POINT_GROUPS = {'cubic': 'O', 'hexagonal': 'D6', 'trigonal': 'D3',
+                'tetragonal': 'D4', 'orthorhombic': 'D2'}
+
+
+def point_group_operators(system='cubic'):
+    '''
+    Returns the rotation matrices of a crystal system's proper point group
+    as an array of shape (K, 3, 3), with the principal axis along z for
+    hexagonal, trigonal, and tetragonal crystals.
+    '''
+    if system == 'triclinic':
+        return np.identity(3)[None]
+    if system not in POINT_GROUPS:
+        raise ValueError(f"Unknown crystal system: '{system}'.")
+    operators = R.create_group(POINT_GROUPS[system]).as_matrix()
+    return np.around(operators, 12)
+
+
+def supercell_orientation(supercell):
+    '''
+    The rotation taking a supercell's unitcell to its current vector space,
+    the composition of every transforms.rotate applied, with any strain
+    removed by a polar decomposition.
+    '''
+    unitcell_space = np.array(supercell.unitcell.vector_space, dtype=float)
+    transform = np.array(supercell.vector_space) @ np.linalg.inv(
+        unitcell_space)
+    rotation = sp_linalg.polar(transform)[0]
+    if np.linalg.det(rotation) < 0:
+        raise ValueError("The supercell has been reflected, not rotated.")
+    return rotation
+
+
+def fit_orientation(coordinates, reference):
+    '''
+    Fits the rotation taking reference points onto matched coordinates, e.g.
+    neighbour vectors of a perfect crystal onto those of an atom in a grain,
+    by the Kabsch method. Both are centred on their means first.
+    '''
+    coordinates = np.asarray(coordinates, dtype=float)
+    reference = np.asarray(reference, dtype=float)
+    coordinates = coordinates - np.mean(coordinates, axis=0)
+    reference = reference - np.mean(reference, axis=0)
+    u, _, vt = np.linalg.svd(coordinates.T @ reference)
+    correction = np.diag([1, 1, np.sign(np.linalg.det(u @ vt))])
+    return u @ correction @ vt
+
+
+def rotation_angles(matrices):
+    '''
+    Rotation angles, in radians, of a stack of rotation matrices.
+    '''
+    traces = np.trace(matrices, axis1=-2, axis2=-1)
+    return np.arccos(np.clip((traces - 1)/2, -1, 1))
+
+
+def rotation_axes(matrices):
+    '''
+    Unit rotation axes of a stack of rotation matrices, [0, 0, 1] for
+    identities.
+    '''
+    vectors = R.from_matrix(matrices).as_rotvec()
+    lengths = np.linalg.norm(vectors, axis=1)
+    axes = vectors/np.maximum(lengths, 1e-12)[:, None]
+    axes[lengths < 1e-12] = [0, 0, 1]
+    return axes
+
+
+def disorientations(orientations, pairs=None, system='cubic',
+                    operators=None):
+    '''
+    Returns the disorientation angles, in radians, and axes, in the crystal
+    frame of the first grain of each pair, between pairs of grains. By
+    default every pair of grains is used. Cubic axes are reduced into the
+    standard triangle, u >= v >= w >= 0.
+
+    orientations: Rotation matrices of the grains, shape (N, 3, 3).
+    pairs: Grain index pairs, shape (P, 2).
+    system: Crystal system, see point_group_operators.
+    operators: Symmetry rotations, instead of those of the system.
+    '''
+    orientations = np.asarray(orientations, dtype=float)
+    if pairs is None:
+        pairs = np.array(np.triu_indices(orientations.shape[0], 1)).T
+    pairs = np.asarray(pairs).reshape(-1, 2)
+    if operators is None:
+        operators = point_group_operators(system)
+    misorientations = (orientations[pairs[:, 0]].transpose(0, 2, 1)
+                       @ orientations[pairs[:, 1]])
+    # trace(M S) for every pair and operator at once.
+    traces = np.einsum('pij,kji->pk', misorientations, operators)
+    best = np.argmax(traces, axis=1)
+    angles = np.arccos(np.clip(
+        (traces[np.arange(pairs.shape[0]), best] - 1)/2, -1, 1))
+    axes = rotation_axes(misorientations @ operators[best])
+    if system == 'cubic' and operators.shape[0] == 24:
+        axes = -np.sort(-np.abs(axes), axis=1)
+    return (angles, axes)
+
+
+def neighbouring_grains(coordinates, grain_ids, cutoff, box=None):
+    '''
+    Pairs of grains with atoms closer than the cutoff across their boundary,
+    as an array of shape (P, 2) with the smaller grain index first.
+    '''
+    coordinates = np.asarray(coordinates, dtype=float)
+    if box is not None:
+        box = np.array(box, dtype=float)
+        coordinates = ce.wrap(coordinates, box)
+    tree = spatial.cKDTree(coordinates, boxsize=box)
+    pairs = tree.query_pairs(cutoff, output_type='ndarray')
+    grains = grain_ids[pairs]
+    grains = grains[grains[:, 0] != grains[:, 1]]
+    return np.unique(np.sort(grains, axis=1), axis=0)
+
+
+def polycrystal_disorientations(polycrystal, cutoff, system='cubic'):
+    '''
+    Disorientation angles and axes between every pair of neighbouring grains
+    of a Polycrystal, and the pairs.
+    '''
+    pairs = neighbouring_grains(polycrystal.coordinates,
+                                polycrystal.grain_ids, cutoff,
+                                polycrystal.box)
+    angles, axes = disorientations(polycrystal.orientations, pairs, system)
+    return (pairs, angles, axes)
@@ -0,0 +1,140 @@
+'''
+Name:
+    Assembly
+Description:
+    Assembles built grains into larger structures without leaving the
+    package: grains embedded in a host supercell, or a core grain wrapped in a
+    shell of another crystal. Cavities are carved with each grain's own cut
+    set and overlapping atoms deleted with a spatial index, giving one merged
+    supercell that can be written as a single data file, instead of reading
+    separate files into LAMMPS and deleting overlaps there.
+'''
+import copy
+import numpy as np
+from scipy import spatial
+from supercell import SuperCell
+import cartesian_edits as ce
+import edits
+import grain_creation as gc
+import transforms
+
+
+def grain_cuts(grain):
+    '''
+    The cuts that shaped a built grain, scaled to the size it was built at.
+    '''
+    if grain.supercell is None:
+        raise ValueError(f"Grain '{grain.name}' has not been built.")
+    if grain.scale_factor is None:
+        raise ValueError(f"Grain '{grain.name}' has no scale factor, build "
+                         "it with build_grain or scale_grains.")
+    return gc.alter_cuts(grain.scale_factor, grain)
+
+
+def carve_mask(coordinates, grain, position):
+    '''
+    Returns a boolean array, True for the cartesian coordinates inside the
+    shape of a grain whose supercell origin sits at the given position.
+    '''
+    relative = coordinates - position
+    inverse = np.linalg.inv(grain.supercell.vector_space)
+    return edits.shape_mask(relative @ inverse.T, grain_cuts(grain), relative)
+
+
+def embed(host, grains, positions=None, overlap=None):
+    '''
+    Embeds one or more grains in a host supercell. Returns a new supercell,
+    in the host's vector space, holding the remaining host atoms followed by
+    the atoms of every grain, and an array labelling each atom 0 for the host
+    and i+1 for the atoms of grain i.
+
+    host: SuperCell the grains are embedded in.
+    grains: Grain or list of built Grains.
+    positions: Cartesian positions of the origin of each grain's supercell.
+        By default each grain is centred on the host.
+    overlap: Host atoms closer than this to a grain atom are deleted, as are
+        atoms of a grain closer than this to an earlier grain. None only
+        carves the cavities.
+    '''
+    if type(grains) != list:
+        grains = [grains]
+    if positions is None:
+        positions = [None]*len(grains)
+    if host.cartesian is None: host.set_cartesian()
+    host_coordinates = host.cartesian['coordinates']
+    host_centre = (np.min(host_coordinates, axis=0)
+                   + np.max(host_coordinates, axis=0))/2
+    index = ce.BinIndex(host_coordinates)
+    keep_host = np.ones(host_coordinates.shape[0], dtype=bool)
+    grain_atoms = []
+    for grain, position in zip(grains, positions):
+        if grain.supercell is None:
+            raise ValueError(f"Grain '{grain.name}' has not been built.")
+        supercell = grain.supercell
+        if supercell.cartesian is None: supercell.set_cartesian()
+        atoms = supercell.cartesian.copy()
+        if position is None:
+            coordinates = atoms['coordinates']
+            position = host_centre - (np.min(coordinates, axis=0)
+                                      + np.max(coordinates, axis=0))/2
+        position = np.array(position, dtype=float)
+        atoms['coordinates'] += position
+        # Pad by a unitcell, the cut shape can reach past the grain's atoms.
+        padding = np.max(np.linalg.norm(supercell.unitcell.vector_space,
+                                        axis=0))
+        if overlap is not None: padding += overlap
+        candidates = index.candidates(
+            np.min(atoms['coordinates'], axis=0) - padding,
+            np.max(atoms['coordinates'], axis=0) + padding)
+        candidates = candidates[keep_host[candidates]]
+        inside = carve_mask(host_coordinates[candidates], grain, position)
+        keep_host[candidates[inside]] = False
+        if overlap is not None:
+            remaining = candidates[np.invert(inside)]
+            keep_atoms, keep_remaining = ce.overlap_mask(
+                atoms['coordinates'], overlap, host_coordinates[remaining],
+                policy='a')
+            keep_host[remaining[np.invert(keep_remaining)]] = False
+        grain_atoms.append(atoms)
+    labels = [np.zeros(np.sum(keep_host), dtype=int)]
+    labels += [np.full(atoms.shape[0], number+1)
+               for number, atoms in enumerate(grain_atoms)]
+    labels = np.concatenate(labels)
+    atoms = np.concatenate([host.cartesian[keep_host]] + grain_atoms)
+    if overlap is not None and len(grains) > 1:
+        # Earlier grains win overlaps between grains, the host has none left.
+        keep = ce.overlap_mask(atoms['coordinates'], overlap, policy='first')
+        atoms, labels = atoms[keep], labels[keep]
+    assembled = copy.copy(host)
+    assembled.cartesian = atoms
+    assembled.set_fractional()
+    return (assembled, labels)
+
+
+def core_shell(core, shell_unitcell, thickness, overlap=None):
+    '''
+    Wraps a built core grain in a shell, made of the lattice of another
+    unitcell, of the given cartesian thickness. Returns a new supercell, in
+    the shell unitcell's vector space, and an array labelling each atom 0 for
+    the shell and 1 for the core. Overlap behaves as in embed.
+    '''
+    if core.supercell is None:
+        raise ValueError(f"Grain '{core.name}' has not been built.")
+    if core.supercell.cartesian is None: core.supercell.set_cartesian()
+    core_coordinates = core.supercell.cartesian['coordinates']
+    minimum = np.min(core_coordinates, axis=0) - thickness
+    maximum = np.max(core_coordinates, axis=0) + thickness
+    corners = np.indices((2, 2, 2)).reshape(3, -1).T
+    corners = np.where(corners, maximum, minimum)
+    corners = corners @ np.linalg.inv(shell_unitcell.vector_space).T
+    lower = np.floor(np.min(corners, axis=0))
+    repeats = (np.ceil(np.max(corners, axis=0)) - lower).astype(int)
+    shell = SuperCell(shell_unitcell, *repeats.tolist())
+    transforms.translate(shell, lower)
+    shell.set_cartesian()
+    tree = spatial.cKDTree(core_coordinates)
+    distances = tree.query(shell.cartesian['coordinates'],
+                           distance_upper_bound=thickness)[0]
+    shell.fractional = shell.fractional[distances <= thickness]
+    shell.set_cartesian()
+    return embed(shell, [core], [np.zeros(3)], overlap)
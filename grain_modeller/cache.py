@@ -0,0 +1,261 @@
+'''
+Name:
+    Cache
+Description:
+    Content addressed cache of built structures, so identical SuperCells and
+    grains, e.g. the trial grains of scale_grains, are built once across
+    scripts and runs. Keys hash the build inputs, unitcells, cuts, repeats,
+    and scale factors, together with the source of the package, so results
+    from older code are never reused.
+
+    Values are dictionaries of numpy arrays held in two tiers: an in-process
+    least recently used store with a byte budget, and, opted into by giving a
+    cache directory, .npz files trimmed to a size limit, oldest used first.
+    Arrays are copied in and out, so callers are free to edit what they are
+    given. The package cache is set up from the environment variables and
+    can be changed at runtime with configure, e.g.
+
+        cache.configure(directory=os.path.expanduser('~/.cache/grains'))
+
+    Environment variables:
+        GRAIN_MODELLER_NO_CACHE: Set to anything but 0 to turn caching off.
+        GRAIN_MODELLER_CACHE_DIR: Cache directory, turning the disk tier on.
+        GRAIN_MODELLER_CACHE_SIZE: Disk limit in bytes, by default 2 GB.
+'''
+import os
+import glob
+import hashlib
+import functools
+from collections import OrderedDict
+import numpy as np
+
+MEMORY_BYTES = 256*2**20
+DISK_BYTES = 2*2**30
+
+
+@functools.lru_cache(maxsize=None)
+def package_version():
+    '''
+    Hash of the package's modules, standing in for a version number.
+    '''
+    digest = hashlib.blake2b(digest_size=16)
+    directory = os.path.dirname(os.path.abspath(__file__))
+    for file_name in sorted(glob.glob(os.path.join(directory, '*.py'))):
+        with open(file_name, 'rb') as file:
+            digest.update(file.read())
+    return digest.hexdigest()
+
+
+def encode(digest, value):
+    '''
+    Feeds a canonical form of a build input into a hash: numbers, strings,
+    arrays, sequences, dictionaries, and objects by their attributes, e.g.
+    UnitCells, Atoms, and Cuts.
+    '''
+    if value is None or isinstance(value, (bool, int, float, str, np.generic)):
+        digest.update(f"{type(value).__name__}:{value!r};".encode())
+    elif isinstance(value, np.ndarray):
+        digest.update(f"array:{value.dtype.str}:{value.shape};".encode())
+        digest.update(np.ascontiguousarray(value).tobytes())
+    elif isinstance(value, (list, tuple)):
+        digest.update(f"list:{len(value)};".encode())
+        for item in value:
+            encode(digest, item)
+    elif isinstance(value, dict):
+        digest.update(f"dict:{len(value)};".encode())
+        for key in sorted(value, key=str):
+            encode(digest, str(key))
+            encode(digest, value[key])
+    elif hasattr(value, '__dict__'):
+        digest.update(f"object:{type(value).__name__};".encode())
+        encode(digest, vars(value))
+    else:
+        raise TypeError(f"Cannot hash a build input of type "
+                        f"'{type(value).__name__}'.")
+
+
+def build_key(kind, *inputs):
+    '''
+    Key of a build: a hash of its kind, e.g. 'grain', its inputs, and the
+    package version.
+    '''
+    digest = hashlib.blake2b(digest_size=20)
+    encode(digest, [kind, package_version(), list(inputs)])
+    return f"{kind}-{digest.hexdigest()}"
+
+
+def copy_arrays(arrays):
+    return {name: np.array(array) for name, array in arrays.items()}
+
+
+def size_of(arrays):
+    return sum(array.nbytes for array in arrays.values())
+
+
+class Cache():
+
+    def __init__(self, directory=None, memory_bytes=MEMORY_BYTES,
+                 disk_bytes=None, enabled=None):
+        '''
+        Instantiate a two tier cache. Unset arguments come from the
+        environment variables, see the module description. Without a
+        directory, or with a directory of False, the cache is kept in memory
+        only.
+        '''
+        if enabled is None:
+            enabled = os.environ.get('GRAIN_MODELLER_NO_CACHE', '0') in [
+                '', '0']
+        if directory is None:
+            directory = os.environ.get('GRAIN_MODELLER_CACHE_DIR', False)
+        if disk_bytes is None:
+            disk_bytes = int(os.environ.get('GRAIN_MODELLER_CACHE_SIZE',
+                                            DISK_BYTES))
+        self.enabled = enabled
+        self.directory = directory
+        self.memory_bytes = memory_bytes
+        self.disk_bytes = disk_bytes
+        self.memory = OrderedDict()
+        self.memory_used = 0
+
+    def __repr__(self):
+        return (f"Cache('{self.directory}', {self.memory_bytes}, "
+                f"{self.disk_bytes}, {self.enabled})")
+
+    def path(self, key):
+        return os.path.join(self.directory, key + '.npz')
+
+    def load(self, key, disk=True):
+        '''
+        Returns copies of the arrays stored under a key, or None if they are
+        in neither tier. Arrays found on disk are kept in memory too.
+        '''
+        if not self.enabled:
+            return None
+        if key in self.memory:
+            self.memory.move_to_end(key)
+            return copy_arrays(self.memory[key])
+        if not disk or not self.directory:
+            return None
+        path = self.path(key)
+        try:
+            with np.load(path, allow_pickle=False) as stored:
+                arrays = {name: stored[name] for name in stored.files}
+            os.utime(path)
+        except (OSError, ValueError):
+            return None
+        self.remember(key, arrays)
+        return copy_arrays(arrays)
+
+    def store(self, key, arrays, disk=True):
+        '''
+        Stores copies of a dictionary of arrays under a key, in memory and,
+        unless disk is False, in the cache directory.
+        '''
+        if not self.enabled:
+            return
+        arrays = copy_arrays(arrays)
+        self.remember(key, arrays)
+        if not disk or not self.directory:
+            return
+        os.makedirs(self.directory, exist_ok=True)
+        temporary = self.path(key) + f'.{os.getpid()}.tmp'
+        try:
+            with open(temporary, 'wb') as file:
+                np.savez(file, **arrays)
+            os.replace(temporary, self.path(key))
+        except OSError:
+            if os.path.exists(temporary): os.remove(temporary)
+            return
+        self.trim_disk()
+
+    def remember(self, key, arrays):
+        '''
+        Adds arrays to the memory tier, evicting the least recently used
+        entries to stay within its byte budget.
+        '''
+        size = size_of(arrays)
+        if size > self.memory_bytes:
+            return
+        if key in self.memory:
+            self.memory_used -= size_of(self.memory.pop(key))
+        self.memory[key] = arrays
+        self.memory_used += size
+        self.evict()
+
+    def evict(self):
+        '''
+        Evicts the least recently used entries until the memory tier is
+        within its byte budget.
+        '''
+        while self.memory_used > self.memory_bytes:
+            _, evicted = self.memory.popitem(last=False)
+            self.memory_used -= size_of(evicted)
+
+    def trim_disk(self):
+        '''
+        Deletes the least recently used files until the cache directory is
+        within its size limit.
+        '''
+        files = []
+        for path in glob.glob(os.path.join(self.directory, '*.npz')):
+            try:
+                status = os.stat(path)
+            except OSError:
+                continue
+            files.append((status.st_mtime, status.st_size, path))
+        used = sum(size for _, size, _ in files)
+        for _, size, path in sorted(files):
+            if used <= self.disk_bytes:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            used -= size
+
+    def clear(self, disk=True):
+        '''
+        Empties the memory tier and, unless disk is False, the cache files.
+        '''
+        self.memory.clear()
+        self.memory_used = 0
+        if disk and self.directory:
+            for path in glob.glob(os.path.join(self.directory, '*.npz')):
+                os.remove(path)
+
+
+CACHE = Cache()
+
+
+def configure(enabled=None, directory=None, memory_bytes=None,
+              disk_bytes=None):
+    '''
+    Changes the package cache at runtime, leaving unset arguments as they
+    are. A directory turns the disk tier on, False turns it off.
+    '''
+    if enabled is not None:
+        CACHE.enabled = enabled
+    if directory is not None:
+        CACHE.directory = directory
+    if memory_bytes is not None:
+        CACHE.memory_bytes = memory_bytes
+        CACHE.evict()
+    if disk_bytes is not None:
+        CACHE.disk_bytes = disk_bytes
+        if CACHE.directory and os.path.isdir(CACHE.directory):
+            CACHE.trim_disk()
+    return CACHE
+
+
+def load(key, disk=True):
+    '''
+    Looks a key up in the package cache, see Cache.load.
+    '''
+    return CACHE.load(key, disk)
+
+
+def store(key, arrays, disk=True):
+    '''
+    Stores arrays in the package cache, see Cache.store.
+    '''
+    CACHE.store(key, arrays, disk)
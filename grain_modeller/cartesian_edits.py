@@ -4,10 +4,26 @@ Name:
 Description:
     Editing functions for atoms outside of supercell. These are required when
     reading in and manipulating data not created within the program.
+
+    Regions (boxes, spheres, cylinders, half-spaces and prisms) can be
+    combined with |, & and - into unions, intersections and differences. A
+    BinIndex sorts a set of points into uniform cells once, so selecting many
+    regions from the same points only tests the points in cells overlapping
+    each region's bounding box.
+
+    Overlapping (near-coincident) points are found with chunked KD-tree
+    queries and resolved by a priority policy, replacing LAMMPS
+    delete_atoms overlap for models built in the package.
 '''
 
+import abc
 import numpy as np
 import warnings
+from dataclasses import dataclass
+from scipy import spatial
+
+# Number of points sent to a KD-tree query at once, bounds peak memory use.
+CHUNK_SIZE = 1000000
 
 
 def box_select(points, box, out=False):
@@ -37,3 +53,672 @@ def box_select(points, box, out=False):
     if out:
         selected = np.invert(selected)
     return selected
+
+
+class Region(abc.ABC):
+    '''
+    Base for all regions. A region can say which points it contains, and
+    gives an axis aligned bounding box used by the BinIndex to narrow down
+    the points tested. Combine regions with | (union), & (intersection), and
+    - (difference).
+    '''
+
+    @abc.abstractmethod
+    def contains(self, points):
+        '''
+        Returns a boolean array, True for the points inside the region.
+        '''
+
+    def bounds(self):
+        '''
+        Returns the minimum and maximum corners of a box enclosing the region,
+        unbounded directions are infinite.
+        '''
+        return (np.full(3, -np.inf), np.full(3, np.inf))
+
+    def __or__(self, other):
+        return Union([self, other])
+
+    def __and__(self, other):
+        return Intersection([self, other])
+
+    def __sub__(self, other):
+        return Difference(self, other)
+
+
+@dataclass(eq=False)
+class Box(Region):
+    '''
+    Axis aligned box given by its minimum and maximum corners. As with
+    box_select, points must be strictly inside the box to be contained.
+    '''
+    minimum: np.ndarray
+    maximum: np.ndarray
+
+    def __post_init__(self):
+        self.minimum = np.array(self.minimum, dtype=float)
+        self.maximum = np.array(self.maximum, dtype=float)
+
+    def contains(self, points):
+        return np.all((points > self.minimum) & (points < self.maximum),
+                      axis=1)
+
+    def bounds(self):
+        return (self.minimum, self.maximum)
+
+
+@dataclass(eq=False)
+class Sphere(Region):
+    '''
+    Sphere given by its centre and radius, points on the surface are inside.
+    '''
+    centre: np.ndarray
+    radius: float
+
+    def __post_init__(self):
+        self.centre = np.array(self.centre, dtype=float)
+
+    def contains(self, points):
+        distances = np.sum((points-self.centre)**2, axis=1)
+        return distances <= self.radius**2
+
+    def bounds(self):
+        return (self.centre-self.radius, self.centre+self.radius)
+
+
+@dataclass(eq=False)
+class Cylinder(Region):
+    '''
+    Cylinder around an axis running from a point in the axis direction. With
+    a length the cylinder is capped at the point and at point+length*axis,
+    without one it is infinite in both directions. The axis is normalised.
+    '''
+    point: np.ndarray
+    axis: np.ndarray
+    radius: float
+    length: float = None
+
+    def __post_init__(self):
+        self.point = np.array(self.point, dtype=float)
+        self.axis = np.array(self.axis, dtype=float)
+        self.axis = self.axis/np.linalg.norm(self.axis)
+
+    def contains(self, points):
+        relative = points-self.point
+        heights = relative @ self.axis
+        radial = relative - heights[:, None]*self.axis
+        inside = np.sum(radial**2, axis=1) <= self.radius**2
+        if self.length is not None:
+            inside &= (heights >= 0) & (heights <= self.length)
+        return inside
+
+    def bounds(self):
+        if self.length is None:
+            return Region.bounds(self)
+        end = self.point + self.length*self.axis
+        extent = self.radius*np.sqrt(np.clip(1-self.axis**2, 0, 1))
+        return (np.minimum(self.point, end)-extent,
+                np.maximum(self.point, end)+extent)
+
+
+@dataclass(eq=False)
+class HalfSpace(Region):
+    '''
+    Every point on the negative side of a plane, given by a point and a
+    normal; the same side a Cut keeps. Points in the plane are inside.
+    '''
+    point: np.ndarray
+    normal: np.ndarray
+
+    def __post_init__(self):
+        self.point = np.array(self.point, dtype=float)
+        self.normal = np.array(self.normal, dtype=float)
+
+    def contains(self, points):
+        return (points-self.point) @ self.normal <= 0
+
+    def bounds(self):
+        minimum, maximum = Region.bounds(self)
+        # Only a plane normal to a cartesian axis bounds the half-space.
+        axes = np.flatnonzero(self.normal)
+        if axes.shape[0] == 1:
+            axis = axes[0]
+            if self.normal[axis] > 0:
+                maximum[axis] = self.point[axis]
+            else:
+                minimum[axis] = self.point[axis]
+        return (minimum, maximum)
+
+
+@dataclass(eq=False)
+class Prism(Region):
+    '''
+    Polygon extruded along a cartesian axis. Vertices are the polygon
+    corners, in order, in the plane of the two remaining axes (for axis=2
+    that is x, y). The prism runs from minimum to maximum along the axis.
+    Wedges can be made with three vertices.
+    '''
+    vertices: np.ndarray
+    minimum: float
+    maximum: float
+    axis: int = 2
+
+    def __post_init__(self):
+        self.vertices = np.array(self.vertices, dtype=float)
+        if self.vertices.ndim != 2 or self.vertices.shape[1] != 2:
+            raise ValueError(
+                f"Prism vertices have shape {self.vertices.shape}, the "
+                "required shape is (M, 2).")
+
+    def contains(self, points):
+        plane_axes = [axis for axis in range(3) if axis != self.axis]
+        x = points[:, plane_axes[0]]
+        y = points[:, plane_axes[1]]
+        heights = points[:, self.axis]
+        inside = np.zeros(points.shape[0], dtype=bool)
+        start = self.vertices
+        end = np.roll(self.vertices, -1, axis=0)
+        # Crossing number test, one vectorised pass per polygon edge.
+        for (x1, y1), (x2, y2) in zip(start, end):
+            crosses = (y1 > y) != (y2 > y)
+            with np.errstate(divide='ignore', invalid='ignore'):
+                x_cross = x1 + (y-y1)*(x2-x1)/(y2-y1)
+            inside ^= crosses & (x < x_cross)
+        return inside & (heights >= self.minimum) & (heights <= self.maximum)
+
+    def bounds(self):
+        plane_axes = [axis for axis in range(3) if axis != self.axis]
+        minimum = np.zeros(3)
+        maximum = np.zeros(3)
+        minimum[plane_axes] = np.min(self.vertices, axis=0)
+        maximum[plane_axes] = np.max(self.vertices, axis=0)
+        minimum[self.axis] = self.minimum
+        maximum[self.axis] = self.maximum
+        return (minimum, maximum)
+
+
+@dataclass(eq=False)
+class Union(Region):
+    '''
+    Points inside any of the given regions.
+    '''
+    regions: list
+
+    def contains(self, points):
+        inside = np.zeros(points.shape[0], dtype=bool)
+        for region in self.regions:
+            inside |= region.contains(points)
+        return inside
+
+    def bounds(self):
+        bounds = [region.bounds() for region in self.regions]
+        return (np.min([bound[0] for bound in bounds], axis=0),
+                np.max([bound[1] for bound in bounds], axis=0))
+
+
+@dataclass(eq=False)
+class Intersection(Region):
+    '''
+    Points inside all of the given regions.
+    '''
+    regions: list
+
+    def contains(self, points):
+        inside = np.ones(points.shape[0], dtype=bool)
+        for region in self.regions:
+            inside &= region.contains(points)
+        return inside
+
+    def bounds(self):
+        bounds = [region.bounds() for region in self.regions]
+        return (np.max([bound[0] for bound in bounds], axis=0),
+                np.min([bound[1] for bound in bounds], axis=0))
+
+
+@dataclass(eq=False)
+class Difference(Region):
+    '''
+    Points inside the region but not inside the removed region.
+    '''
+    region: Region
+    removed: Region
+
+    def contains(self, points):
+        return (self.region.contains(points)
+                & np.invert(self.removed.contains(points)))
+
+    def bounds(self):
+        return self.region.bounds()
+
+
+class BinIndex():
+
+    def __init__(self, points, bin_size=None):
+        '''
+        Sorts points into a uniform grid of cubic bins. Build one index per
+        structure and use it for every selection from that structure. The
+        default bin size gives around eight points per bin.
+
+        points: Numpy array of point coordinates in 3D.
+        bin_size: Side length of each bin.
+        '''
+        self.points = np.asarray(points, dtype=float).reshape(-1, 3)
+        if self.points.shape[0] == 0:
+            self.minimum = self.maximum = np.zeros(3)
+        else:
+            self.minimum = np.min(self.points, axis=0)
+            self.maximum = np.max(self.points, axis=0)
+        extent = self.maximum - self.minimum
+        if bin_size is None:
+            bins_per_side = max(1.0, (self.points.shape[0]/8)**(1/3))
+            bin_size = max(np.max(extent)/bins_per_side, 1e-8)
+        # Keep the number of bins within a few times the number of points.
+        while np.prod(np.floor(extent/bin_size)+1) > 4*self.points.shape[0]+8:
+            bin_size *= 2
+        self.bin_size = bin_size
+        self.shape = (np.floor(extent/bin_size)+1).astype(np.int64)
+        bins = self.bin_ids(self.points)
+        self.order = np.argsort(bins, kind='stable')
+        counts = np.bincount(bins, minlength=np.prod(self.shape))
+        self.offsets = np.concatenate(([0], np.cumsum(counts)))
+
+    def bin_ids(self, points):
+        '''
+        Linear bin id of each point.
+        '''
+        cells = np.floor((points-self.minimum)/self.bin_size).astype(np.int64)
+        cells = np.clip(cells, 0, self.shape-1)
+        return ((cells[:, 0]*self.shape[1] + cells[:, 1])*self.shape[2]
+                + cells[:, 2])
+
+    def candidates(self, minimum, maximum):
+        '''
+        Indexes of the points in every bin overlapping the box between the
+        minimum and maximum corners.
+        '''
+        minimum = np.maximum(minimum, self.minimum)
+        maximum = np.minimum(maximum, self.maximum)
+        if np.any(minimum > maximum):
+            return np.array([], dtype=np.int64)
+        lower = np.floor((minimum-self.minimum)/self.bin_size).astype(np.int64)
+        upper = np.floor((maximum-self.minimum)/self.bin_size).astype(np.int64)
+        lower = np.clip(lower, 0, self.shape-1)
+        upper = np.clip(upper, 0, self.shape-1)
+        x, y, z = np.meshgrid(*[np.arange(lower[i], upper[i]+1)
+                                for i in range(3)], indexing='ij')
+        bins = ((x*self.shape[1] + y)*self.shape[2] + z).ravel()
+        starts = self.offsets[bins]
+        lengths = self.offsets[bins+1] - starts
+        # Expand each bin's [start, stop) slice without a Python loop.
+        shifts = np.repeat(starts - np.cumsum(lengths) + lengths, lengths)
+        positions = shifts + np.arange(np.sum(lengths))
+        return self.order[positions]
+
+    def select(self, region):
+        '''
+        Returns a boolean array, True for the points inside the region.
+        '''
+        selected = np.zeros(self.points.shape[0], dtype=bool)
+        candidates = self.candidates(*region.bounds())
+        inside = region.contains(self.points[candidates])
+        selected[candidates[inside]] = True
+        return selected
+
+    def label(self, regions, default=-1):
+        '''
+        Labels every point with the index of the region containing it, points
+        outside all regions get the default label. Every point is labelled
+        once; where regions overlap the earlier region in the list wins.
+        '''
+        labels = np.full(self.points.shape[0], default, dtype=np.int64)
+        unlabelled = np.ones(self.points.shape[0], dtype=bool)
+        for region_id, region in enumerate(regions):
+            candidates = self.candidates(*region.bounds())
+            candidates = candidates[unlabelled[candidates]]
+            inside = candidates[region.contains(self.points[candidates])]
+            labels[inside] = region_id
+            unlabelled[inside] = False
+        return labels
+
+
+def region_select(points, region, index=None):
+    '''
+    Returns a boolean array, True for the points inside the region. Pass a
+    BinIndex of the points when selecting several regions from them.
+    '''
+    if index is None: index = BinIndex(points)
+    return index.select(region)
+
+
+def label_regions(points, regions, index=None, default=-1):
+    '''
+    Returns the index of the region containing each point, see
+    BinIndex.label. Pass a BinIndex of the points to reuse it.
+    '''
+    if index is None: index = BinIndex(points)
+    return index.label(regions, default)
+
+
+def wrap(points, box):
+    '''
+    Wraps points into an orthogonal periodic box starting at the origin, the
+    result lies in [0, box) as required by periodic KD-trees.
+    '''
+    box = np.asarray(box, dtype=float)
+    points = np.mod(points, box)
+    # np.mod can round tiny negative values up to the box length.
+    return np.where(points >= box, 0, points)
+
+
+def close_pairs(points, cutoff, other=None, box=None, chunk_size=CHUNK_SIZE,
+                neighbours=8):
+    '''
+    Finds every pair of points closer than the cutoff. Returns the indexes of
+    the pairs as two arrays, and their distances. Without other the pairs are
+    within points with the first index lower than the second, with other the
+    first index is into points and the second into other.
+
+    Points are queried against a KD-tree in chunks for a fixed number of
+    neighbours, only points whose neighbours all fall within the cutoff are
+    queried again with more, so memory stays bounded for very large sets.
+
+    points: Numpy array of point coordinates in 3D.
+    cutoff: Pairs strictly closer than this distance are returned.
+    other: Optional second numpy array of point coordinates.
+    box: Side lengths of an orthogonal periodic box starting at the origin,
+        distances then use the minimum image. None for open boundaries.
+    chunk_size: Number of points queried at once.
+    neighbours: Number of neighbours queried for first.
+    '''
+    points = np.asarray(points, dtype=float)
+    targets = points if other is None else np.asarray(other, dtype=float)
+    if box is not None:
+        box = np.array(box, dtype=float)
+        points = wrap(points, box)
+        targets = wrap(targets, box)
+    if points.shape[0] == 0 or targets.shape[0] == 0:
+        return (np.array([], dtype=int), np.array([], dtype=int),
+                np.array([]))
+    tree = spatial.cKDTree(targets, boxsize=box)
+    # One extra neighbour as each point finds itself within a single set.
+    first_k = neighbours + (other is None)
+    firsts, seconds, distances = [], [], []
+    for start in range(0, points.shape[0], chunk_size):
+        queried = np.arange(start, min(start+chunk_size, points.shape[0]))
+        k = first_k
+        while queried.shape[0] > 0:
+            k = min(k, targets.shape[0])
+            found, indexes = tree.query(points[queried], k=k,
+                                        distance_upper_bound=cutoff)
+            found = found.reshape(queried.shape[0], k)
+            indexes = indexes.reshape(queried.shape[0], k)
+            close = found < cutoff
+            rows, columns = np.nonzero(close)
+            firsts.append(queried[rows])
+            seconds.append(indexes[rows, columns])
+            distances.append(found[rows, columns])
+            if k == targets.shape[0]:
+                break
+            # Points with all k neighbours inside the cutoff may have more.
+            full = close[:, -1]
+            if np.any(full):
+                firsts[-1] = firsts[-1][np.invert(full[rows])]
+                seconds[-1] = seconds[-1][np.invert(full[rows])]
+                distances[-1] = distances[-1][np.invert(full[rows])]
+            queried = queried[full]
+            k *= 2
+    firsts = np.concatenate(firsts) if firsts else np.array([], dtype=int)
+    seconds = np.concatenate(seconds) if seconds else np.array([], dtype=int)
+    distances = np.concatenate(distances) if distances else np.array([])
+    if other is None:
+        lower = firsts < seconds
+        firsts, seconds, distances = (
+            firsts[lower], seconds[lower], distances[lower])
+    return (firsts, seconds, distances)
+
+
+def overlap_survivors(points, cutoff, other=None, policy='first', seed=None,
+                      box=None, chunk_size=CHUNK_SIZE):
+    '''
+    Resolves overlapping points, returning the index of the point each point
+    is merged into; kept points are merged into themselves. With other the
+    indexes run over points followed by other.
+
+    Points are kept in priority order: a point is kept unless it overlaps a
+    point of higher priority that was itself kept. Policies set the priority
+    and which pairs are resolved. 'first' keeps the earlier point, for two
+    sets resolving every pair of the sets joined in order, so overlaps within
+    either set are removed too. 'a' is only valid for two sets and resolves
+    only pairs between them, keeping the point of the first set. 'random'
+    uses a random priority drawn from the seed, for two sets resolving only
+    pairs between them.
+    Resolution runs in vectorised rounds, one per link of the longest chain
+    of overlapping points.
+    '''
+    points = np.asarray(points, dtype=float)
+    number = points.shape[0]
+    if other is not None:
+        number += np.asarray(other).shape[0]
+    if policy == 'a' and other is None:
+        raise ValueError("Policy 'a' needs a second set of points.")
+    if policy in ['first', 'a']:
+        rank = np.arange(number)
+    elif policy == 'random':
+        rank = np.random.default_rng(seed).permutation(number)
+    else:
+        raise ValueError(f"Unknown overlap policy: '{policy}'.")
+    if policy == 'first' and other is not None:
+        firsts, seconds, distances = close_pairs(
+            np.concatenate((points, np.asarray(other, dtype=float))),
+            cutoff, None, box, chunk_size)
+    else:
+        firsts, seconds, distances = close_pairs(
+            points, cutoff, other, box, chunk_size)
+        if other is not None:
+            seconds = seconds + points.shape[0]
+    # Orient every pair from the higher to the lower priority point.
+    swap = rank[firsts] > rank[seconds]
+    higher = np.where(swap, seconds, firsts)
+    lower = np.where(swap, firsts, seconds)
+    survivors = np.arange(number)
+    # 0 undecided, 1 kept, 2 removed.
+    state = np.zeros(number, dtype=np.int8)
+    while True:
+        live = state[lower] == 0
+        removed = live & (state[higher] == 1)
+        survivors[lower[removed]] = higher[removed]
+        state[lower[removed]] = 2
+        blocked = np.zeros(number, dtype=bool)
+        blocked[lower[live & (state[higher] == 0)]] = True
+        undecided = state == 0
+        if not np.any(undecided):
+            break
+        state[undecided & np.invert(blocked)] = 1
+    return survivors
+
+
+def overlap_mask(points, cutoff, other=None, policy='first', seed=None,
+                 box=None, chunk_size=CHUNK_SIZE):
+    '''
+    Returns a boolean array of the points kept once overlaps closer than the
+    cutoff are resolved, or a tuple of two arrays when other is given. See
+    overlap_survivors for the policies.
+    '''
+    survivors = overlap_survivors(
+        points, cutoff, other, policy, seed, box, chunk_size)
+    keep = survivors == np.arange(survivors.shape[0])
+    if other is None:
+        return keep
+    number = np.asarray(points).shape[0]
+    return (keep[:number], keep[number:])
+
+
+# Largest number of cells a SeparationGrid holds as a dense array, 4 bytes
+# each.
+DENSE_CELLS = 2**25
+
+
+class SeparationGrid():
+
+    def __init__(self, points, separation, box=None):
+        '''
+        A spatial hash of points that must stay at least a separation apart.
+        Cells are small enough that each holds at most one point, so a point
+        is checked against one occupant per nearby cell. The grid is padded,
+        and periodic images are stored as ghost entries, so nearby cells are
+        found by adding fixed offsets to a cell's key. Cells are held in a
+        dense array when there are few enough, otherwise as sorted keys.
+
+        points: Every point that may be added, used to size the grid.
+        box: Side lengths of a periodic box starting at the origin.
+        '''
+        points = np.asarray(points, dtype=float)
+        self.separation = separation
+        self.box = None if box is None else np.asarray(box, dtype=float)
+        # A cell's diagonal is shorter than the separation.
+        if self.box is None:
+            self.minimum = np.min(points, axis=0)
+            extent = np.max(points, axis=0) - self.minimum
+            self.shape = (np.floor(extent*np.sqrt(3)/separation) + 1).astype(
+                np.int64)
+            self.size = np.full(3, separation/np.sqrt(3))
+        else:
+            self.minimum = np.zeros(3)
+            self.shape = np.maximum(
+                np.ceil(self.box*np.sqrt(3)/separation), 1).astype(np.int64)
+            self.size = self.box/self.shape
+        self.reach = np.ceil(separation/self.size).astype(np.int64)
+        self.padded = self.shape + 2*self.reach
+        offsets = np.stack(np.meshgrid(*[np.arange(-reach, reach+1) for reach
+                                         in self.reach], indexing='ij'),
+                           axis=-1).reshape(-1, 3)
+        # Drop cells whose nearest corner is at least a separation away.
+        gaps = np.maximum(np.abs(offsets) - 1, 0)*self.size
+        offsets = offsets[np.sum(gaps**2, axis=1) < separation**2]
+        self.offsets = self.keys_of(offsets)
+        self.dense = np.prod(self.padded) <= DENSE_CELLS
+        if self.dense:
+            self.cells = np.full(np.prod(self.padded), -1, dtype=np.int32)
+        else:
+            self.keys = np.zeros(0, dtype=np.int64)
+            self.values = np.zeros(0, dtype=np.int64)
+        self.points = np.zeros((0, 3))
+
+    def keys_of(self, cells):
+        '''
+        Linear keys of integer cell coordinates in the padded grid.
+        '''
+        return ((cells[..., 0]*self.padded[1] + cells[..., 1])*self.padded[2]
+                + cells[..., 2])
+
+    def cell_ids(self, points):
+        '''
+        Integer cell coordinates of each point in the padded grid.
+        '''
+        cells = np.floor((points - self.minimum)/self.size).astype(np.int64)
+        if self.box is not None:
+            cells = np.mod(cells, self.shape)
+        return np.clip(cells, 0, self.shape-1) + self.reach
+
+    def occupants(self, keys):
+        '''
+        Index of the point held in each cell of an array of keys, -1 for
+        empty cells.
+        '''
+        if self.dense:
+            return self.cells[keys]
+        occupants = np.full(keys.shape, -1, dtype=np.int64)
+        if self.keys.shape[0]:
+            positions = np.minimum(np.searchsorted(self.keys, keys),
+                                   self.keys.shape[0]-1)
+            found = self.keys[positions] == keys
+            occupants[found] = self.values[positions[found]]
+        return occupants
+
+    def clear(self, points):
+        '''
+        Returns a boolean array, True for the points at least a separation
+        from every point in the grid.
+        '''
+        points = np.asarray(points, dtype=float)
+        clear = np.ones(points.shape[0], dtype=bool)
+        if self.points.shape[0] == 0:
+            return clear
+        keys = self.keys_of(self.cell_ids(points))
+        # Looked up in key order, so nearby cells are read together.
+        order = np.argsort(keys)
+        occupants = self.occupants(keys[order][:, None] + self.offsets)
+        rows, columns = np.nonzero(occupants >= 0)
+        occupants = occupants[rows, columns]
+        rows = order[rows]
+        separations = self.points[occupants] - points[rows]
+        if self.box is not None:
+            separations -= np.around(separations/self.box)*self.box
+        squared = np.einsum('ij,ij->i', separations, separations)
+        clear[rows[squared < self.separation**2]] = False
+        return clear
+
+    def add(self, points):
+        '''
+        Adds points, which must be clear of the grid and of each other.
+        '''
+        points = np.asarray(points, dtype=float)
+        indexes = np.arange(points.shape[0]) + self.points.shape[0]
+        self.points = np.concatenate((self.points, points))
+        cells = self.cell_ids(points)
+        keys, values = [self.keys_of(cells)], [indexes]
+        if self.box is not None:
+            # Ghost entries for images falling in the padding.
+            images = np.ceil(self.reach/self.shape).astype(np.int64)
+            shifts = np.stack(np.meshgrid(*[np.arange(-image, image+1)
+                                            for image in images],
+                                          indexing='ij'), axis=-1)
+            for shift in shifts.reshape(-1, 3):
+                if not np.any(shift): continue
+                shifted = cells + shift*self.shape
+                inside = np.all((shifted >= 0) & (shifted < self.padded),
+                                axis=1)
+                keys.append(self.keys_of(shifted[inside]))
+                values.append(indexes[inside])
+        keys, values = np.concatenate(keys), np.concatenate(values)
+        if self.dense:
+            self.cells[keys] = values
+        else:
+            keys = np.concatenate((self.keys, keys))
+            order = np.argsort(keys, kind='stable')
+            self.keys = keys[order]
+            self.values = np.concatenate((self.values, values))[order]
+
+
+def separated_sample(points, number, separation=None, seed=None, box=None,
+                     batch_size=20000, grid=None):
+    '''
+    Picks up to a number of the points at random with no two picked points
+    closer than the separation, returning their indexes in the order picked.
+    Gives the same result as random sequential addition, trying points one at
+    a time in a random order, but tries them in vectorised batches: a batch is
+    checked against the points already picked with a SeparationGrid, then
+    overlaps within the batch are resolved in the random order. An existing
+    grid can be given, so points picked in earlier calls are kept clear of.
+    '''
+    points = np.asarray(points, dtype=float)
+    order = np.random.default_rng(seed).permutation(points.shape[0])
+    if not separation:
+        return order[:number]
+    if grid is None: grid = SeparationGrid(points, separation, box)
+    picked = []
+    count = 0
+    for start in range(0, order.shape[0], batch_size):
+        if count >= number:
+            break
+        batch = order[start:start+batch_size]
+        batch = batch[grid.clear(points[batch])]
+        # The batch is in random order, so 'first' keeps the earlier tried.
+        survivors = overlap_survivors(points[batch], separation, box=box)
+        batch = batch[survivors == np.arange(batch.shape[0])][:number-count]
+        grid.add(points[batch])
+        picked.append(batch)
+        count += batch.shape[0]
+    if not picked:
+        return np.zeros(0, dtype=np.int64)
+    return np.concatenate(picked)
@@ -0,0 +1,194 @@
+'''
+Name:
+    Checkpoint
+Description:
+    Saves SuperCells, Grains, and Polycrystals losslessly to a binary
+    checkpoint, and loads them back, so the stages of a pipeline can stop and
+    resume without writing text files. A checkpoint is a directory holding
+    every array of the structure as a .npy file and a JSON header describing
+    everything else: the objects, their attributes, and which array file
+    each array attribute is in.
+
+    Arrays are loaded memory mapped, copy on write by default, so reopening
+    even multi-million atom structures reads nothing until the atoms are
+    used, and edits never reach the files. Checkpoints are written to a new
+    directory beside the target and renamed into place, so an interrupted
+    save never leaves a header pointing at missing arrays.
+'''
+import os
+import json
+import shutil
+import tempfile
+import numpy as np
+import pandas as pd
+from atom import Atom
+from unitcell import UnitCell
+from supercell import SuperCell
+from grain_creation import Grain
+from polycrystal import Polycrystal
+from edits import Cut
+
+FORMAT_VERSION = 2
+# Format 1 stored tuples as lists, otherwise it reads as format 2.
+READABLE_VERSIONS = [1, 2]
+HEADER = 'header.json'
+ARRAYS = 'arrays'
+CLASSES = {cls.__name__: cls for cls in [Atom, UnitCell, SuperCell, Grain,
+                                         Polycrystal, Cut]}
+
+
+class Writer():
+
+    def __init__(self, directory):
+        '''
+        Converts objects to JSON for a checkpoint header, saving their arrays
+        into the checkpoint's array directory as it goes.
+        '''
+        self.directory = directory
+        self.arrays = 0
+        self.objects = {}
+
+    def save_array(self, array):
+        if array.dtype.hasobject:
+            raise ValueError("Arrays of Python objects cannot be saved in a "
+                             "checkpoint.")
+        name = f'{self.arrays}.npy'
+        self.arrays += 1
+        np.save(os.path.join(self.directory, ARRAYS, name),
+                np.ascontiguousarray(array), allow_pickle=False)
+        return name
+
+    def convert(self, value):
+        '''
+        JSON form of a value. Objects are recorded once, and by reference
+        after that, so shared objects, e.g. a grain's unitcell, stay shared.
+        '''
+        if value is None or isinstance(value, (bool, int, float, str)):
+            return value
+        if isinstance(value, np.generic):
+            return value.item()
+        if isinstance(value, np.ndarray):
+            return {'array': self.save_array(value)}
+        if isinstance(value, pd.DataFrame):
+            return {'frame': self.save_array(value.to_records(index=False)),
+                    'index': self.convert(value.index.tolist())}
+        if isinstance(value, tuple):
+            return {'tuple': [self.convert(item) for item in value]}
+        if isinstance(value, list):
+            return [self.convert(item) for item in value]
+        if isinstance(value, dict):
+            if not all(isinstance(key, str) for key in value):
+                raise ValueError("Only dictionaries with string keys can be "
+                                 "saved in a checkpoint.")
+            return {'dict': {key: self.convert(item)
+                             for key, item in value.items()}}
+        name = type(value).__name__
+        if CLASSES.get(name) is not type(value):
+            raise ValueError(f"Objects of type '{name}' cannot be saved in a "
+                             "checkpoint.")
+        if id(value) in self.objects:
+            return {'reference': self.objects[id(value)]}
+        identifier = len(self.objects)
+        self.objects[id(value)] = identifier
+        if isinstance(value, SuperCell):
+            value.apply_transform()
+        return {'object': name, 'id': identifier,
+                'attributes': {key: self.convert(item)
+                               for key, item in vars(value).items()}}
+
+
+class Reader():
+
+    def __init__(self, directory, mmap_mode):
+        '''
+        Rebuilds objects from the JSON of a checkpoint header.
+        '''
+        self.directory = directory
+        self.mmap_mode = mmap_mode
+        self.objects = {}
+
+    def load_array(self, name):
+        return np.load(os.path.join(self.directory, ARRAYS, name),
+                       mmap_mode=self.mmap_mode, allow_pickle=False)
+
+    def convert(self, value):
+        if isinstance(value, list):
+            return [self.convert(item) for item in value]
+        if not isinstance(value, dict):
+            return value
+        if 'array' in value:
+            return self.load_array(value['array'])
+        if 'frame' in value:
+            return pd.DataFrame(np.array(self.load_array(value['frame'])),
+                                index=self.convert(value['index']))
+        if 'tuple' in value:
+            return tuple(self.convert(item) for item in value['tuple'])
+        if 'dict' in value:
+            return {key: self.convert(item)
+                    for key, item in value['dict'].items()}
+        if 'reference' in value:
+            return self.objects[value['reference']]
+        structure = CLASSES[value['object']].__new__(
+            CLASSES[value['object']])
+        self.objects[value['id']] = structure
+        for key, item in value['attributes'].items():
+            # Set on the instance, around SuperCell's transform properties.
+            structure.__dict__[key] = self.convert(item)
+        return structure
+
+
+def save_checkpoint(structure, directory):
+    '''
+    Saves a SuperCell, Grain, or Polycrystal, with every attribute, to a
+    checkpoint directory, replacing any checkpoint already there. Pending
+    transforms of supercells are applied first.
+    '''
+    directory = os.path.abspath(directory)
+    if (os.path.isdir(directory) and os.listdir(directory)
+            and not os.path.exists(os.path.join(directory, HEADER))):
+        raise ValueError(f"'{directory}' is not a checkpoint, only "
+                         "checkpoints are replaced.")
+    parent, name = os.path.split(directory)
+    os.makedirs(parent, exist_ok=True)
+    temporary = tempfile.mkdtemp(prefix=f'.{name}.', dir=parent)
+    try:
+        os.mkdir(os.path.join(temporary, ARRAYS))
+        writer = Writer(temporary)
+        header = {'format': FORMAT_VERSION, 'type': type(structure).__name__,
+                  'structure': writer.convert(structure)}
+        with open(os.path.join(temporary, HEADER), 'w') as file:
+            json.dump(header, file, indent=1)
+    except BaseException:
+        shutil.rmtree(temporary, ignore_errors=True)
+        raise
+    if not os.path.exists(directory):
+        os.rename(temporary, directory)
+        return
+    # The old checkpoint is moved aside whole, then deleted once the new one
+    # is in place.
+    previous = temporary + '.old'
+    os.rename(directory, previous)
+    os.rename(temporary, directory)
+    shutil.rmtree(previous, ignore_errors=True)
+
+
+def read_header(directory):
+    '''
+    Reads the header of a checkpoint, checking its format version.
+    '''
+    with open(os.path.join(directory, HEADER), 'r') as file:
+        header = json.load(file)
+    if header.get('format') not in READABLE_VERSIONS:
+        raise ValueError(f"Checkpoint format {header.get('format')} is not "
+                         f"supported, expected one of {READABLE_VERSIONS}.")
+    return header
+
+
+def load_checkpoint(directory, mmap_mode='c'):
+    '''
+    Loads the structure saved in a checkpoint directory. Arrays are memory
+    mapped with the mmap mode: 'c' copy on write, 'r' read only, 'r+' writing
+    through to the files, or None to read them into memory.
+    '''
+    header = read_header(directory)
+    return Reader(directory, mmap_mode).convert(header['structure'])
@@ -9,6 +9,10 @@ import numpy as np
 import linear_algebra as linalg
 from scipy import spatial
 import cartesian_edits as ce
+from supercell import SuperCell
+
+# Number of atoms sent to a KD-tree query at once, bounds peak memory use.
+CHUNK_SIZE = 1000000
 
 
 def miller_to_intercepts(plane):
@@ -90,3 +94,90 @@ def neighbour_distances(atoms, neighbours=12):
     distances, indexes = atom_tree.query(atoms, k=neighbours+1)
     distances = np.around(distances, 6)
     return distances
+
+
+def surface_mask(supercell, neighbours=12):
+    '''
+    Finds the surface atoms of a supercell by comparing the distance
+    symmetries of every atom to those of the bulk crystal. Bulk symmetries
+    come from a 10x10x10 supercell built from the same unitcell and given the
+    supercell's current vector space, so rotated or strained supercells are
+    compared against the correct bulk. Returns a boolean array with True for
+    surface atoms.
+
+    supercell: SuperCell to find the surface of.
+    neighbours: Number of nearest neighbours compared for each atom.
+    '''
+    reference = SuperCell(supercell.unitcell, 10, 10, 10)
+    reference.vector_space = supercell.vector_space
+    reference.set_cartesian()
+    fractional = reference.fractional['coordinates']
+    bulk = np.all((fractional >= 2) & (fractional <= 8), axis=1)
+    bulk_symmetries = neighbour_distances(
+        reference.cartesian['coordinates'], neighbours)[bulk]
+    bulk_symmetries = np.unique(bulk_symmetries, axis=0)
+    if supercell.cartesian is None: supercell.set_cartesian()
+    symmetries = neighbour_distances(
+        supercell.cartesian['coordinates'], neighbours)
+    return np.invert(linalg.match_rows_exact(symmetries, bulk_symmetries))
+
+
+def surface_depth(structure, surface=None, shell_width=None, neighbours=12,
+                  chunk_size=CHUNK_SIZE):
+    '''
+    Calculates how deep every atom of a structure sits below its surface. The
+    depth of an atom is its distance to the nearest surface atom, found with a
+    single KD-tree built over the surface atoms and queried in chunks, so the
+    cost is O(N log S) for N atoms and S surface atoms. Returns a tuple of the
+    depths and the integer shell index of every atom.
+
+    Shell indexes bin the depths by the shell width: surface atoms are shell
+    0, and shell k holds the atoms with depths in ((k-1)*width, k*width]. The
+    default width is the shortest separation between two surface atoms,
+    roughly the nearest neighbour distance. Give the interlayer spacing of the
+    surface plane instead if shells should follow atomic layers exactly.
+
+    structure: SuperCell, or numpy array of atom coordinates (generally in
+        cartesian). Structured arrays with a 'coordinates' column are also
+        accepted.
+    surface: Boolean array, True for surface atoms. Found with surface_mask
+        when not given, which is only possible for a SuperCell.
+    shell_width: Width of each depth shell in the units of the coordinates.
+    neighbours: Number of nearest neighbours used by surface_mask.
+    chunk_size: Number of atoms queried against the KD-tree at once.
+    '''
+    if isinstance(structure, SuperCell):
+        if structure.cartesian is None: structure.set_cartesian()
+        atoms = structure.cartesian['coordinates']
+    elif structure.dtype.names is not None:
+        atoms = structure['coordinates']
+    else:
+        atoms = structure
+    if surface is None:
+        if not isinstance(structure, SuperCell):
+            raise ValueError(
+                "A surface mask must be given for coordinate arrays, only a "
+                "SuperCell can have its surface found automatically.")
+        surface = surface_mask(structure, neighbours)
+    surface = np.asarray(surface, dtype=bool)
+    if surface.shape[0] != atoms.shape[0]:
+        raise ValueError(
+            f"Surface mask has {surface.shape[0]} entries, but the structure "
+            f"has {atoms.shape[0]} atoms.")
+    if not np.any(surface):
+        raise ValueError("Surface mask does not contain any surface atoms.")
+    surface_tree = spatial.cKDTree(atoms[surface])
+    if shell_width is None:
+        if np.sum(surface) < 2:
+            raise ValueError(
+                "At least two surface atoms are needed to estimate a shell "
+                "width, give shell_width explicitly.")
+        separations = surface_tree.query(atoms[surface], k=2)[0][:, 1]
+        shell_width = np.min(separations[separations > 1e-8])
+    depths = np.empty(atoms.shape[0])
+    for start in range(0, atoms.shape[0], chunk_size):
+        stop = start + chunk_size
+        depths[start:stop] = surface_tree.query(atoms[start:stop], k=1)[0]
+    depths[surface] = 0
+    shells = np.ceil(np.around(depths/shell_width, 6)).astype(int)
+    return (depths, shells)
@@ -0,0 +1,256 @@
+'''
+Name:
+    CSL
+Description:
+    Coincidence site lattice (CSL) bicrystals for cubic unitcells. A rotation
+    of a cubic lattice about an integer axis [uvw] by the angle
+    2*arctan(n*sqrt(N)/m), with N = u^2 + v^2 + w^2, brings one in every
+    Sigma = m^2 + N*n^2 lattice sites into coincidence, halving Sigma until it
+    is odd. Sigma values and angles are enumerated over all m, n at once.
+
+    For a chosen Sigma the smallest orthogonal cell spanned by CSL vectors of
+    the unitcell's Bravais lattice, e.g. FCC or BCC, is found, with the grain
+    boundary plane containing the axis (tilt) or normal to it (twist), and
+    the two half-crystals are built directly in that cell.
+    The cell is periodic in all three directions, with one boundary in the
+    middle and one at the cell edge, so only a few thousand atoms are needed.
+'''
+import numpy as np
+import linear_algebra as linalg
+from atom import Atom
+from unitcell import UnitCell
+import cartesian_edits as ce
+
+
+def csl_table(axis, max_sigma=99, bound=None, unique=True):
+    '''
+    Enumerates the Sigma values and misorientation angles, in radians, of
+    rotations about an integer axis, for all coprime m, n up to the bound.
+    Returns a structured array with fields sigma, angle, m, and n, sorted by
+    Sigma then angle, up to max_sigma. Unique keeps only the smallest angle
+    of every Sigma.
+    '''
+    axis = np.array(axis, dtype=int)
+    squared_length = int(np.sum(axis**2))
+    if bound is None:
+        bound = int(np.ceil(np.sqrt(2*max_sigma))) + 1
+    m, n = np.meshgrid(np.arange(1, bound+1), np.arange(1, bound+1),
+                       indexing='ij')
+    m, n = m.ravel(), n.ravel()
+    coprime = np.gcd(m, n) == 1
+    m, n = m[coprime], n[coprime]
+    sigmas = m**2 + squared_length*n**2
+    # Even Sigma are halved until odd, all CSL Sigma of cubic lattices are.
+    while np.any(sigmas % 2 == 0):
+        sigmas = np.where(sigmas % 2 == 0, sigmas//2, sigmas)
+    angles = 2*np.arctan(n*np.sqrt(squared_length)/m)
+    valid = (sigmas > 1) & (sigmas <= max_sigma) & (angles < np.pi)
+    table = np.zeros(np.sum(valid), dtype=[('sigma', 'i8'), ('angle', 'f8'),
+                                           ('m', 'i8'), ('n', 'i8')])
+    table['sigma'] = sigmas[valid]
+    table['angle'] = angles[valid]
+    table['m'] = m[valid]
+    table['n'] = n[valid]
+    table = table[np.lexsort((table['angle'], table['sigma']))]
+    if not unique:
+        return table
+    first = np.unique(table['sigma'], return_index=True)[1]
+    return table[first]
+
+
+def lattice_centring(unitcell, tolerance=1e-6):
+    '''
+    Returns the centring translations of a unitcell's Bravais lattice, in
+    fractional coordinates: the shifts between basis sites that map every
+    site onto a site of the same element, e.g. the face centres of FCC.
+    The first is always the origin.
+    '''
+    basis = np.concatenate([atom.fractional for atom in unitcell.atoms])
+    coordinates = basis['coordinates'] % 1
+    same_element = basis['element'][:, None] == basis['element'][None]
+    centring = []
+    for shift in np.round(coordinates - coordinates[0], 8) % 1:
+        moved = (coordinates + shift)[:, None] - coordinates[None]
+        moved -= np.round(moved)
+        lands = np.all(np.abs(moved) < tolerance, axis=2) & same_element
+        if np.all(np.any(lands, axis=1)):
+            centring.append(shift)
+    # The origin sorts first, as every shift lies in [0, 1).
+    return np.unique(np.round(centring, 8), axis=0)
+
+
+def in_lattice(vectors, centring, tolerance):
+    '''
+    True for the vectors, in lattice parameter units, that are translations
+    of the lattice with the given centring.
+    '''
+    offsets = vectors[:, None] - centring[None]
+    return np.any(np.all(np.abs(offsets - np.round(offsets)) < tolerance,
+                         axis=2), axis=1)
+
+
+def csl_vectors(rotation, bound, sigma, centring=None):
+    '''
+    Returns every lattice vector, within the bound in each component, that is
+    also a lattice vector of the rotated lattice: the CSL vectors in the
+    frame of the unrotated crystal, shortest first. Without a centring the
+    lattice is simple cubic.
+    '''
+    if centring is None:
+        centring = np.zeros((1, 3))
+    grid = np.indices((2*bound+1,)*3).reshape(3, -1).T - bound
+    grid = (grid[:, None] + centring[None]).reshape(-1, 3)
+    grid = grid[np.any(grid != 0, axis=1)]
+    # In the rotated lattice's own frame, components are multiples of
+    # 1/sigma of the centring's fractions for CSL rotations.
+    rotated = grid @ rotation
+    vectors = grid[in_lattice(rotated, centring, 0.25/sigma)]
+    return vectors[np.argsort(np.einsum('ij,ij->i', vectors, vectors),
+                              kind='stable')]
+
+
+def shortest_along(direction, rotation, sigma, centring):
+    '''
+    The shortest CSL vector along an integer direction.
+    '''
+    direction = np.round(direction).astype(int)
+    direction = direction//np.gcd.reduce(direction)
+    # Lattice vectors along a primitive integer direction are multiples of
+    # it divided by the centring's denominator.
+    denominator = 1
+    while not np.allclose(centring*denominator,
+                          np.round(centring*denominator)):
+        denominator += 1
+    for multiple in range(1, 2*sigma*denominator + 1):
+        vector = (multiple/denominator*direction)[None]
+        if (in_lattice(vector, centring, 1e-8)[0]
+                and in_lattice(vector @ rotation, centring, 0.25/sigma)[0]):
+            return vector[0]
+    raise ValueError(f"No CSL vector found along {direction}.")
+
+
+def boundary_cell(axis, rotation, sigma, boundary='tilt', centring=None):
+    '''
+    Finds three orthogonal CSL vectors, in the frame of the unrotated crystal
+    and in lattice parameter units, spanning the smallest periodic cell of a
+    boundary: the first two lie in the boundary plane and the third is along
+    its normal. Tilt boundaries contain the rotation axis, twist boundaries
+    are normal to it. CSL vectors come from the Bravais lattice with the
+    given centring, see lattice_centring, by default simple cubic.
+    '''
+    if centring is None:
+        centring = np.zeros((1, 3))
+    axis = np.array(axis, dtype=int)
+    axis = axis//np.gcd.reduce(axis)
+    bound = int(np.ceil(np.sqrt(sigma*np.sum(axis**2)))) + 1
+    vectors = csl_vectors(rotation, bound, sigma, centring)
+    in_plane = vectors[np.abs(vectors @ axis) < 1e-8]
+    if in_plane.shape[0] == 0:
+        raise ValueError(f"No CSL vectors found normal to axis {axis}.")
+    axis_vector = shortest_along(axis, rotation, sigma, centring)
+    second = in_plane[0]
+    # Scaled to integers, so the cross product is an integer direction.
+    third = shortest_along(np.cross(axis, np.round(second*2*sigma)),
+                           rotation, sigma, centring)
+    if boundary == 'tilt':
+        return np.array([axis_vector, second, third])
+    if boundary == 'twist':
+        return np.array([second, third, axis_vector])
+    raise ValueError(f"Unknown boundary type: '{boundary}'.")
+
+
+def bicrystal(unitcell, axis, sigma=None, angle=None, boundary='tilt',
+              repeats=1, overlap=None, max_sigma=99):
+    '''
+    Builds a periodic CSL bicrystal and returns it as a new orthogonal
+    UnitCell, replicate it with SuperCell to enlarge the boundary plane. The
+    boundary planes are normal to the cell's z direction, at its middle and
+    its edge. Crystal 1, below the middle, is the unitcell rotated by minus
+    half the misorientation angle about the axis, crystal 2 by plus half.
+
+    unitcell: Cubic UnitCell, the basis can be any, e.g. FCC or BCC.
+    axis: Integer rotation axis [uvw] in the unitcell's lattice.
+    sigma: Sigma of the boundary, uses the smallest angle with that Sigma.
+    angle: Misorientation angle in radians, instead of sigma, must be a CSL
+        angle of the axis.
+    boundary: 'tilt' or 'twist'.
+    repeats: Number of CSL periods each crystal is thick along z.
+    overlap: Atoms of crystal 2 closer than this to atoms of crystal 1 are
+        deleted.
+    '''
+    vector_space = np.array(unitcell.vector_space, dtype=float)
+    lattice_parameter = vector_space[0, 0]
+    if not np.allclose(vector_space, np.identity(3)*lattice_parameter):
+        raise ValueError(
+            "CSL bicrystals can only be built from cubic unitcells with "
+            "lattice vectors along x, y, and z.")
+    table = csl_table(axis, max(max_sigma, sigma or 0), unique=False)
+    if sigma is not None:
+        rows = table[table['sigma'] == sigma]
+        if rows.shape[0] == 0:
+            raise ValueError(f"Sigma {sigma} does not exist for axis {axis}.")
+        angle = rows[0]['angle']
+    elif angle is not None:
+        # Every angle of a Sigma, not only its smallest.
+        rows = table[np.isclose(table['angle'], angle, atol=1e-6)]
+        if rows.shape[0] == 0:
+            raise ValueError(f"Angle {angle} is not a CSL angle of {axis}.")
+        sigma = rows[0]['sigma']
+    else:
+        raise ValueError("Give either sigma or angle.")
+    unit_axis = linalg.normalise(np.array(axis, dtype=float))
+    rotation = linalg.vector_rotation_matrix(angle, unit_axis)
+    cell = boundary_cell(axis, rotation, int(sigma), boundary,
+                         lattice_centring(unitcell))
+    lengths = np.linalg.norm(cell, axis=1)*lattice_parameter
+    lengths[2] *= repeats
+    directions = cell/np.linalg.norm(cell, axis=1)[:, None]
+    basis = np.concatenate([atom.fractional for atom in unitcell.atoms])
+    elements, coordinates = [], []
+    for half, sign in enumerate([-1, 1]):
+        half_rotation = linalg.vector_rotation_matrix(sign*angle/2, unit_axis)
+        # Lattice to cell frame: rotate to the median frame, then onto the
+        # cell directions, which are CSL vectors in crystal 1's frame.
+        median_directions = directions @ linalg.vector_rotation_matrix(
+            -angle/2, unit_axis).T
+        to_cell = median_directions @ half_rotation @ vector_space
+        minimum = np.array([0, 0, half*lengths[2]/2])
+        maximum = np.array([lengths[0], lengths[1], (half+1)*lengths[2]/2])
+        positions, indexes = lattice_in_box(to_cell, basis['coordinates'],
+                                            minimum, maximum)
+        elements.append(basis['element'][indexes])
+        coordinates.append(positions)
+    elements = np.concatenate(elements)
+    coordinates = np.concatenate(coordinates)
+    if overlap is not None:
+        # Crystal 1 comes first, so it wins every overlap.
+        keep = ce.overlap_mask(coordinates, overlap, box=lengths)
+        elements, coordinates = elements[keep], coordinates[keep]
+    # Rounded so sites on the lower faces are not a hair outside the cell.
+    fractional = np.round(coordinates/lengths, 10) % 1
+    atoms = [Atom(str(element), float(x), float(y), float(z))
+             for element, (x, y, z) in zip(elements, fractional.tolist())]
+    return UnitCell(atoms, [lengths[0], 0, 0], [0, lengths[1], 0],
+                    [0, 0, lengths[2]])
+
+
+def lattice_in_box(to_cell, basis, minimum, maximum):
+    '''
+    Returns the lattice positions, and their basis indexes, mapped by the
+    to_cell matrix that lie in the half open box [minimum, maximum).
+    '''
+    corners = np.where(np.indices((2, 2, 2)).reshape(3, -1).T,
+                       maximum, minimum)
+    corners = corners @ np.linalg.inv(to_cell).T
+    lower = np.floor(np.min(corners, axis=0)).astype(int) - 1
+    upper = np.ceil(np.max(corners, axis=0)).astype(int) + 1
+    cells = np.stack(np.meshgrid(*[np.arange(low, high+1) for low, high
+                                   in zip(lower, upper)], indexing='ij'),
+                     axis=-1).reshape(-1, 3)
+    positions = (cells[:, None] + basis).reshape(-1, 3) @ to_cell.T
+    indexes = np.tile(np.arange(basis.shape[0]), cells.shape[0])
+    # Rounded, so sites on the upper faces, periodic images of sites on the
+    # lower faces, are reliably left out.
+    relative = np.round((positions - minimum)/(maximum - minimum), 8)
+    inside = np.all((relative >= 0) & (relative < 1), axis=1)
+    return (positions[inside], indexes[inside])
@@ -7,11 +7,12 @@ Description:
 '''
 
 import numpy as np
+from scipy import spatial
 import linear_algebra as linalg
-import copy
 from dataclasses import dataclass
 import transforms
 import crystallography
+import cartesian_edits as ce
 import testing_tools as test_tool
 
 
@@ -124,17 +125,8 @@ def plane_cut(supercell, cut):
     miller index are deleted. Uses fractional coordinates, so plane points
     should be given in fractional also.
     '''
-    miller_indexes = np.array(cut.plane).astype(float)
-    fractional_vector_space = np.array([[1, 0, 0], [0, 1, 0], [0, 0, 1]])
-    plane_normal = crystallography.cartesian_plane_normal(
-        fractional_vector_space, miller_indexes)
-    point = np.array(cut.point)
-    atoms = supercell.fractional
-    atoms = atoms['coordinates']
-    atoms = atoms-point
-    deletions = np.dot(atoms, plane_normal)
-    deletions = (deletions < 0.0001)
-    supercell.fractional = supercell.fractional[deletions]
+    atoms = supercell.fractional['coordinates']
+    supercell.fractional = supercell.fractional[cut_mask(atoms, cut)]
 
 
 def cartesian_plane_cut(supercell, cut):
@@ -146,15 +138,10 @@ def cartesian_plane_cut(supercell, cut):
     directions of the supercell itself. Thus you must give points in cartesian
     coordinates, and normal directions in cartesian coordinates also.
     '''
-    plane_normal = np.array(cut.plane)
-    point = np.array(cut.point)
     if supercell.cartesian is None: supercell.set_cartesian()
-    atoms = supercell.cartesian
-    atoms = atoms['coordinates']
-    atoms = atoms-point
-    deletions = np.dot(atoms, plane_normal)
-    deletions = (deletions < 0.0001)
-    supercell.fractional = supercell.fractional[deletions]
+    atoms = supercell.cartesian['coordinates']
+    mask = cut_mask(None, cut, atoms)
+    supercell.fractional = supercell.fractional[mask]
 
 
 def spherical_cut(supercell, cut):
@@ -163,14 +150,46 @@ def spherical_cut(supercell, cut):
     an out value which dictates whether points outside the sphere remain or
     inside the sphere remain. Points remaining outside the sphere is default.
     '''
-    atoms = supercell.fractional
-    atoms = atoms['coordinates']
-    atoms = np.linalg.norm(atoms-cut.point, axis=1)
-    deletions = atoms > cut.radius if cut.out else atoms < cut.radius
-    supercell.fractional = supercell.fractional[deletions]
+    atoms = supercell.fractional['coordinates']
+    supercell.fractional = supercell.fractional[cut_mask(atoms, cut)]
+
+
+def cut_mask(fractional, cut, cartesian=None):
+    '''
+    Returns a boolean array, True for the atoms a cut keeps, without changing
+    any supercell. Plane and spherical cuts use the fractional coordinates,
+    cartesian plane cuts the cartesian coordinates. Used to cut supercells,
+    and to test positions against a grain's shape, e.g. to carve a cavity.
+    '''
+    if cut.cut_type == 'p':
+        miller_indexes = np.array(cut.plane).astype(float)
+        fractional_vector_space = np.array([[1, 0, 0], [0, 1, 0], [0, 0, 1]])
+        plane_normal = crystallography.cartesian_plane_normal(
+            fractional_vector_space, miller_indexes)
+        distances = np.dot(fractional-np.array(cut.point), plane_normal)
+        return distances < 0.0001
+    if cut.cut_type == 'cp':
+        distances = np.dot(cartesian-np.array(cut.point),
+                           np.array(cut.plane))
+        return distances < 0.0001
+    if cut.cut_type == 's':
+        distances = np.linalg.norm(fractional-cut.point, axis=1)
+        return distances > cut.radius if cut.out else distances < cut.radius
+    raise ValueError(f"Cut type '{cut.cut_type}' has no mask.")
+
+
+def shape_mask(fractional, cuts, cartesian=None):
+    '''
+    Returns a boolean array, True for the atoms kept by every cut in a list,
+    i.e. the atoms inside the shape the cuts make.
+    '''
+    mask = np.ones(fractional.shape[0], dtype=bool)
+    for cut in cuts:
+        mask &= cut_mask(fractional, cut, cartesian)
+    return mask
 
 
-def reflect(supercell, reflection):
+def reflect(supercell, reflection, overlap=None):
     '''
     Reflects a supercell across the plane given in a reflection dataclass.
     Removes atoms on one side of the reflection plane to prevent the reflection
@@ -178,6 +197,9 @@ def reflect(supercell, reflection):
     structure. Uses cartesian coordinates to perform the reflection, as
     fractional coordinates rely on vector space which cannot be reflected
     across the plane.
+
+    Atoms just off the plane land next to their own reflections, give overlap
+    as a cartesian distance to merge such pairs into a single atom.
     '''
     cut = Cut('p', reflection.point, reflection.normal)
     make_cut(supercell, cut)
@@ -198,15 +220,695 @@ def reflect(supercell, reflection):
     atoms = np.hstack((atoms, reflection_atoms)).flatten()
     supercell.cartesian = atoms
     supercell.set_fractional()
+    if overlap is not None:
+        remove_overlaps(supercell, overlap, merge=True)
+
+
+def remove_overlaps(supercell, cutoff, policy='first', seed=None,
+                    merge=False):
+    '''
+    Removes atoms closer than a cartesian cutoff to another atom of the
+    supercell. The policy picks which atom of an overlapping pair is kept:
+    'first' keeps the atom earlier in the supercell, 'random' picks at random
+    using the seed. With merge, kept atoms move to the mean position of the
+    atoms merged into them. Returns the number of atoms removed.
+    '''
+    if supercell.cartesian is None: supercell.set_cartesian()
+    coordinates = supercell.cartesian['coordinates']
+    survivors = ce.overlap_survivors(coordinates, cutoff, policy=policy,
+                                     seed=seed)
+    return _merge_survivors(supercell, coordinates, survivors, merge)
 
 
-def create_twin(supercell, twin):
+def merge_supercells(supercell, other, cutoff, policy='a', seed=None,
+                     merge=False):
+    '''
+    Adds the atoms of another supercell to a supercell, removing atoms of the
+    pair that overlap within a cartesian cutoff. Atoms are combined in
+    cartesian space and keep the vector space of the first supercell, so
+    position the other supercell beforehand, e.g. for stacking or embedding.
+    Policy 'a' keeps the atom of the first supercell, 'random' picks at random
+    using the seed, both resolving only overlaps between the two supercells.
+    Policy 'first' also resolves overlaps within either supercell, keeping
+    the earlier atom.
+    Returns the number of atoms removed.
+    '''
+    if supercell.cartesian is None: supercell.set_cartesian()
+    if other.cartesian is None: other.set_cartesian()
+    coordinates = supercell.cartesian['coordinates']
+    other_coordinates = other.cartesian['coordinates']
+    survivors = ce.overlap_survivors(coordinates, cutoff, other_coordinates,
+                                     policy=policy, seed=seed)
+    supercell.cartesian = np.concatenate(
+        (supercell.cartesian, other.cartesian.astype(supercell.cartesian.dtype)))
+    return _merge_survivors(
+        supercell, supercell.cartesian['coordinates'], survivors, merge)
+
+
+def _merge_survivors(supercell, coordinates, survivors, merge):
+    '''
+    Keeps the atoms of a supercell that survived overlap resolution, moving
+    them to the mean position of the atoms merged into them if merge is set.
+    Coordinates are the cartesian coordinates the survivors index.
+    '''
+    keep = survivors == np.arange(survivors.shape[0])
+    atoms = supercell.cartesian[keep]
+    if merge:
+        totals = np.zeros((survivors.shape[0], 3))
+        np.add.at(totals, survivors, coordinates)
+        counts = np.bincount(survivors, minlength=survivors.shape[0])
+        atoms['coordinates'] = totals[keep]/counts[keep, None]
+    supercell.cartesian = atoms
+    supercell.set_fractional()
+    return int(np.sum(np.invert(keep)))
+
+
+def create_twin(supercell, twin, overlap=0.01, chunk_size=1000000,
+                coordinates='fractional'):
     '''
     Uses a twin dataclass to rotate a supercell around a rotation vector that
     lies within a given plain. In order for this to work well the rotation
     vector should be chosen carefully, generally so that it points along some
-    line of symmetry that runs parallel to the plane.
+    line of symmetry that runs parallel to the plane. Twin points are
+    fractional by default, as for transforms.translate, or cartesian with
+    coordinates='cartesian'; normals and rotation vectors are cartesian.
+
+    Give a list of twins with parallel planes for polysynthetic twinning. The
+    planes split space into slabs, the slab beyond each plane holds the crystal
+    of the slab before it rotated about that plane's axis, so slab k holds the
+    original crystal under the composite transform of the first k twins. All
+    slabs are filled in one pass over the atoms with one batched matmul per
+    chunk; atoms are kept in the slab their image lands in and within the
+    supercell's original extent along every lattice vector. Atoms within
+    overlap of each other, e.g. on a twin plane, are merged. The supercell
+    must contain the atoms each slab is drawn from, so a slab should not be
+    thicker than the one before it.
+    '''
+    twins = twin if isinstance(twin, list) else [twin]
+    if supercell.cartesian is None: supercell.set_cartesian()
+    vector_space = np.array(supercell.vector_space, dtype=float)
+    points = [np.array(twin.point, dtype=float) for twin in twins]
+    if coordinates != 'cartesian':
+        points = [vector_space @ point for point in points]
+    normal = linalg.normalise(np.array(twins[0].normal, dtype=float))
+    for twin in twins[1:]:
+        twin_normal = linalg.normalise(np.array(twin.normal, dtype=float))
+        if not np.isclose(abs(np.dot(normal, twin_normal)), 1):
+            raise ValueError("Polysynthetic twin planes must be parallel.")
+    offsets = np.array([np.dot(point, normal) for point in points])
+    order = np.argsort(offsets)
+    twins = [twins[index] for index in order]
+    points = [points[index] for index in order]
+    offsets = offsets[order]
+    # Composite affine of every slab, as rotation matrices and translations.
+    matrices = [np.identity(3)]
+    translations = [np.zeros(3)]
+    for twin, point in zip(twins, points):
+        rotation_vector = linalg.normalise(
+            np.array(twin.rotation_vector, dtype=float))
+        rotation = linalg.vector_rotation_matrix(twin.angle, rotation_vector)
+        matrices.append(rotation @ matrices[-1])
+        translations.append(rotation @ (translations[-1] - point) + point)
+    matrices = np.array(matrices)
+    translations = np.array(translations)
+    atoms = supercell.cartesian
+    inverse = np.linalg.inv(vector_space)
+    fractional = atoms['coordinates'] @ inverse.T
+    lowest = np.min(fractional, axis=0) - 1e-8
+    highest = np.max(fractional, axis=0) + 1e-8
+    twinned = []
+    for start in range(0, atoms.shape[0], chunk_size):
+        chunk = atoms[start:start+chunk_size]
+        images = (np.matmul(chunk['coordinates'], matrices.transpose(0, 2, 1))
+                  + translations[:, None])
+        image_heights = images @ normal
+        slabs = np.searchsorted(offsets, image_heights - 1e-8)
+        keep = slabs == np.arange(len(twins)+1)[:, None]
+        image_fractional = images @ inverse.T
+        keep &= np.all((image_fractional > lowest)
+                       & (image_fractional < highest), axis=2)
+        for slab in range(len(twins)+1):
+            slab_atoms = chunk[keep[slab]]
+            slab_atoms['coordinates'] = images[slab][keep[slab]]
+            twinned.append(slab_atoms)
+    supercell.cartesian = np.concatenate(twinned)
+    supercell.set_fractional()
+    if overlap is not None:
+        remove_overlaps(supercell, overlap, merge=True)
+
+
+@dataclass
+class Dislocation():
+    '''
+    A straight dislocation line through a point along a line direction, or,
+    given a radius, a circular loop centred on the point with the line
+    direction as its normal and its line running anticlockwise about it.
+    Point, line, and Burgers vector are cartesian.
+
+    half_plane decides how atoms are added or removed: None leaves the atom
+    count unchanged, with the cut on the glide plane of a straight line.
+    'insert' adds the extra half-plane of a straight line's edge component
+    on the +y side, 'remove' takes one out on the -y side; x is along the
+    edge component and z along the line. Loops with a Burgers vector
+    component along their normal need the disc of atoms inside them inserted
+    or removed, whichever the loop's sense requires.
+    '''
+    point: np.ndarray
+    line: np.ndarray
+    burgers: np.ndarray
+    radius: float = None
+    half_plane: str = None
+
+    def __post_init__(self):
+        if self.half_plane not in [None, 'insert', 'remove']:
+            raise ValueError(
+                f"Unknown half plane option: '{self.half_plane}'.")
+        self.point = np.array(self.point, dtype=float)
+        self.line = linalg.normalise(np.array(self.line, dtype=float))
+        self.burgers = np.array(self.burgers, dtype=float)
+
+
+def normal_axis(vector):
+    '''
+    Returns a unit vector normal to the given vector, the x axis or else the
+    y axis with the component along the vector removed.
+    '''
+    vector = linalg.normalise(vector)
+    normal = np.array([1., 0, 0]) - vector[0]*vector
+    if np.linalg.norm(normal) < 1e-8:
+        normal = np.array([0, 1., 0]) - vector[1]*vector
+    return linalg.normalise(normal)
+
+
+def dislocation_frame(dislocation):
+    '''
+    Returns the unit x, y, and z axes of a dislocation as rows: z along the
+    line, x along the edge component of the Burgers vector, or any direction
+    normal to the line for a pure screw.
+    '''
+    z_axis = dislocation.line
+    edge = dislocation.burgers - (dislocation.burgers @ z_axis)*z_axis
+    if np.linalg.norm(edge) < 1e-8:
+        x_axis = normal_axis(z_axis)
+    else:
+        x_axis = linalg.normalise(edge)
+    return np.array([x_axis, np.cross(z_axis, x_axis), z_axis])
+
+
+def straight_displacement(coordinates, dislocation, poisson, cut):
+    '''
+    Isotropic elastic displacements of a straight dislocation at cartesian
+    coordinates, from Hirth and Lothe. The displacements
+    jump by the Burgers vector across the half-plane from the line along the
+    cut direction, given in the dislocation frame's xy plane.
+    '''
+    frame = dislocation_frame(dislocation)
+    local = (coordinates - dislocation.point) @ frame.T
+    x, y = local[:, 0], local[:, 1]
+    # Angle about the line, measured so its branch cut lies along the cut.
+    theta = np.arctan2(x*cut[1] - y*cut[0], -(x*cut[0] + y*cut[1]))
+    squared = np.maximum(x**2 + y**2, 1e-20)
+    edge = dislocation.burgers @ frame[0]
+    screw = dislocation.burgers @ frame[2]
+    displacements = np.zeros(local.shape)
+    displacements[:, 0] = edge/(2*np.pi)*(
+        theta + x*y/(2*(1-poisson)*squared))
+    displacements[:, 1] = -edge/(2*np.pi)*(
+        (1-2*poisson)/(4*(1-poisson))*np.log(squared)
+        + (x**2 - y**2)/(4*(1-poisson)*squared))
+    displacements[:, 2] = screw/(2*np.pi)*theta
+    return displacements @ frame
+
+
+def loop_vertices(dislocation, segments):
+    '''
+    Returns the vertices of the polygon of segments approximating a circular
+    loop, anticlockwise about its normal, with the first repeated at the end.
+    '''
+    first = normal_axis(dislocation.line)
+    second = np.cross(dislocation.line, first)
+    angles = np.linspace(0, 2*np.pi, segments+1)
+    return dislocation.point + dislocation.radius*(
+        np.outer(np.cos(angles), first) + np.outer(np.sin(angles), second))
+
+
+def vertex_distances(coordinates, vertices):
+    '''
+    Distances from every coordinate to every vertex, as a matrix product.
+    '''
+    squared = (np.sum(coordinates**2, axis=1)[:, None]
+               - 2*coordinates @ vertices.T + np.sum(vertices**2, axis=1))
+    return np.sqrt(np.maximum(squared, 0))
+
+
+def solid_angle(coordinates, vertices, centre, distances=None):
+    '''
+    Solid angle subtended by a closed polygon at cartesian coordinates, as a
+    fan of triangles from the centre, Van Oosterom and Strackee's formula.
+    The triple and dot products are expanded into matrix products over the
+    segments, rather than formed for every coordinate and segment pair.
+    '''
+    if distances is None:
+        distances = vertex_distances(coordinates, vertices)
+    starts, ends = vertices[:-1], vertices[1:]
+    squared = np.sum(coordinates**2, axis=1)[:, None]
+    centre_distances = np.linalg.norm(centre - coordinates, axis=1)[:, None]
+    start_distances, end_distances = distances[:, :-1], distances[:, 1:]
+    areas = np.cross(starts, ends)
+    numerator = (areas @ centre - coordinates @ (
+        np.cross(ends - starts, centre) + areas).T)
+    centre_start = (starts @ centre - coordinates @ (centre + starts).T
+                    + squared)
+    centre_end = ends @ centre - coordinates @ (centre + ends).T + squared
+    start_end = (np.sum(starts*ends, axis=1)
+                 - coordinates @ (starts + ends).T + squared)
+    denominator = (centre_distances*start_distances*end_distances
+                   + centre_start*end_distances + centre_end*start_distances
+                   + start_end*centre_distances)
+    return np.sum(2*np.arctan2(numerator, denominator), axis=1)
+
+
+def loop_displacement(coordinates, dislocation, poisson, segments):
+    '''
+    Isotropic elastic displacements of a dislocation loop at cartesian
+    coordinates from Burgers' formula, with the line integrals evaluated
+    exactly over the segments of a polygon. The displacements jump by the
+    Burgers vector across the disc inside the loop.
+    '''
+    burgers = dislocation.burgers
+    # Relative to the centre, the expanded products then keep precision.
+    coordinates = coordinates - dislocation.point
+    vertices = loop_vertices(dislocation, segments) - dislocation.point
+    starts, ends = vertices[:-1], vertices[1:]
+    tangents = linalg.normalise(ends - starts)
+    distances = vertex_distances(coordinates, vertices)
+    start_length, end_length = distances[:, :-1], distances[:, 1:]
+    along = coordinates @ tangents.T
+    start_term = np.maximum(
+        start_length + np.sum(starts*tangents, axis=1) - along, 1e-20)
+    end_term = np.maximum(
+        end_length + np.sum(ends*tangents, axis=1) - along, 1e-20)
+    # Integral of 1/R along each segment.
+    integrals = np.log(end_term/start_term)
+    omega = solid_angle(coordinates, vertices, np.zeros(3), distances)
+    displacements = np.outer(omega, burgers)/(4*np.pi)
+    displacements -= integrals @ np.cross(burgers, tangents)/(4*np.pi)
+    normals = np.cross(tangents, burgers)
+    heights = np.sum(normals*starts, axis=1) - coordinates @ normals.T
+    # Heights times the gradients of the integrals, expanded by vertex.
+    start_weights = heights/(start_term*np.maximum(start_length, 1e-20))
+    end_weights = heights/(end_term*np.maximum(end_length, 1e-20))
+    gradient = (start_weights @ starts - end_weights @ ends
+                - (np.sum(start_weights, axis=1)
+                   - np.sum(end_weights, axis=1))[:, None]*coordinates
+                + (heights/start_term - heights/end_term) @ tangents)
+    displacements += (gradient - integrals @ normals)/(8*np.pi*(1-poisson))
+    return displacements
+
+
+# Direction of the cut from a straight line, in its frame's xy plane.
+CUT_DIRECTIONS = {None: [-1, 0], 'insert': [0, 1], 'remove': [0, -1]}
+
+
+def dislocation_cut(dislocation, segments):
+    '''
+    Returns the unit normal of a dislocation's cut surface and the jump in
+    displacement from its negative to its positive side, the Burgers vector
+    or its negative. The cut opens, needing atoms inserted, if the jump has a
+    positive component along the normal.
+    '''
+    if dislocation.radius is None:
+        frame = dislocation_frame(dislocation)
+        if dislocation.half_plane == 'remove':
+            return (frame[0], -dislocation.burgers)
+        return (frame[0], dislocation.burgers)
+    normal = dislocation.line
+    step = 1e-3*dislocation.radius*normal
+    vertices = loop_vertices(dislocation, segments)
+    omega = solid_angle(np.array([dislocation.point + step,
+                                  dislocation.point - step]),
+                        vertices, dislocation.point)
+    sense = np.round((omega[0] - omega[1])/(4*np.pi))
+    return (normal, sense*dislocation.burgers)
+
+
+def cut_region(coordinates, dislocation):
+    '''
+    Returns a boolean array, True for the coordinates whose projection lies
+    on the cut surface: the half-plane of a straight line, or the disc of a
+    loop.
+    '''
+    relative = coordinates - dislocation.point
+    if dislocation.radius is None:
+        frame = dislocation_frame(dislocation)
+        direction = CUT_DIRECTIONS[dislocation.half_plane]
+        return (relative @ frame[:2].T) @ direction > 0
+    heights = relative @ dislocation.line
+    radial = relative - np.outer(heights, dislocation.line)
+    return np.linalg.norm(radial, axis=1) < dislocation.radius
+
+
+def insert_dislocations(supercell, dislocations, poisson=0.3, segments=64,
+                        chunk_size=ce.CHUNK_SIZE):
+    '''
+    Inserts one or more dislocations into a supercell by superposing their
+    isotropic elastic (Volterra) displacement fields, see the Dislocation
+    dataclass. Atoms are removed or inserted on the cut surfaces first, then
+    the displacements of every dislocation are summed over chunks of atoms
+    in one pass. Loops are approximated by polygons of segments. Returns the
+    change in the number of atoms.
+    '''
+    if not isinstance(dislocations, list):
+        dislocations = [dislocations]
+    if supercell.cartesian is None: supercell.set_cartesian()
+    atoms = supercell.cartesian
+    before = atoms.shape[0]
+    cuts = [dislocation_cut(dislocation, segments)
+            for dislocation in dislocations]
+    keep = np.ones(atoms.shape[0], dtype=bool)
+    inserted = []
+    for index, (dislocation, (normal, jump)) in enumerate(
+            zip(dislocations, cuts)):
+        if dislocation.half_plane is None and dislocation.radius is None:
+            continue
+        width = jump @ normal
+        if abs(width) < 1e-8:
+            if dislocation.half_plane is not None:
+                raise ValueError("A pure screw dislocation has no extra "
+                                 "half-plane to insert or remove.")
+            continue
+        if dislocation.radius is not None:
+            option = 'insert' if width > 0 else 'remove'
+            if dislocation.half_plane not in [None, option]:
+                raise ValueError(
+                    f"The sense of this loop requires the disc of atoms "
+                    f"inside it to be {option}ed, not "
+                    f"{dislocation.half_plane}d.")
+        heights = (atoms['coordinates'] - dislocation.point) @ normal
+        region = cut_region(atoms['coordinates'], dislocation)
+        if width < 0:
+            keep &= np.invert(region & (heights >= width/2)
+                              & (heights < -width/2))
+        else:
+            inserted.append(
+                (index, region & (heights >= 0) & (heights < width)))
+    # Copies of the slab next to an opening cut, moved into the gap.
+    new_atoms = [atoms[keep]]
+    owners = [np.full(new_atoms[0].shape[0], -1)]
+    for index, mask in inserted:
+        copies = atoms[mask & keep]
+        copies['coordinates'] -= cuts[index][1]/2
+        new_atoms.append(copies)
+        owners.append(np.full(copies.shape[0], index))
+    atoms = np.concatenate(new_atoms)
+    owners = np.concatenate(owners)
+    coordinates = atoms['coordinates']
+    rows = chunk_size
+    if any(dislocation.radius is not None for dislocation in dislocations):
+        rows = max(1, chunk_size//segments)
+    displaced = coordinates.copy()
+    for start in range(0, coordinates.shape[0], rows):
+        chunk = coordinates[start:start+rows]
+        chunk_owners = owners[start:start+rows]
+        for index, dislocation in enumerate(dislocations):
+            normal, jump = cuts[index]
+            if dislocation.radius is None:
+                displacements = straight_displacement(
+                    chunk, dislocation, poisson,
+                    CUT_DIRECTIONS[dislocation.half_plane])
+            else:
+                displacements = loop_displacement(
+                    chunk, dislocation, poisson, segments)
+            # Inserted atoms fill the opened cut, so lose its half jump.
+            owned = chunk_owners == index
+            sides = np.where(
+                (chunk[owned] - dislocation.point) @ normal >= 0, 1, -1)
+            displacements[owned] -= np.outer(sides, jump)/2
+            displaced[start:start+rows] += displacements
+    atoms['coordinates'] = displaced
+    supercell.cartesian = atoms
+    supercell.set_fractional()
+    return atoms.shape[0] - before
+
+
+@dataclass
+class PlanarFault():
+    '''
+    A planar fault, such as a stacking fault or antiphase boundary, through
+    a point on a plane given by its (hkl) miller indices. Atoms on the
+    positive side of the plane are moved by the fault vector, a lattice
+    direction like [1/6, 1/6, -1/3], and/or have their elements swapped by
+    the swap dictionary, e.g. {'Fe': 'Pt', 'Pt': 'Fe'}. Point and vector are
+    fractional, as in the Reflection dataclass.
+    '''
+    point: np.ndarray
+    plane: np.ndarray
+    vector: np.ndarray = None
+    swap: dict = None
+
+    def __post_init__(self):
+        if self.vector is None and not self.swap:
+            raise ValueError("A planar fault needs a vector or a swap.")
+        self.point = np.array(self.point, dtype=float)
+        if self.vector is not None:
+            self.vector = np.array(self.vector, dtype=float)
+
+
+def insert_planar_faults(supercell, faults, overlap=None, periodic=False):
+    '''
+    Inserts one or more planar faults into a supercell, see the PlanarFault
+    dataclass. Every fault is one masked operation on the atoms on its
+    positive side, and faults are applied in order, so atoms beyond several
+    planes are moved and swapped by each. Where planes meet, atoms closer
+    than the cartesian overlap are removed, keeping the atom moved by fewer
+    faults. Returns the number of atoms removed.
+
+    Open structures and cut grains are left as they are. If periodic, moved
+    atoms are wrapped back into the supercell, measured from the corner of
+    its atoms, and overlaps are also found across its edges, which needs an
+    orthogonal supercell.
     '''
-    rotated_supercell = copy.deepcopy(supercell)
-    transforms.translate(rotated_supercell, -twin.point)
-    transforms.rotate(supercell, twin.rotation_vector)
+    if not isinstance(faults, list):
+        faults = [faults]
+    if supercell.cartesian is None: supercell.set_cartesian()
+    atoms = supercell.cartesian.copy()
+    vector_space = np.array(supercell.vector_space, dtype=float)
+    cell = np.column_stack([supercell.a_side_vector, supercell.b_side_vector,
+                            supercell.c_side_vector]).astype(float)
+    orthogonal = np.allclose(cell, np.diag(np.diag(cell)))
+    if periodic and overlap is not None and not orthogonal:
+        raise ValueError("Overlaps across the edge of a sheared supercell "
+                         "cannot be resolved.")
+    # The supercell's origin, as its atoms may have been translated.
+    origin = np.min(np.round(np.linalg.solve(
+        cell, atoms['coordinates'].T).T, 10), axis=0, initial=np.inf)
+    moved = np.zeros(atoms.shape[0], dtype=int)
+    for fault in faults:
+        normal = crystallography.cartesian_plane_normal(vector_space,
+                                                        fault.plane)
+        heights = (atoms['coordinates'] - vector_space @ fault.point) @ normal
+        side = heights > 1e-8
+        if fault.vector is not None:
+            atoms['coordinates'][side] += vector_space @ fault.vector
+            moved += side
+        if fault.swap:
+            elements = atoms['element'][side]
+            swapped = elements.copy()
+            for old, new in fault.swap.items():
+                swapped[elements == old] = new
+            atoms['element'][side] = swapped
+    if periodic and np.any(moved > 0):
+        # Rounded so atoms moved onto the cell's faces wrap to the lower face.
+        wrapped = np.round(np.linalg.solve(
+            cell, atoms['coordinates'][moved > 0].T).T - origin, 10) % 1
+        atoms['coordinates'][moved > 0] = (wrapped + origin) @ cell.T
+    removed = 0
+    if overlap is not None:
+        order = np.argsort(moved, kind='stable')
+        points = atoms['coordinates'][order]
+        box = None
+        if periodic:
+            box = np.diag(cell)
+            points = np.round(points - cell @ origin, 10) % box
+        keep = np.zeros(atoms.shape[0], dtype=bool)
+        keep[order] = ce.overlap_mask(points, overlap, policy='first',
+                                      box=box)
+        atoms = atoms[keep]
+        removed = np.sum(np.invert(keep))
+    supercell.cartesian = atoms
+    supercell.set_fractional()
+    return int(removed)
+
+
+def interstitial_sites(unitcell, tolerance=0.01):
+    '''
+    Finds the largest holes of a unitcell's crystal, the vertices of the
+    Voronoi tessellation of its atoms that are furthest from any atom, e.g.
+    the octahedral sites of FCC and the tetrahedral sites of BCC. Returns
+    their fractional coordinates in the unitcell and the hole radius. Holes
+    within the relative tolerance of the largest are all returned.
+    '''
+    vector_space = np.array(unitcell.vector_space, dtype=float)
+    vertices = spatial.Voronoi(unitcell_images(unitcell)).vertices
+    fractional = np.round(vertices @ np.linalg.inv(vector_space).T, 6)
+    inside = np.all((fractional >= 0) & (fractional < 1), axis=1)
+    fractional = np.unique(fractional[inside], axis=0)
+    radii = hole_radii(unitcell, fractional)
+    largest = radii >= np.max(radii)*(1 - tolerance)
+    return (fractional[largest], np.max(radii))
+
+
+def unitcell_images(unitcell):
+    '''
+    Cartesian coordinates of a unitcell's atoms and their images in the 26
+    neighbouring unitcells.
+    '''
+    basis = np.concatenate([atom.fractional for atom in unitcell.atoms])
+    shifts = np.indices((3, 3, 3)).reshape(3, -1).T - 1
+    images = (shifts[:, None] + basis['coordinates']).reshape(-1, 3)
+    return images @ np.array(unitcell.vector_space, dtype=float).T
+
+
+def hole_radii(unitcell, sites):
+    '''
+    Distance from each fractional site of a unitcell to its nearest atom.
+    '''
+    vector_space = np.array(unitcell.vector_space, dtype=float)
+    tree = spatial.cKDTree(unitcell_images(unitcell))
+    return tree.query(np.mod(sites, 1) @ vector_space.T)[0]
+
+
+def candidate_interstitials(supercell, sites, radius):
+    '''
+    Tiles fractional interstitial sites of the supercell's unitcell over the
+    supercell's lattice, returning the cartesian sites surrounded by as many
+    atoms at the hole radius as in the perfect crystal, so sites outside the
+    shape of a cut grain, or on its surface, are left out.
+    '''
+    fractional = supercell.fractional
+    coordinates = fractional['coordinates']
+    # The lattice may have been translated by a fraction of a unitcell.
+    first = supercell.unitcell.atoms[0].fractional[0]
+    matches = fractional['element'] == first['element']
+    offset = np.mod(coordinates[np.argmax(matches)] - first['coordinates'], 1)
+    lower = np.floor(np.min(coordinates, axis=0)).astype(int) - 1
+    upper = np.ceil(np.max(coordinates, axis=0)).astype(int) + 1
+    cells = np.stack(np.meshgrid(*[np.arange(low, high) for low, high
+                                   in zip(lower, upper)], indexing='ij'),
+                     axis=-1).reshape(-1, 3)
+    candidates = (cells[:, None] + sites + offset).reshape(-1, 3)
+    candidates = candidates @ np.array(supercell.vector_space).T
+    shell = radius*1.05
+    perfect = spatial.cKDTree(unitcell_images(supercell.unitcell))
+    vector_space = np.array(supercell.unitcell.vector_space, dtype=float)
+    coordination = perfect.query_ball_point(
+        np.mod(sites, 1) @ vector_space.T, shell, return_length=True)
+    if supercell.cartesian is None: supercell.set_cartesian()
+    tree = spatial.cKDTree(supercell.cartesian['coordinates'])
+    neighbours = tree.query_ball_point(candidates, shell, return_length=True)
+    nearest = tree.query(candidates, distance_upper_bound=shell)[0]
+    complete = neighbours == np.tile(coordination, cells.shape[0])
+    return candidates[complete & (nearest > radius*0.95)]
+
+
+def antisite_counts(composition, pairs):
+    '''
+    Shares out the sites of a number of antisite pairs among the elements in
+    proportion to their composition, with no element given more than one
+    site per pair, so every pair can swap two different elements.
+    '''
+    composition = np.array(composition, dtype=float)
+    total = 2*pairs
+    if composition.shape[0] < 2 or pairs == 0:
+        if pairs: raise ValueError("Antisites need at least two elements.")
+        return np.zeros(composition.shape[0], dtype=int)
+    limit = np.minimum(pairs, composition).astype(int)
+    shares = np.zeros(composition.shape[0], dtype=int)
+    while np.sum(shares) < total:
+        open_elements = shares < limit
+        if not np.any(open_elements): break
+        wanted = (total - np.sum(shares))*composition*open_elements
+        wanted = wanted/np.sum(composition*open_elements)
+        # At least one site for the most wanted element, so this ends.
+        step = np.floor(wanted).astype(int)
+        step[np.argmax(wanted)] = max(1, step[np.argmax(wanted)])
+        shares = np.minimum(shares + step, limit)
+    return shares
+
+
+def insert_point_defects(supercell, vacancies=0, antisites=0, interstitials=0,
+                         interstitial_element=None, sites=None,
+                         separation=None, seed=None):
+    '''
+    Places point defects at random in a supercell, at concentrations given
+    as fractions of its atoms. Vacancies remove atoms. Antisites swap the
+    elements of pairs of atoms of different elements, keeping the
+    composition, with the sites shared among the elements by composition.
+    Interstitials add atoms of the interstitial element at the
+    unitcell's largest holes, or at the given fractional sites of the
+    unitcell.
+
+    No two defects are closer than the cartesian separation, counting every
+    atom of an antisite pair, and picks are reproducible from the seed.
+    Returns a dictionary of the cartesian positions of the vacancies,
+    antisites, and interstitials.
+    '''
+    rng = np.random.default_rng(seed)
+    if supercell.cartesian is None: supercell.set_cartesian()
+    atoms = supercell.cartesian
+    coordinates = atoms['coordinates']
+    counts = np.round(np.array([vacancies, antisites, interstitials])
+                      * atoms.shape[0]).astype(int)
+    candidates = np.zeros((0, 3))
+    if counts[2]:
+        if interstitial_element is None:
+            raise ValueError("Give the element of the interstitials.")
+        if sites is None:
+            sites, radius = interstitial_sites(supercell.unitcell)
+        else:
+            sites = np.array(sites, dtype=float).reshape(-1, 3)
+            radius = np.min(hole_radii(supercell.unitcell, sites))
+        candidates = candidate_interstitials(supercell, sites, radius)
+    grid = None
+    if separation:
+        grid = ce.SeparationGrid(np.concatenate((coordinates, candidates)),
+                                 separation)
+    vacant = ce.separated_sample(coordinates, counts[0], separation, rng,
+                                 grid=grid)
+    available = np.ones(atoms.shape[0], dtype=bool)
+    available[vacant] = False
+    species, composition = np.unique(atoms['element'][available],
+                                     return_counts=True)
+    swapped = []
+    for element, number in zip(species, antisite_counts(composition,
+                                                        counts[1]//2)):
+        indexes = np.flatnonzero(available
+                                 & (atoms['element'] == element))
+        picked = ce.separated_sample(coordinates[indexes], number,
+                                     separation, rng, grid=grid)
+        swapped.append(indexes[picked])
+    swapped = np.concatenate(swapped) if swapped else np.zeros(0, dtype=int)
+    # Sorted by element, pairing each site with the one half way along
+    # pairs different elements, unless separation left a species short.
+    half = swapped.shape[0]//2
+    firsts, seconds = swapped[:half], swapped[half:2*half]
+    differ = atoms['element'][firsts] != atoms['element'][seconds]
+    firsts, seconds = firsts[differ], seconds[differ]
+    elements = atoms['element'].copy()
+    elements[firsts], elements[seconds] = (atoms['element'][seconds],
+                                           atoms['element'][firsts])
+    added = ce.separated_sample(candidates, counts[2], separation, rng,
+                                grid=grid)
+    keep = np.ones(atoms.shape[0], dtype=bool)
+    keep[vacant] = False
+    new_atoms = atoms.copy()
+    new_atoms['element'] = elements
+    interstitial_atoms = np.zeros(added.shape[0], dtype=atoms.dtype)
+    interstitial_atoms['element'] = interstitial_element or ''
+    interstitial_atoms['coordinates'] = candidates[added]
+    supercell.cartesian = np.concatenate((new_atoms[keep],
+                                          interstitial_atoms))
+    supercell.set_fractional()
+    return {'vacancies': coordinates[vacant],
+            'antisites': coordinates[np.concatenate((firsts, seconds))],
+            'interstitials': candidates[added]}
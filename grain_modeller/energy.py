@@ -0,0 +1,207 @@
+'''
+Name:
+    Energy
+Description:
+    Evaluates Morse pair potential energies, and optionally forces, inside the
+    package for quick screening, e.g. ranking interface shifts, without
+    launching LAMMPS. Parameters are read once from the Morse section of the
+    Potentials file, lines like "Fe Fe: [D, alpha, r0, cutoff]", into arrays
+    indexed by element type pairs, so every pair in a chunk is evaluated in
+    one vectorised step.
+
+        E(r) = D*(exp(-2*alpha*(r - r0)) - 2*exp(-alpha*(r - r0))), r < cutoff
+
+    Pairs are found with KD-trees for chunks of atoms at a time, periodic
+    along every axis of an orthogonal box when one is given.
+'''
+import os
+import numpy as np
+from scipy import spatial
+import cartesian_edits as ce
+
+POTENTIALS_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                               'Potentials')
+
+
+def read_morse(file_name=POTENTIALS_FILE):
+    '''
+    Reads the Morse section of a potentials file into a dictionary from
+    element pairs, both orders, to their parameters (D, alpha, r0, cutoff).
+    '''
+    with open(file_name, 'r') as file:
+        lines = file.read().split('\n')
+    start = lines.index('POTENTIAL_TYPE: Morse') + 1
+    end = lines[start:].index('POTENTIAL_LIST_END') + start
+    parameters = {}
+    for line in lines[start:end]:
+        if not line.strip():
+            continue
+        pair, values = line.split(':')
+        first, second = pair.split()
+        values = [float(value) for value in values.strip()[1:-1].split(',')]
+        parameters[(first, second)] = values
+        parameters[(second, first)] = values
+    return parameters
+
+
+class Morse():
+
+    def __init__(self, elements, parameters=None):
+        '''
+        Instantiate a Morse potential for a list of elements, with parameters
+        from read_morse, by default those of the package's Potentials file.
+        Raises a ValueError if any pair of the elements has no parameters.
+        '''
+        if parameters is None:
+            parameters = read_morse()
+        self.elements = np.unique(elements)
+        number = self.elements.shape[0]
+        table = np.zeros((number, number, 4))
+        for first, element_1 in enumerate(self.elements):
+            for second, element_2 in enumerate(self.elements):
+                key = (str(element_1), str(element_2))
+                if key not in parameters:
+                    raise ValueError(f"There is no Morse potential for "
+                                     f"{element_1} {element_2}.")
+                table[first, second] = parameters[key]
+        self.depth, self.alpha, self.distance, self.cutoffs = (
+            np.moveaxis(table, 2, 0))
+        self.cutoff = np.max(self.cutoffs)
+
+    def __repr__(self):
+        return f"Morse({self.elements.tolist()})"
+
+    def types(self, elements):
+        types = np.searchsorted(self.elements, elements)
+        types = np.minimum(types, self.elements.shape[0] - 1)
+        if np.any(self.elements[types] != elements):
+            raise ValueError("Elements are missing from the potential.")
+        return types
+
+    def pair_energies(self, first, second, distances, forces=False):
+        '''
+        Energies of pairs of atom types at the given distances, zero beyond
+        the cutoff of the pair, and with forces the derivatives dE/dr.
+        '''
+        cutoffs = self.cutoffs[first, second]
+        alpha = self.alpha[first, second]
+        depth = self.depth[first, second]
+        exponential = np.exp(-alpha*(distances - self.distance[first, second]))
+        inside = distances < cutoffs
+        energies = np.where(inside, depth*(exponential**2 - 2*exponential), 0)
+        if not forces:
+            return energies
+        derivatives = np.where(
+            inside, 2*alpha*depth*(exponential - exponential**2), 0)
+        return (energies, derivatives)
+
+
+def pairs_within(coordinates, other, cutoff, box=None, start=0, tree=None):
+    '''
+    Pairs closer than the cutoff between a chunk of coordinates and all
+    coordinates, as indexes into each and the separation vectors, leaving out
+    atoms paired with themselves when the chunk starts at index start of the
+    other coordinates. A KD-tree of the other coordinates, built with the same
+    box, is reused if given, so only the chunk's tree is built per call.
+    '''
+    chunk_tree = spatial.cKDTree(coordinates, boxsize=box)
+    if tree is None:
+        tree = spatial.cKDTree(other, boxsize=box)
+    pairs = chunk_tree.sparse_distance_matrix(tree, cutoff,
+                                              output_type='ndarray')
+    rows, columns = pairs['i'].astype(np.int64), pairs['j'].astype(np.int64)
+    if start is not None:
+        different = rows + start != columns
+        rows, columns = rows[different], columns[different]
+    separations = other[columns] - coordinates[rows]
+    if box is not None:
+        separations -= np.around(separations/box)*box
+    return (rows, columns, separations)
+
+
+def morse_energy(coordinates, elements, potential=None, box=None,
+                 forces=False, chunk_size=20000):
+    '''
+    Returns the per-atom energies, half of each pair energy going to either
+    atom, the total energy, and with forces an (N, 3) array of forces.
+    Coincident atoms have no separation direction, so their pairs add their
+    energy at zero distance but no force.
+
+    potential: Morse potential, by default made for the elements present.
+    box: Side lengths of an orthogonal periodic box starting at the origin.
+    chunk_size: Number of atoms whose pairs are found at once.
+    '''
+    coordinates = np.asarray(coordinates, dtype=float)
+    if potential is None:
+        potential = Morse(np.unique(elements))
+    types = potential.types(np.asarray(elements))
+    if box is not None:
+        box = np.array(box, dtype=float)
+        coordinates = ce.wrap(coordinates, box)
+    atom_energies = np.zeros(coordinates.shape[0])
+    atom_forces = np.zeros((coordinates.shape[0], 3))
+    tree = spatial.cKDTree(coordinates, boxsize=box)
+    for start in range(0, coordinates.shape[0], chunk_size):
+        chunk = coordinates[start:start+chunk_size]
+        rows, columns, separations = pairs_within(
+            chunk, coordinates, potential.cutoff, box, start, tree)
+        distances = np.sqrt(np.einsum('ij,ij->i', separations, separations))
+        result = potential.pair_energies(types[rows + start], types[columns],
+                                         distances, forces)
+        energies = result[0] if forces else result
+        atom_energies[start:start+chunk.shape[0]] = np.bincount(
+            rows, energies, minlength=chunk.shape[0])/2
+        if forces:
+            scales = np.divide(result[1], distances,
+                               out=np.zeros(distances.shape[0]),
+                               where=distances > 0)
+            pulls = separations*scales[:, None]
+            for axis in range(3):
+                atom_forces[start:start+chunk.shape[0], axis] = np.bincount(
+                    rows, pulls[:, axis], minlength=chunk.shape[0])
+    if forces:
+        return (atom_energies, np.sum(atom_energies), atom_forces)
+    return (atom_energies, np.sum(atom_energies))
+
+
+def supercell_energy(supercell, potential=None, box=None, forces=False,
+                     chunk_size=20000):
+    '''
+    Morse energies of a supercell's atoms, see morse_energy.
+    '''
+    if supercell.cartesian is None: supercell.set_cartesian()
+    atoms = supercell.cartesian
+    return morse_energy(atoms['coordinates'], atoms['element'], potential,
+                        box, forces, chunk_size)
+
+
+def interaction_energies(fixed, moving, shifts, potential=None, box=None):
+    '''
+    Energy between two blocks of atoms, tuples of coordinates and elements,
+    for every shift of the moving block, e.g. to rank the relative shifts of
+    two crystals across an interface. The energy within each block does not
+    change with the shift, so only pairs across the blocks are evaluated.
+    '''
+    fixed_coordinates, fixed_elements = fixed
+    moving_coordinates, moving_elements = moving
+    if potential is None:
+        potential = Morse(np.unique(np.concatenate((fixed_elements,
+                                                    moving_elements))))
+    fixed_types = potential.types(np.asarray(fixed_elements))
+    moving_types = potential.types(np.asarray(moving_elements))
+    fixed_coordinates = np.asarray(fixed_coordinates, dtype=float)
+    if box is not None:
+        box = np.array(box, dtype=float)
+        fixed_coordinates = ce.wrap(fixed_coordinates, box)
+    # The fixed block never moves, so its tree is built once for all shifts.
+    tree = spatial.cKDTree(fixed_coordinates, boxsize=box)
+    energies = []
+    for shift in np.atleast_2d(shifts):
+        shifted = np.asarray(moving_coordinates, dtype=float) + shift
+        if box is not None: shifted = ce.wrap(shifted, box)
+        rows, columns, separations = pairs_within(
+            shifted, fixed_coordinates, potential.cutoff, box, None, tree)
+        distances = np.sqrt(np.einsum('ij,ij->i', separations, separations))
+        energies.append(np.sum(potential.pair_energies(
+            moving_types[rows], fixed_types[columns], distances)))
+    return np.array(energies)
@@ -0,0 +1,104 @@
+'''
+Name:
+    Ensemble
+Description:
+    Contains the OrientationEnsemble class, which represents many rotated
+    copies of one supercell for orientation averaged studies. The base
+    coordinates are stored once with a stack of rotation matrices, members are
+    only built when asked for, one at a time or in batches.
+'''
+import copy
+import os
+import numpy as np
+from scipy.spatial.transform import Rotation as R
+import file_formatter as ff
+
+# Largest batch of rotated coordinates produced at once, in bytes.
+BATCH_BYTES = 256*1024**2
+
+
+class OrientationEnsemble():
+
+    def __init__(self, supercell, rotations):
+        '''
+        Instantiate an ensemble of a supercell under a stack of rotation
+        matrices, a numpy array of shape (K, 3, 3). The supercell is the
+        shared base of every member and should not be edited afterwards.
+        Rotations are applied to cartesian coordinates around the origin, as
+        in transforms.rotate.
+        '''
+        rotations = np.array(rotations, dtype=float)
+        if rotations.ndim == 2: rotations = rotations[None]
+        if rotations.shape[1:] != (3, 3):
+            raise ValueError(
+                f"Rotations have shape {rotations.shape}, expected (K, 3, 3).")
+        self.supercell = supercell
+        self.rotations = rotations
+        if supercell.cartesian is None: supercell.set_cartesian()
+        self.coordinates = supercell.cartesian['coordinates']
+
+    @classmethod
+    def random(cls, supercell, number, seed=None):
+        '''
+        Instantiate an ensemble of a number of uniformly random orientations.
+        '''
+        rotations = R.random(number, random_state=seed).as_matrix()
+        return cls(supercell, rotations)
+
+    def __len__(self):
+        return self.rotations.shape[0]
+
+    def __repr__(self):
+        return (f"OrientationEnsemble({repr(self.supercell)}, "
+                f"<{len(self)} rotations>)")
+
+    def member(self, index):
+        '''
+        Returns the rotated cartesian coordinates of one member.
+        '''
+        return self.coordinates @ self.rotations[index].T
+
+    def batches(self, batch_size=None):
+        '''
+        Yields the index of the first member in each batch, and the rotated
+        cartesian coordinates of the batch as a (B, N, 3) array made with a
+        single batched matrix multiplication. By default batches are as large
+        as fits in BATCH_BYTES.
+        '''
+        if batch_size is None:
+            member_bytes = self.coordinates.size*8
+            batch_size = max(1, BATCH_BYTES//max(1, member_bytes))
+        for start in range(0, len(self), batch_size):
+            rotations = self.rotations[start:start+batch_size]
+            yield (start, self.coordinates @ rotations.transpose(0, 2, 1))
+
+    def member_supercell(self, index):
+        '''
+        Builds an independent SuperCell of one member, with the rotation
+        applied to its vector space as transforms.rotate would.
+        '''
+        member = copy.copy(self.supercell)
+        member._fractional = self.supercell.fractional.copy()
+        member._cartesian = None
+        member.transform(self.rotations[index])
+        return member
+
+    def write(self, file_name, template='LAMMPS_data_file',
+              directory='file_templates'):
+        '''
+        Writes one file per member using a file_formatter template. File name
+        is formatted with the member index, e.g. 'grain_{}.lmp'. Members are
+        built and written one at a time, so only one is ever held in memory.
+        Returns the list of file names written.
+        '''
+        file_names = []
+        for index in range(len(self)):
+            member = self.member_supercell(index)
+            text = ff.format_file(member, template, directory)
+            name = file_name.format(index)
+            folder = os.path.dirname(name)
+            if folder: os.makedirs(folder, exist_ok=True)
+            with open(name, 'w') as file:
+                file.write(text)
+            file_names.append(name)
+        return file_names
@@ -6,13 +6,17 @@ Description:
     for example: LAMMPS data files, xyz files, and LAMMPS input scripts.
 '''
 import os
+import io
 import re
 import grain_creation as gc
 import numpy as np
 import utility
 from supercell import SuperCell
+from polycrystal import Polycrystal
 import time
 
+ATOM_BLOCKS = ['Atoms_Fractional', 'Atoms_Cartesian', 'Atoms_Cartesian_LAMMPS']
+
 
 def format_file(formatting_object, template, directory='file_templates'):
     '''
@@ -69,6 +73,8 @@ def check_formatting_object(formatting_object, variables):
         formatting_object = format_grain(formatting_object)
     if isinstance(formatting_object, SuperCell):
         formatting_object = format_supercell(formatting_object)
+    if isinstance(formatting_object, Polycrystal):
+        formatting_object = format_polycrystal(formatting_object)
 
     for key in variables['Required']:
         try:
@@ -145,9 +151,29 @@ def format_supercell(supercell):
     '''
     Creates a dictionary of variables out of a supercell object.
     '''
+    header = supercell_header(supercell)
+    unique_atoms = header.pop('Elements')
+    masses = {key: header.pop(key) for key in ['Masses', 'Masses_LAMMPS']}
+    fractional = array_to_string(supercell.fractional)
+    cartesian = array_to_string(supercell.cartesian)
+    formatting_object = {
+        **header, 'Atoms_Fractional': fractional,
+        'Atoms_Cartesian': cartesian,
+        'Atoms_Cartesian_LAMMPS': lammps_string(cartesian, unique_atoms),
+        **masses}
+    return formatting_object
+
+
+def supercell_header(supercell, elements=None):
+    '''
+    The variables of a supercell's formatting object apart from the atom
+    strings, and its sorted elements under 'Elements'. Elements replace the
+    supercell's element column, e.g. freshly randomised ones.
+    '''
     if supercell.cartesian is None: supercell.set_cartesian()
+    if elements is None: elements = supercell.fractional['element']
     number_of_atoms = supercell.fractional.shape[0]
-    unique_atoms = np.unique(supercell.fractional['element'])
+    unique_atoms = np.unique(elements)
     number_of_atom_types = unique_atoms.shape[0]
     border = 0
     if not isinstance(border, list): border = [border]*6
@@ -158,26 +184,100 @@ def format_supercell(supercell):
     z_box_minimum = np.min(supercell.cartesian['coordinates'][:, 2])-border[4]
     z_box_maximum = np.max(supercell.cartesian['coordinates'][:, 2])+border[5]
     xy, xz, yz = 0, 0, 0
-    fractional = array_to_string(supercell.fractional)
-    cartesian = array_to_string(supercell.cartesian)
     masses = '\n'.join(utility.get_element_masses(unique_atoms.tolist()))
     masses_lammps = masses[:]
-    cartesian_lammps = cartesian[:]
     for atom, count in zip(unique_atoms, list(range(1, len(unique_atoms)+1))):
         masses_lammps = masses_lammps.replace(atom, str(count))
-        cartesian_lammps = cartesian_lammps.replace(atom, str(count))
-    cartesian_lammps = cartesian_lammps.split('\n')
-    atom_ids = map(str, list(range(1, len(cartesian_lammps)+1)))
-    cartesian_lammps = '\n'.join([
-        ' '.join(atom) for atom in list(zip(atom_ids, cartesian_lammps))])
     formatting_object = {
         'Name': 'Supercell', 'Number_of_Atoms': number_of_atoms,
         'Number_of_Atom_Types': number_of_atom_types,
         'X_Box_Minimum': x_box_minimum, 'X_Box_Maximum': x_box_maximum,
         'Y_Box_Minimum': y_box_minimum, 'Y_Box_Maximum': y_box_maximum,
         'Z_Box_Minimum': z_box_minimum, 'Z_Box_Maximum': z_box_maximum,
-        'XY': xy, 'XZ': xz, 'YZ': yz, 'Atoms_Fractional': fractional,
-        'Atoms_Cartesian': cartesian,
-        'Atoms_Cartesian_LAMMPS': cartesian_lammps, 'Masses': masses,
-        'Masses_LAMMPS': masses_lammps}
+        'XY': xy, 'XZ': xz, 'YZ': yz, 'Masses': masses,
+        'Masses_LAMMPS': masses_lammps, 'Elements': unique_atoms}
+    return formatting_object
+
+
+def lammps_string(cartesian, unique_atoms, first_id=1):
+    '''
+    Turns a cartesian atom string into LAMMPS atom lines, numbering element
+    types from one in the order of the unique atoms, and atoms from the
+    first id.
+    '''
+    for atom, count in zip(unique_atoms, list(range(1, len(unique_atoms)+1))):
+        cartesian = cartesian.replace(atom, str(count))
+    cartesian = cartesian.split('\n')
+    atom_ids = map(str, list(range(first_id, len(cartesian)+first_id)))
+    return '\n'.join([
+        ' '.join(atom) for atom in list(zip(atom_ids, cartesian))])
+
+
+def stream_supercell(supercell, template, file_name,
+                     directory='file_templates', chunk_size=100000,
+                     elements=None):
+    '''
+    Writes a supercell straight to a file from a template, as format_file
+    would, formatting and writing its atoms a chunk at a time so no string
+    of every atom is ever built. Elements replace the supercell's element
+    column in the file, see supercell_header.
+    '''
+    template, variables = read_file(template, directory)
+    formatting_object = supercell_header(supercell, elements)
+    unique_atoms = formatting_object.pop('Elements')
+    for block in ATOM_BLOCKS:
+        formatting_object[block] = f'\0{block}\0'
+    variables = check_formatting_object(formatting_object, variables)
+    parts = format_string(template, variables).split('\0')
+    with open(file_name, 'w') as file:
+        for index, part in enumerate(parts):
+            if index % 2 == 0:
+                file.write(part)
+                continue
+            atoms = (supercell.fractional if part == 'Atoms_Fractional'
+                     else supercell.cartesian)
+            for start in range(0, atoms.shape[0], chunk_size):
+                chunk = atoms[start:start+chunk_size]
+                if elements is not None:
+                    chunk = chunk.copy()
+                    chunk['element'] = elements[start:start+chunk_size]
+                lines = array_to_string(chunk)
+                if part == 'Atoms_Cartesian_LAMMPS':
+                    lines = lammps_string(lines, unique_atoms, start + 1)
+                if start > 0: file.write('\n')
+                file.write(lines)
+
+
+def format_polycrystal(polycrystal):
+    '''
+    Creates a dictionary of variables out of a polycrystal object. The box is
+    the polycrystal's periodic box, atom strings are written column wise with
+    numpy, as polycrystals are often far larger than single grains.
+    '''
+    elements = polycrystal.elements.tolist()
+    masses = utility.get_element_masses(elements)
+    masses_lammps = '\n'.join([
+        str(count) + mass[len(element):] for count, (element, mass)
+        in enumerate(zip(elements, masses), 1)])
+    coordinates = polycrystal.coordinates
+    cartesian = io.StringIO()
+    np.savetxt(cartesian, np.hstack((
+        polycrystal.elements[polycrystal.types][:, None],
+        coordinates.astype(str))), fmt='%s')
+    cartesian_lammps = io.StringIO()
+    atom_ids = np.arange(1, coordinates.shape[0]+1)
+    np.savetxt(cartesian_lammps, np.hstack((
+        atom_ids[:, None], polycrystal.types[:, None]+1, coordinates)),
+        fmt=['%d', '%d', '%.8f', '%.8f', '%.8f'])
+    box = polycrystal.box
+    formatting_object = {
+        'Name': 'Polycrystal', 'Number_of_Atoms': coordinates.shape[0],
+        'Number_of_Atom_Types': len(elements),
+        'X_Box_Minimum': 0, 'X_Box_Maximum': box[0],
+        'Y_Box_Minimum': 0, 'Y_Box_Maximum': box[1],
+        'Z_Box_Minimum': 0, 'Z_Box_Maximum': box[2],
+        'XY': 0, 'XZ': 0, 'YZ': 0,
+        'Atoms_Cartesian': cartesian.getvalue().rstrip('\n'),
+        'Atoms_Cartesian_LAMMPS': cartesian_lammps.getvalue().rstrip('\n'),
+        'Masses': '\n'.join(masses), 'Masses_LAMMPS': masses_lammps}
     return formatting_object
@@ -0,0 +1,156 @@
+'''
+Name:
+    Fingerprint
+Description:
+    Fingerprints built structures so duplicates from parameter sweeps, e.g.
+    equivalent cut sets, can be skipped before any files are written or
+    simulated. Atoms are moved to the origin, snapped to a tolerance grid,
+    and sorted into a canonical order, then the composition, the sorted type
+    and coordinate bytes, and the box or lattice vectors are hashed, in
+    O(N log N).
+
+    The rotation invariant descriptor histograms the neighbour distances of
+    every pair of elements, so copies of a structure in any orientation, or
+    with atoms in any order, share it.
+'''
+import hashlib
+import numpy as np
+from scipy import spatial
+import cartesian_edits as ce
+
+# Shift of the snapping grid, in tolerances. Crystal coordinates are often
+# half or quarter multiples of round lattice parameters, so an unround shift
+# keeps them away from the edges of snapping cells.
+SNAP_OFFSET = 0.3819660112501051
+
+
+def structure_atoms(structure):
+    '''
+    The elements, cartesian coordinates, periodic box, None if open, and
+    vector space, None if unknown, of a SuperCell, built Grain, Polycrystal,
+    or a tuple of elements and coordinates.
+    '''
+    if isinstance(structure, tuple):
+        elements, coordinates = structure
+        return (np.asarray(elements), np.asarray(coordinates, dtype=float),
+                None, None)
+    if hasattr(structure, 'grain_ids'):
+        return (structure.elements[structure.types], structure.coordinates,
+                structure.box, None)
+    supercell = getattr(structure, 'supercell', structure)
+    if supercell is None:
+        raise ValueError(f"Grain '{structure.name}' has not been built.")
+    if supercell.cartesian is None: supercell.set_cartesian()
+    atoms = supercell.cartesian
+    return (atoms['element'], atoms['coordinates'], None,
+            np.array(supercell.vector_space, dtype=float))
+
+
+def canonical_order(elements, coordinates, tolerance=1e-3, box=None):
+    '''
+    Returns the elements, sorted alphabetically, the integer type of every
+    atom, and coordinates snapped to multiples of the tolerance, in a
+    canonical order: by type, then x, y, and z. Open structures are moved to
+    start at the origin first, periodic ones wrapped into their box.
+    '''
+    coordinates = np.asarray(coordinates, dtype=float)
+    if box is None:
+        # The lower corner rather than the centroid, which can sit half way
+        # between crystal sites.
+        coordinates = coordinates - np.min(coordinates, axis=0)
+    else:
+        coordinates = ce.wrap(coordinates, box)
+    snapped = np.floor(coordinates/tolerance + SNAP_OFFSET).astype(np.int64)
+    if box is not None:
+        # Sites snapped onto the upper face are the same as the lower face.
+        sides = np.round(np.asarray(box, dtype=float)/tolerance).astype(
+            np.int64)
+        snapped = np.where(snapped >= sides, snapped - sides, snapped)
+    species, types = np.unique(elements, return_inverse=True)
+    order = np.lexsort((snapped[:, 2], snapped[:, 1], snapped[:, 0], types))
+    return (species, types[order], snapped[order])
+
+
+def fingerprint(structure, tolerance=1e-3):
+    '''
+    Returns a hexadecimal hash identifying a structure up to the order of
+    its atoms, translation, and coordinate differences below the tolerance.
+    Supercells and grains with the same atoms in different vector spaces
+    differ. Equal fingerprints mean identical structures, apart from atoms
+    sitting on the edge of a snapping cell, which rarely split two copies.
+    '''
+    elements, coordinates, box, vector_space = structure_atoms(structure)
+    species, types, snapped = canonical_order(elements, coordinates,
+                                              tolerance, box)
+    digest = hashlib.blake2b(digest_size=20)
+    counts = np.bincount(types, minlength=species.shape[0])
+    digest.update(' '.join(species.tolist()).encode())
+    digest.update(counts.astype(np.int64).tobytes())
+    digest.update(types.astype(np.int32).tobytes())
+    digest.update(snapped.tobytes())
+    if box is not None:
+        digest.update(np.round(np.asarray(box)/tolerance).astype(
+            np.int64).tobytes())
+    if vector_space is not None:
+        digest.update(np.round(vector_space/tolerance).astype(
+            np.int64).tobytes())
+    return digest.hexdigest()
+
+
+def distance_descriptor(structure, cutoff=6.0, bin_width=0.05):
+    '''
+    Rotation invariant descriptor: for every pair of elements, a histogram
+    of the distances between neighbours closer than the cutoff, per atom.
+    Returns the sorted elements and an array of shape (pairs, bins).
+    '''
+    elements, coordinates, box, _ = structure_atoms(structure)
+    if box is not None:
+        box = np.asarray(box, dtype=float)
+        coordinates = ce.wrap(coordinates, box)
+    species, types = np.unique(elements, return_inverse=True)
+    tree = spatial.cKDTree(coordinates, boxsize=box)
+    pairs = tree.query_pairs(cutoff, output_type='ndarray')
+    separations = coordinates[pairs[:, 1]] - coordinates[pairs[:, 0]]
+    if box is not None:
+        separations -= np.around(separations/box)*box
+    distances = np.linalg.norm(separations, axis=1)
+    first, second = np.sort(types[pairs], axis=1).T
+    number = species.shape[0]
+    pair_types = first*number + second
+    bins = int(np.ceil(cutoff/bin_width))
+    keys = pair_types*bins + np.minimum(
+        (distances/bin_width).astype(np.int64), bins - 1)
+    histogram = np.bincount(keys, minlength=number*number*bins)
+    histogram = histogram.reshape(number*number, bins)
+    upper = (np.arange(number)[:, None] <= np.arange(number)).ravel()
+    return (species, histogram[upper]/coordinates.shape[0])
+
+
+def descriptor_fingerprint(structure, cutoff=6.0, bin_width=0.05,
+                           decimals=6):
+    '''
+    Hash of the distance descriptor, equal for rotated copies of a structure.
+    '''
+    species, histogram = distance_descriptor(structure, cutoff, bin_width)
+    digest = hashlib.blake2b(digest_size=20)
+    digest.update(' '.join(species.tolist()).encode())
+    digest.update(np.round(histogram, decimals).tobytes())
+    return digest.hexdigest()
+
+
+def find_duplicates(structures, tolerance=1e-3, rotation_invariant=False,
+                    cutoff=6.0):
+    '''
+    Returns, for every structure, the index of the first structure identical
+    to it, its own index if it is the first, so duplicates are those whose
+    entry differs from their index.
+    '''
+    first_seen = {}
+    originals = []
+    for index, structure in enumerate(structures):
+        if rotation_invariant:
+            key = descriptor_fingerprint(structure, cutoff)
+        else:
+            key = fingerprint(structure, tolerance)
+        originals.append(first_seen.setdefault(key, index))
+    return np.array(originals)
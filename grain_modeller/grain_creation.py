@@ -15,6 +15,7 @@ from atom import Atom
 from unitcell import UnitCell
 from supercell import SuperCell
 import edits
+import cache
 import testing_tools as test_tool
 import copy
 
@@ -62,7 +63,7 @@ class Grain():
                 + f"{repeat_ratio})")
 
 
-def compositionally_match(grains, atom_target):
+def compositionally_match(grains, atom_target, use_cache=True):
     '''
     Produces compositionally matched grains from grain shape definitions. All
     grains will be matched so that they have exactly the same elemental
@@ -77,18 +78,68 @@ def compositionally_match(grains, atom_target):
     different elements, or the same elements at very different ratios; in
     either case it is not possible in principle to rearrange one into the
     other.
+
+    Unless use_cache is False, matched grains are kept in the cache, and a
+    repeated match restores every attribute set by matching from it.
     '''
     # Single grain input
     if type(grains) != list:
         grains = [grains]
-    grains = scale_grains(grains, atom_target)
+    key = cache.build_key('match', [(grain.unitcell, grain.cuts,
+                                     grain.repeat_ratio) for grain in grains],
+                          atom_target)
+    arrays = cache.load(key) if use_cache else None
+    if arrays is not None:
+        return restore_matched(grains, arrays)
+    grains = scale_grains(grains, atom_target, use_cache)
     grains = best_composition(grains, atom_target)
     for grain in grains:
         grain = remove_surface_atoms(grain)
+    if use_cache: cache.store(key, matched_arrays(grains))
     return grains
 
 
-def scale_grains(grains, atom_target):
+def matched_arrays(grains):
+    '''
+    The results of compositionally_match as a dictionary of arrays to cache:
+    the best composition, and every grain's scale factor, composition deltas,
+    distance symmetries, surface atoms, and supercell.
+    '''
+    composition = grains[0].best_composition
+    arrays = {'composition': composition.to_records(index=False)}
+    for index, grain in enumerate(grains):
+        arrays[f'{index}/scale_factor'] = np.array(grain.scale_factor)
+        arrays[f'{index}/composition_deltas'] = (
+            grain.composition_deltas.to_records(index=False))
+        arrays[f'{index}/distance_symmetries'] = grain.distance_symmetries
+        arrays[f'{index}/surface_atoms'] = grain.surface_atoms
+        for name, array in grain.supercell.get_arrays().items():
+            arrays[f'{index}/{name}'] = array
+    return arrays
+
+
+def restore_matched(grains, arrays):
+    '''
+    Sets the results of compositionally_match on grains from cached arrays.
+    '''
+    composition = pd.DataFrame(np.array(arrays['composition']), index=[0])
+    for index, grain in enumerate(grains):
+        prefix = f'{index}/'
+        supercell_arrays = {name[len(prefix):]: array for name, array
+                            in arrays.items() if name.startswith(prefix)}
+        grain.scale_factor = int(supercell_arrays.pop('scale_factor'))
+        grain.composition_deltas = pd.DataFrame(
+            np.array(supercell_arrays.pop('composition_deltas')), index=[0])
+        grain.distance_symmetries = supercell_arrays.pop(
+            'distance_symmetries')
+        grain.surface_atoms = supercell_arrays.pop('surface_atoms')
+        grain.supercell = SuperCell.from_arrays(grain.unitcell,
+                                                supercell_arrays)
+        grain.best_composition = composition.copy()
+    return grains
+
+
+def scale_grains(grains, atom_target, use_cache=True):
     '''
     Produces a cuboid supercell from an underlying unitcell, using the provided
     grain list, each entry of which is a definition object for a grain shape.
@@ -108,7 +159,7 @@ def scale_grains(grains, atom_target):
         scale_factor = 2
         scale = True
         while True:
-            supercell = build_grain(grain, scale_factor)
+            supercell = build_grain(grain, scale_factor, use_cache)
             number_of_atoms = supercell.fractional.shape[0]
             grain_record = np.array((scale_factor, number_of_atoms, supercell),
                                     dtype=columns)
@@ -130,23 +181,36 @@ def scale_grains(grains, atom_target):
         viable_grains = previous_grains['number_of_atoms'] > atom_target
         previous_grains = previous_grains[viable_grains]
         sort_order = np.argsort(previous_grains['number_of_atoms'])
-        grain.scale_factor = scale_factor
-        grain.supercell = previous_grains[sort_order[0]]['supercell']
+        best_grain = previous_grains[sort_order[0]]
+        grain.scale_factor = int(best_grain['scale_factor'])
+        grain.supercell = best_grain['supercell']
     return grains
 
 
-def build_grain(grain, scale_factor):
+def build_grain(grain, scale_factor, use_cache=True):
     '''
     Builds a grain based on a grain object and a size factor which determines
-    scale.
+    scale, recording both on the grain. Unless use_cache is False, built
+    grains are kept in the cache, keyed by the unitcell, cuts, repeat ratio,
+    and scale factor.
     '''
+    grain.scale_factor = scale_factor
+    key = cache.build_key('grain', grain.unitcell, grain.cuts,
+                          grain.repeat_ratio, scale_factor)
+    arrays = cache.load(key) if use_cache else None
+    if arrays is not None:
+        supercell = SuperCell.from_arrays(grain.unitcell, arrays)
+        grain.supercell = supercell
+        return supercell
     x_repeat = grain.repeat_ratio[0]*scale_factor
     y_repeat = grain.repeat_ratio[1]*scale_factor
     z_repeat = grain.repeat_ratio[2]*scale_factor
-    supercell = SuperCell(grain.unitcell, x_repeat, y_repeat, z_repeat)
+    supercell = SuperCell(grain.unitcell, x_repeat, y_repeat, z_repeat,
+                          use_cache)
     cuts = alter_cuts(scale_factor, grain)
     supercell = cut_grain(supercell, cuts)
     grain.supercell = supercell
+    if use_cache: cache.store(key, supercell.get_arrays())
     return supercell
 
 
@@ -221,56 +285,120 @@ def composition_columns(grain, c_type):
     return columns
 
 
-def remove_surface_atoms(grain):
+def remove_surface_atoms(grain, shells=2, weights=None):
     '''
     Deletes atoms from the surface of a supercell until the supercell matches a
-    given composition. Proceeding in rounds, the most extreme surface atoms of
-    each round are deleted. Extreme meaning those that would physically have
-    the lowest bonding strength. Surface atoms are found first, because this
-    significantly increases the speed of ConvexHull at larger sizes.
+    given composition. Proceeding in rounds, the atoms of each element that
+    would physically have the lowest bonding strength are deleted, scored by
+    bond_scores. Scores come from a single neighbour search and are lowered
+    as neighbours are deleted, so concave and stepped surfaces are handled
+    and nothing is rebuilt between rounds. The grain's surface atoms, see
+    get_surface_atoms, are recorded along with every deleted atom, indexed
+    into the supercell before deletion and marked removed.
+
+    shells: Number of neighbour shells of the bulk crystal that count as bonds.
+    weights: Weight of a bond in each shell, by default the squared ratio of
+        the first shell distance to the shell's distance.
     '''
     print(grain.name)
-    while True:
-        print('Getting New Surface')
-        grain = get_surface_atoms(grain)
-        surface_atoms = grain.surface_atoms
-        current_composition = get_composition(grain)
-        composition_deltas = current_composition - grain.best_composition
-        grain.composition_deltas = composition_deltas
-        while True:
-            try:
-                vertices = spatial.ConvexHull(surface_atoms['coordinates'])
-            except spatial.qhull.QhullError:
-                break
-            vertices = vertices.vertices
-            if remove_atoms(grain, surface_atoms, vertices):
-                print(grain.composition_deltas)
-                break
-            removed = np.invert(grain.surface_atoms['removed'])
-            surface_atoms = grain.surface_atoms[removed]
-            print(grain.composition_deltas)
-            if surface_atoms.shape[0] < 6:
-                break
-        # Delete atoms at random if deletions make up less than X% of surface
-        if update_supercell(grain):
-            surface_percent = np.sum(grain.composition_deltas.values)
-            surface_percent /= grain.surface_atoms.shape[0]
-            if surface_percent < 0.04:
-                vertices = np.arange(grain.surface_atoms.shape[0])
-                vertices = vertices[np.invert(grain.surface_atoms['removed'])]
-                remove_atoms(grain, surface_atoms, vertices)
-                update_supercell(grain)
-            else:
-                raise ValueError(
-                    "It's not possible to compositionally match these grains."
-                    + f" The composition of grain: {grain.name}, cannot match "
-                    + "the best composition. Try a different size or a "
-                    + "different combination of grains.")
-        if np.sum(grain.composition_deltas.values) == 0:
-            break
+    supercell = grain.supercell
+    supercell.set_cartesian()
+    surface = np.zeros(supercell.fractional.shape[0], dtype=bool)
+    surface[get_surface_atoms(grain).surface_atoms['index']] = True
+    elements = supercell.cartesian['element']
+    distances = bond_shells(supercell, shells)
+    if weights is None:
+        weights = (distances[0]/distances)**2
+    scores, neighbours = bond_scores(supercell.cartesian['coordinates'],
+                                     distances, weights)
+    composition_deltas = get_composition(grain) - grain.best_composition
+    if np.any(composition_deltas.values < 0):
+        raise ValueError(
+            "It's not possible to compositionally match these grains."
+            + f" The composition of grain: {grain.name}, cannot match "
+            + "the best composition. Try a different size or a "
+            + "different combination of grains.")
+    deltas = {element: int(composition_deltas[element][0])
+              for element in composition_deltas}
+    removed = np.zeros(elements.shape[0], dtype=bool)
+    while any(delta > 0 for delta in deltas.values()):
+        deleted = []
+        for element, delta in deltas.items():
+            if delta <= 0:
+                continue
+            candidates = np.flatnonzero(np.invert(removed)
+                                        & (elements == element))
+            candidate_scores = scores[candidates]
+            # The weakest bound atoms, all with the lowest score together.
+            weakest = candidates[candidate_scores
+                                 <= np.min(candidate_scores) + 1e-8]
+            deleted.append(weakest[:delta])
+            deltas[element] -= weakest[:delta].shape[0]
+        deleted = np.concatenate(deleted)
+        removed[deleted] = True
+        lower_scores(scores, neighbours, deleted)
+    grain.composition_deltas = composition_deltas*0
+    recorded = np.flatnonzero(surface | removed)
+    grain.surface_atoms = surface_array(supercell.fractional, recorded,
+                                        removed[recorded])
+    supercell.fractional = supercell.fractional[np.invert(removed)]
+    supercell.cartesian = supercell.cartesian[np.invert(removed)]
     return grain
 
 
+def bond_shells(supercell, shells=2):
+    '''
+    Distances of the first neighbour shells of the bulk crystal of a
+    supercell's unitcell, in the supercell's current vector space.
+    '''
+    reference = SuperCell(supercell.unitcell, 5, 5, 5)
+    reference.vector_space = supercell.vector_space
+    reference.set_cartesian()
+    coordinates = reference.cartesian['coordinates']
+    centre = np.mean(coordinates, axis=0)
+    central = np.argmin(np.linalg.norm(coordinates - centre, axis=1))
+    distances = np.linalg.norm(coordinates - coordinates[central], axis=1)
+    distances = np.unique(np.around(distances, 6))[1:]
+    return distances[:shells]
+
+
+def bond_scores(coordinates, distances, weights):
+    '''
+    Scores the bonding of every atom as its weighted count of neighbours in
+    the given shell distances, from one KD-tree pair search. Returns the
+    scores and, for updating them, the neighbours as a tuple of index
+    pointers, neighbour indexes, and bond weights in CSR form.
+    '''
+    distances = np.array(distances, dtype=float)
+    tree = spatial.cKDTree(coordinates)
+    pairs = tree.query_pairs(distances[-1] + 1e-6, output_type='ndarray')
+    lengths = np.linalg.norm(coordinates[pairs[:, 0]]
+                             - coordinates[pairs[:, 1]], axis=1)
+    shell = np.searchsorted(distances - 1e-6, lengths) - 1
+    bond_weights = np.array(weights, dtype=float)[shell]
+    rows = np.concatenate((pairs[:, 0], pairs[:, 1]))
+    columns = np.concatenate((pairs[:, 1], pairs[:, 0]))
+    bond_weights = np.concatenate((bond_weights, bond_weights))
+    order = np.argsort(rows, kind='stable')
+    counts = np.bincount(rows, minlength=coordinates.shape[0])
+    pointers = np.concatenate(([0], np.cumsum(counts)))
+    scores = np.bincount(rows, bond_weights, minlength=coordinates.shape[0])
+    return (scores, (pointers, columns[order], bond_weights[order]))
+
+
+def lower_scores(scores, neighbours, deleted):
+    '''
+    Lowers the scores of the neighbours of deleted atoms in place by the
+    weights of the bonds they lost.
+    '''
+    pointers, columns, bond_weights = neighbours
+    starts, ends = pointers[deleted], pointers[deleted + 1]
+    lengths = ends - starts
+    bonds = (np.repeat(starts - np.cumsum(lengths) + lengths, lengths)
+             + np.arange(np.sum(lengths)))
+    np.subtract.at(scores, columns[bonds], bond_weights[bonds])
+
+
 def get_surface_atoms(grain):
     '''
     Finds the surface atoms of a given grain. Uses the fact crystals are
@@ -285,7 +413,10 @@ def get_surface_atoms(grain):
         atoms = supercell.fractional['coordinates']
         atom_tree = spatial.cKDTree(atoms)
         distances, indexes = atom_tree.query(atoms, k=13)
-        bulk = np.all((atoms <= 9) & (atoms >= 1), axis=1)
+        # Two cells from the faces of the 10 cell supercell. Atoms at 9 lie
+        # on its upper face with neighbours missing, and their truncated
+        # patterns would make the faces and edges of every grain bulk.
+        bulk = np.all((atoms <= 8) & (atoms >= 2), axis=1)
         distances = np.around(distances[bulk], 6)
         distances = np.unique(distances, axis=0)
         grain.distance_symmetries = distances[:, 1:]
@@ -297,15 +428,25 @@ def get_surface_atoms(grain):
     distances = distances[:, None]
     # Creates a mask for the surface atoms in the array.
     surface = (grain.distance_symmetries == distances).all(axis=2).any(1)
-    surface_atoms = grain.supercell.fractional[np.invert(surface)]
+    grain.surface_atoms = surface_array(
+        grain.supercell.fractional, np.flatnonzero(np.invert(surface)))
+    return grain
+
+
+def surface_array(atoms, indexes, removed=None):
+    '''
+    Structured array of the atoms at the indexes of a supercell's atoms,
+    recording each atom's index and whether it has been removed.
+    '''
     dtypes = [('element', 'U10'), ('coordinates', 'f8', 3), ('index', 'i8'),
               ('removed', '?')]
-    grain.surface_atoms = np.zeros(surface_atoms.shape[0], dtype=dtypes)
-    grain.surface_atoms['element'] = surface_atoms['element']
-    grain.surface_atoms['coordinates'] = surface_atoms['coordinates']
-    grain.surface_atoms['index'] = np.arange(len(surface))[np.invert(surface)]
-    grain.surface_atoms['removed'] = [False]*surface_atoms.shape[0]
-    return grain
+    surface_atoms = np.zeros(indexes.shape[0], dtype=dtypes)
+    surface_atoms['element'] = atoms['element'][indexes]
+    surface_atoms['coordinates'] = atoms['coordinates'][indexes]
+    surface_atoms['index'] = indexes
+    if removed is not None:
+        surface_atoms['removed'] = removed
+    return surface_atoms
 
 
 def get_composition(grain):
@@ -318,54 +459,3 @@ def get_composition(grain):
     composition = np.array([tuple(counts)], dtype=composition)
     composition = pd.DataFrame(composition, index=[0])
     return composition
-
-
-def remove_atoms(grain, surface_atoms, vertices):
-    '''
-    Register which surface atoms have been removed. The grain shape object
-    contains an internal surface_atoms variable which has a column that records
-    removal; using indexes, atoms will be recorded as removed there.
-    '''
-    vertex_indices = surface_atoms[vertices]['index']
-    vertex_indices = (grain.surface_atoms['index'][:, None] == vertex_indices)
-    vertex_indices = vertex_indices.any(1)
-    elligible_atoms = grain.surface_atoms[vertex_indices]
-    composition_before = copy.deepcopy(grain.composition_deltas)
-    for element in grain.composition_deltas:
-        atoms = elligible_atoms[elligible_atoms['element'] == element]
-        to_delete = grain.composition_deltas[element][0]
-        indexes = atoms['index']
-        indexes = (grain.surface_atoms['index'][:, None] == indexes).any(1)
-        # Case statement has to be used because of masking complexities
-        if len(atoms) == 0:
-            delete = 0
-            continue
-        elif len(atoms) >= to_delete:
-            remove = [True]*to_delete + [False]*(len(atoms)-to_delete)
-            delete = to_delete
-            grain.surface_atoms['removed'][indexes] = remove
-        elif len(atoms) < to_delete:
-            delete = len(atoms)
-            grain.surface_atoms['removed'][indexes] = True
-        grain.composition_deltas[element][0] -= delete
-    if np.all(composition_before == grain.composition_deltas):
-        return True
-    elif np.sum(grain.composition_deltas.values) == 0:
-        return True
-    else:
-        return False
-
-
-def update_supercell(grain):
-    '''
-    Update the grain's supercell, by deleting all the atoms marked for removal
-    in its surface atom array.
-    '''
-    removed_indexes = grain.surface_atoms[grain.surface_atoms['removed']]
-    if removed_indexes.tolist() == []:
-        return True
-    removed_indexes = removed_indexes['index']
-    atom_range = np.arange(grain.supercell.fractional.shape[0])
-    removed = np.invert((atom_range[:, None] == removed_indexes).any(1))
-    grain.supercell.fractional = grain.supercell.fractional[removed]
-    return False
@@ -1,5 +1,7 @@
 import grain_extended as ge
 import os
+import ordering
+import cartesian_edits as ce
 import xlwt
 import numpy as np
 from scipy import spatial
@@ -77,13 +79,27 @@ class Interface():
         z_repeat = int(round(z_size/z_height))
         return(z_repeat)
 
-    def stack_supercells(self, supercell_1, supercell_2):
+    def stack_supercells(self, supercell_1, supercell_2, overlap=None):
+        '''
+        Stacks the second supercell on top of the first. Give overlap as a
+        distance to delete atoms of the second supercell closer than it to
+        atoms of the first.
+        '''
         supercell_1_atom_list = supercell_1.get_cartesian_formatted_atom_list()
         supercell_1_height = self.get_box_bounds_interface(
             [atom[1:] for atom in supercell_1_atom_list])['Z_Max']
         supercell_2_atom_list = supercell_2.get_cartesian_formatted_atom_list()
         supercell_2_atom_list = [atom[:4]+[atom[4]+supercell_1_height] for
                                  atom in supercell_2_atom_list]
+        if overlap is not None and supercell_2_atom_list:
+            keep_1, keep_2 = ce.overlap_mask(
+                np.array([atom[2:5] for atom in supercell_1_atom_list]),
+                overlap,
+                np.array([atom[2:5] for atom in supercell_2_atom_list]),
+                policy='a')
+            supercell_2_atom_list = [
+                atom for atom, keep in zip(supercell_2_atom_list, keep_2)
+                if keep]
         return {'SuperCell_1': supercell_1_atom_list,
                 'SuperCell_2': supercell_2_atom_list,
                 'Full_List': supercell_1_atom_list + supercell_2_atom_list}
@@ -106,7 +122,12 @@ class Interface():
                 'SuperCell_2': supercell_2_atom_list,
                 'Full_List': supercell_1_atom_list + supercell_2_atom_list}
 
-    def format_supercell_atom_lists(self, supercell_atom_lists):
+    def format_supercell_atom_lists(self, supercell_atom_lists, curve=None):
+        '''
+        Strips the atom ids from the supercell atom lists and sorts them by
+        element then coordinates. Give a space filling curve, 'hilbert' or
+        'morton', to order the atoms spatially instead.
+        '''
         supercell_atom_lists['Full_List'].sort(
             key = lambda x: (x[1], x[2], x[3], x[4]))
         supercell_atom_lists['Full_List'] = [ atom[1:] for atom in
@@ -119,6 +140,10 @@ class Interface():
             supercell_atom_lists['SuperCell_2']]
         supercell_atom_lists['SuperCell_2'].sort(
             key = lambda x: (x[0], x[1], x[2], x[3]))
+        if curve is not None:
+            for key in ['Full_List', 'SuperCell_1', 'SuperCell_2']:
+                supercell_atom_lists[key] = ordering.order_atom_list(
+                    supercell_atom_lists[key], curve)
         return supercell_atom_lists
 
     def create_interface_simulation(self, name, unitcell_1, unitcell_2,
@@ -1,11 +1,13 @@
 import grain_extended as ge
 import interface
 import os
-import random
+import numpy as np
+import randomise
 
 class InterfaceRandomise(interface.Interface):
 
-    def supercell_randomise(self, supercell, ratios):
+    def supercell_randomise(self, supercell, ratios, mode='probabilistic',
+                            seed=None):
         '''
         Takes in a supercell and randomises it based on the elements already
         present in it and the ratio list given to it. The ratios should
@@ -13,14 +15,17 @@ class InterfaceRandomise(interface.Interface):
         3 elements (Fe, Zn, Pt), then you should rearrange them alphabetically
         in your mind to (Fe, Pt, Zn), then have their desired ratios in the
         same order. Therefore, with elements (Fe, Zn, Pt), a ratio list of
-        [0.1, 0.3, 0.6] will result in: Fe=0.1, Pt=0.3, Zn=0.6. This will
-        return a randomised atom structure with roughly the right amount of
-        atoms of each type.
+        [0.1, 0.3, 0.6] will result in: Fe=0.1, Pt=0.3, Zn=0.6. Elements for
+        every atom are drawn at once, see randomise.random_types for the
+        probabilistic and exact modes, and a supercell holding its atoms as
+        arrays has its element column set in one step.
 
         supercell: SupercellExtended object that you wish to randomise.
         ratios: List of floats adding to one, representing the desired ratios
             of the different elements, for information on how this works,
             please read above.
+        mode: 'probabilistic' or 'exact'.
+        seed: Seed, or numpy Generator, of the randomisation.
         return: Nothing, although the supercell given to it is changed.
         '''
         supercell_atoms = supercell.get_cartesian_formatted_atom_list()
@@ -41,20 +46,14 @@ class InterfaceRandomise(interface.Interface):
         except IndexError:
             raise IndexError('Number of ratios does not match the number of'
                              + 'atoms types in the supercell')
-        element_ratios = {}
-        ratio_sum = 0
-        for index in range(len(supercell_atoms)):
-            element_ratios[supercell_atoms[index]] = {
-                'Ratio_Start': ratio_sum,
-                'Ratio_End': ratio_sum + ratios[index]}
-            ratio_sum += ratios[index]
-        for atom in supercell.get_atoms():
-            random_value = random.randint(0,9999)/10000
-            atom_type = ''
-            for key, item in element_ratios.items():
-                if item['Ratio_Start'] <= random_value < item['Ratio_End']:
-                    atom_type = key
-            atom.element = atom_type
+        if getattr(supercell, 'fractional', None) is not None:
+            supercell.randomise(ratios, mode, seed, species=supercell_atoms)
+            return
+        atoms = supercell.get_atoms()
+        types = randomise.random_types(len(atoms), ratios, mode, seed)
+        elements = np.array(supercell_atoms)[types].tolist()
+        for atom, element in zip(atoms, elements):
+            atom.element = element
 
     def create_single_cell_files_for_interface(self, name, unitcell_1,
             unitcell_2, potential_types, randomise, ratios):
@@ -158,6 +158,21 @@ def match_rows(array, match_array, tolerance=0):
     return boolean_rows
 
 
+def match_rows_exact(array, match_array):
+    '''
+    Given an array, check if each row is exactly equal to a row in a secondary
+    match array. Rows are viewed as single byte strings and compared with
+    np.isin, so memory use stays linear for large arrays. Round the values of
+    both arrays beforehand if they come from floating point calculations.
+    '''
+    array = np.ascontiguousarray(array)
+    match_array = np.ascontiguousarray(match_array, dtype=array.dtype)
+    row_type = np.dtype((np.void, array.dtype.itemsize*array.shape[1]))
+    rows = array.view(row_type).ravel()
+    match_rows = match_array.view(row_type).ravel()
+    return np.isin(rows, match_rows)
+
+
 def angle_between(vectors1, vectors2):
     '''
     Calculates every angle between one array of vectors and another; vectors1
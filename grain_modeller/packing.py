@@ -0,0 +1,212 @@
+'''
+Name:
+    Packing
+Description:
+    Scatters built grains in a box without them touching, for powder and
+    composite models. Grains are placed by random sequential addition: random
+    positions and orientations are tried one at a time, and kept if the grain
+    clears every grain already placed.
+
+    Placed grains are hashed into a uniform grid by their bounding spheres, so
+    a candidate is only compared with grains in the neighbouring grid cells.
+    Only grains whose bounding spheres come too close are checked atom by
+    atom, against a KD-tree of each grain's atoms built once per grain.
+'''
+import warnings
+import numpy as np
+from scipy import spatial
+from scipy.spatial.transform import Rotation as R
+import cartesian_edits as ce
+from polycrystal import Polycrystal
+
+
+class GrainTemplate():
+
+    def __init__(self, grain):
+        '''
+        Prepares a built grain, or a SuperCell, for packing: its atoms are
+        centred on their centroid, and a KD-tree, bounding radius, and convex
+        hull volume are found once for every copy placed.
+        '''
+        supercell = getattr(grain, 'supercell', grain)
+        if supercell is None:
+            raise ValueError(f"Grain '{grain.name}' has not been built.")
+        if supercell.cartesian is None: supercell.set_cartesian()
+        coordinates = supercell.cartesian['coordinates']
+        self.elements = supercell.cartesian['element']
+        self.coordinates = coordinates - np.mean(coordinates, axis=0)
+        self.radius = np.max(np.linalg.norm(self.coordinates, axis=1))
+        self.tree = spatial.cKDTree(self.coordinates)
+        if self.coordinates.shape[0] > 3:
+            self.volume = spatial.ConvexHull(self.coordinates).volume
+        else:
+            self.volume = 0
+
+
+def pack_grains(grains, box, packing_fraction=None, number=None,
+                clearance=2.0, periodic=True, rotate=True, seed=None,
+                max_attempts=10000):
+    '''
+    Places copies of grains at random in a box, cycling through the given
+    grains, until the packing fraction or number of grains is reached.
+    Returns the packing as a Polycrystal, whose seeds are the grain centres,
+    and an array giving the index of the grain each placed copy was made from.
+
+    grains: Grain or list of built Grains, e.g. from compositionally_match.
+    box: Side lengths of the orthogonal box, which starts at the origin.
+    packing_fraction: Target fraction of the box filled by the convex hulls
+        of the grains.
+    number: Number of grains to place.
+    clearance: Smallest distance allowed between atoms of different grains.
+    periodic: Whether the box is periodic, otherwise grains are kept inside.
+    rotate: Whether every copy gets a uniformly random orientation.
+    seed: Seed of the random generator.
+    max_attempts: Placement stops, with a warning, after this many failed
+        attempts in a row.
+    '''
+    if type(grains) != list:
+        grains = [grains]
+    if packing_fraction is None and number is None:
+        raise ValueError("Give either a packing fraction or a number.")
+    box = np.array(box, dtype=float)
+    rng = np.random.default_rng(seed)
+    templates = [GrainTemplate(grain) for grain in grains]
+    largest = max(template.radius for template in templates)
+    if not periodic and np.any(2*largest > box):
+        raise ValueError("A grain is larger than the box.")
+    # Grains closer than one cell can only clash with neighbouring cells.
+    cell_size = 2*largest + clearance
+    cell_counts = np.maximum(1, np.floor(box/cell_size)).astype(int)
+    cell_size = box/cell_counts
+    offsets = np.indices((3, 3, 3)).reshape(3, -1).T - 1
+    grid = {}
+    placed = Placed()
+    volume = 0
+    failures = 0
+    target_volume = np.inf
+    if packing_fraction is not None:
+        target_volume = packing_fraction*np.prod(box)
+    if number is None: number = np.inf
+    random_rotations = []
+    while placed.count < number and volume < target_volume:
+        if failures >= max_attempts:
+            warnings.warn(
+                f"Stopped after {max_attempts} failed attempts with "
+                f"{placed.count} grains placed, packing fraction "
+                f"{volume/np.prod(box):.3f}.")
+            break
+        source = placed.count % len(templates)
+        template = templates[source]
+        if periodic:
+            centre = rng.uniform(0, 1, 3)*box
+        else:
+            centre = template.radius + rng.uniform(0, 1, 3)*(
+                box - 2*template.radius)
+        rotation = np.identity(3)
+        if rotate:
+            if not random_rotations:
+                random_rotations = list(
+                    R.random(1024, random_state=rng).as_matrix())
+            rotation = random_rotations.pop()
+        cell = np.floor(centre/cell_size).astype(int)
+        cells = cell + offsets
+        if periodic:
+            cells = np.mod(cells, cell_counts)
+        neighbours = [index for key in set(map(tuple, cells.tolist()))
+                      for index in grid.get(key, [])]
+        if clashes(template, centre, rotation, neighbours, templates, placed,
+                   clearance, box, periodic):
+            failures += 1
+            continue
+        failures = 0
+        grid.setdefault(tuple(np.mod(cell, cell_counts).tolist()),
+                        []).append(placed.count)
+        placed.add(centre, rotation, source, template.radius)
+        volume += template.volume
+    return (assemble(templates, box, placed, periodic),
+            placed.sources[:placed.count].copy())
+
+
+class Placed():
+
+    def __init__(self, capacity=1024):
+        '''
+        Growable arrays of the centres, orientations, grain sources, and
+        bounding radii of the grains placed so far.
+        '''
+        self.count = 0
+        self.centres = np.zeros((capacity, 3))
+        self.rotations = np.zeros((capacity, 3, 3))
+        self.sources = np.zeros(capacity, dtype=int)
+        self.radii = np.zeros(capacity)
+
+    def add(self, centre, rotation, source, radius):
+        if self.count == self.centres.shape[0]:
+            for name in ['centres', 'rotations', 'sources', 'radii']:
+                array = getattr(self, name)
+                setattr(self, name, np.concatenate((array, array)))
+        self.centres[self.count] = centre
+        self.rotations[self.count] = rotation
+        self.sources[self.count] = source
+        self.radii[self.count] = radius
+        self.count += 1
+
+
+def clashes(template, centre, rotation, neighbours, templates, placed,
+            clearance, box, periodic):
+    '''
+    Checks a candidate grain against its neighbouring placed grains. Bounding
+    spheres rule out most pairs at once, the atoms of the candidate are then
+    only queried against the KD-tree of a neighbour if the spheres overlap,
+    and only the candidate atoms that can reach that neighbour.
+    '''
+    if not neighbours:
+        return False
+    neighbours = np.array(neighbours)
+    separations = placed.centres[neighbours] - centre
+    if periodic:
+        separations -= np.around(separations/box)*box
+    radii = placed.radii[neighbours]
+    reach = template.radius + radii + clearance
+    close = np.einsum('ij,ij->i', separations, separations) < reach**2
+    if not np.any(close):
+        return False
+    atoms = template.coordinates @ rotation.T
+    for index, separation, radius in zip(
+            neighbours[close], separations[close], radii[close]):
+        # Candidate atoms relative to the neighbour's centre and orientation.
+        relative = (atoms - separation) @ placed.rotations[index]
+        near = np.einsum('ij,ij->i', relative, relative) < (
+            radius + clearance)**2
+        if not np.any(near):
+            continue
+        tree = templates[placed.sources[index]].tree
+        distances = tree.query(relative[near], distance_upper_bound=clearance)
+        if np.any(np.isfinite(distances[0])):
+            return True
+    return False
+
+
+def assemble(templates, box, placed, periodic):
+    '''
+    Builds the atoms of every placed grain in one array.
+    '''
+    elements = np.unique(np.concatenate(
+        [template.elements for template in templates]))
+    types, coordinates, grain_ids = [], [], []
+    for index in range(placed.count):
+        template = templates[placed.sources[index]]
+        positions = (template.coordinates @ placed.rotations[index].T
+                     + placed.centres[index])
+        if periodic: positions = ce.wrap(positions, box)
+        coordinates.append(positions)
+        types.append(np.searchsorted(elements, template.elements))
+        grain_ids.append(np.full(positions.shape[0], index))
+    if placed.count == 0:
+        types, coordinates, grain_ids = (
+            [np.zeros(0, dtype=int)], [np.zeros((0, 3))],
+            [np.zeros(0, dtype=int)])
+    return Polycrystal(box, placed.centres[:placed.count].copy(),
+                       placed.rotations[:placed.count].copy(), elements,
+                       np.concatenate(types), np.concatenate(coordinates),
+                       np.concatenate(grain_ids))
@@ -0,0 +1,284 @@
+'''
+Name:
+    Plan
+Description:
+    Lazy build plans. Instead of calling SuperCell, cut_grain, transforms,
+    and file_formatter one after another, each doing its full work at once, a
+    Plan records the steps of a recipe and runs them together:
+
+        plan = Plan(unitcell, 20, 20, 20).cut(cut_1, cut_2).rotate(matrix)
+        plan.randomise([0.5, 0.5], seed=1).write('grain.data', template)
+        supercell = plan.execute()
+
+    Before running, adjacent steps are fused: cuts into one mask, transforms
+    into one affine matrix, and randomising followed by writing into one
+    streaming pass writing the randomised elements. The structure after the
+    last step that can be cached, the last before any write or unseeded
+    randomising, is cached under a hash of the steps so far, so a rerun, or
+    a plan extending the recipe, resumes from it. A seeded randomising fused
+    with a write is cached as the randomised structure, and a rerun resuming
+    from it still writes the file.
+'''
+from dataclasses import dataclass, field
+import numpy as np
+from supercell import SuperCell
+import edits
+import transforms
+import randomise
+import file_formatter as ff
+import cache
+
+
+@dataclass
+class Step():
+    '''
+    One operation of a plan: 'lattice', 'cut', 'transform', 'randomise',
+    'sort', 'write', or the fused 'randomise_write', with its arguments.
+    '''
+    operation: str
+    arguments: dict = field(default_factory=dict)
+
+    @property
+    def cacheable(self):
+        # Unseeded randomising gives different atoms every run.
+        if self.operation in ['randomise', 'randomise_write']:
+            arguments = self.arguments.get('randomising', self.arguments)
+            return isinstance(arguments['seed'], (int, np.integer))
+        return self.operation != 'write'
+
+
+class Plan():
+
+    def __init__(self, unitcell, x_repeat, y_repeat, z_repeat,
+                 use_cache=True, disk=None):
+        '''
+        Instantiate a plan starting from a supercell of the unitcell with the
+        given repeats. Steps are added by chaining the methods below, none of
+        which do any work until execute. Without use_cache the plan never
+        touches the cache.
+
+        disk: By default None, following the cache setting, so the disk tier
+            is used whenever the cache has a directory, see cache.configure.
+            False keeps the plan's structures in the memory tier only.
+        '''
+        self.unitcell = unitcell
+        self.use_cache = use_cache
+        self.disk = disk
+        self.steps = [Step('lattice', {'repeats': [x_repeat, y_repeat,
+                                                   z_repeat]})]
+
+    def __repr__(self):
+        operations = ', '.join(step.operation for step in self.steps)
+        return f"Plan({self.unitcell}, [{operations}])"
+
+    def add(self, operation, **arguments):
+        self.steps.append(Step(operation, arguments))
+        return self
+
+    def cut(self, *cuts):
+        '''
+        Cuts with masked Cut objects, see edits.cut_mask.
+        '''
+        return self.add('cut', cuts=list(cuts))
+
+    def transform(self, matrix=None, vector=None, coordinates='cartesian'):
+        '''
+        Moves the atoms by a cartesian matrix, then a vector, as in
+        SuperCell.transform.
+        '''
+        return self.add('transform', moves=[(matrix, vector, coordinates)])
+
+    def rotate(self, matrix):
+        return self.transform(matrix)
+
+    def translate(self, vector, coordinates='fractional'):
+        return self.transform(vector=vector, coordinates=coordinates)
+
+    def randomise(self, ratios, mode='probabilistic', seed=None,
+                  sublattice=None, species=None):
+        '''
+        Randomises the elements, see SuperCell.randomise. Only seeded steps,
+        and the steps after them, are cached.
+        '''
+        return self.add('randomise', ratios=ratios, mode=mode, seed=seed,
+                        sublattice=sublattice, species=species)
+
+    def sort(self, curve='hilbert', bits=10):
+        '''
+        Orders the atoms along a space filling curve, see
+        SuperCell.spatial_sort.
+        '''
+        return self.add('sort', curve=curve, bits=bits)
+
+    def write(self, file_name, template, directory='file_templates',
+              chunk_size=100000):
+        '''
+        Writes the supercell to a file from a template, a chunk of atoms at a
+        time, see file_formatter.stream_supercell.
+        '''
+        return self.add('write', file_name=file_name, template=template,
+                        directory=directory, chunk_size=chunk_size)
+
+    def optimise(self):
+        '''
+        Returns the steps with adjacent operations fused: runs of cuts and of
+        transforms into single steps, and a randomise directly followed by a
+        write into one 'randomise_write' step.
+        '''
+        fused = []
+        for step in self.steps:
+            previous = fused[-1] if fused else None
+            if (previous is not None and previous.operation == step.operation
+                    and step.operation in ['cut', 'transform']):
+                key = 'cuts' if step.operation == 'cut' else 'moves'
+                fused[-1] = Step(step.operation, {
+                    key: previous.arguments[key] + step.arguments[key]})
+            elif (previous is not None and previous.operation == 'randomise'
+                    and step.operation == 'write'):
+                fused[-1] = Step('randomise_write', {
+                    'randomising': previous.arguments,
+                    'writing': step.arguments})
+            else:
+                fused.append(step)
+        return fused
+
+    def keys(self, steps):
+        '''
+        Cache keys of the structure after every step, None from the first
+        step that cannot be cached onwards. Writing leaves the structure as it
+        is, so a seeded 'randomise_write' has the key of its randomise alone,
+        shared with plans that randomise without writing. The steps after it
+        are not cached, so resuming never skips its write.
+        '''
+        keys = []
+        cacheable = True
+        done = []
+        for step in steps:
+            cacheable = cacheable and step.cacheable
+            if step.operation == 'randomise_write':
+                done.append(['randomise', step.arguments['randomising']])
+            else:
+                done.append([step.operation, step.arguments])
+            keys.append(cache.build_key('plan', self.unitcell, done)
+                        if cacheable else None)
+            cacheable = cacheable and step.operation != 'randomise_write'
+        return keys
+
+    def execute(self, use_cache=None):
+        '''
+        Runs the optimised plan and returns the built supercell, resuming
+        from the structure cached after the longest possible start of it,
+        and caching the structure after its last cacheable step. Use cache
+        overrides the plan's setting.
+        '''
+        if use_cache is None: use_cache = self.use_cache
+        disk = self.disk is not False
+        steps = self.optimise()
+        keys = self.keys(steps) if use_cache else [None]*len(steps)
+        supercell = None
+        start = 0
+        for index in reversed(range(len(steps))):
+            arrays = cache.load(keys[index], disk) if keys[index] else None
+            if arrays is not None:
+                supercell = SuperCell.from_arrays(self.unitcell, arrays)
+                start = index + 1
+                # The cached structure is randomised, but still unwritten.
+                if steps[index].operation == 'randomise_write':
+                    run_write(supercell, **steps[index].arguments['writing'])
+                break
+        last = max([index for index, key in enumerate(keys)
+                    if key is not None], default=-1)
+        for index in range(start, len(steps)):
+            step = steps[index]
+            if step.operation == 'lattice':
+                supercell = SuperCell(self.unitcell,
+                                      *step.arguments['repeats'])
+            else:
+                OPERATIONS[step.operation](supercell, **step.arguments)
+            if index == last:
+                cache.store(keys[index], supercell.get_arrays(), disk)
+        return supercell
+
+
+def run_cut(supercell, cuts):
+    '''
+    Cuts a supercell with one mask combining every cut.
+    '''
+    cartesian = None
+    if any(cut.cut_type == 'cp' for cut in cuts):
+        cartesian = supercell.fractional['coordinates'] @ np.array(
+            supercell.vector_space).T
+    mask = edits.shape_mask(supercell.fractional['coordinates'], cuts,
+                            cartesian)
+    atoms = supercell.cartesian
+    supercell.fractional = supercell.fractional[mask]
+    if atoms is not None: supercell.cartesian = atoms[mask]
+
+
+def fuse_transforms(moves, vector_space):
+    '''
+    Composes transforms, tuples of a matrix, a vector, and the coordinates
+    of the vector, into one 4x4 cartesian affine matrix, for a supercell
+    with the given vector space. Fractional vectors are in the vector space
+    as transformed by the matrices before them.
+    '''
+    linear = np.identity(3)
+    translation = np.zeros(3)
+    for matrix, vector, coordinates in moves:
+        if matrix is not None:
+            matrix = np.array(matrix, dtype=float)
+            linear = matrix @ linear
+            translation = matrix @ translation
+        if vector is not None:
+            vector = np.array(vector, dtype=float)
+            if coordinates != 'cartesian':
+                vector = linear @ np.array(vector_space) @ vector
+            translation = translation + vector
+    affine = np.identity(4)
+    affine[:3, :3] = linear
+    affine[:3, 3] = translation
+    return affine
+
+
+def run_transform(supercell, moves):
+    '''
+    Moves a supercell's atoms once by the composition of the transforms.
+    '''
+    affine = fuse_transforms(moves, supercell.vector_space)
+    transforms.affine(supercell, affine)
+    supercell.apply_transform()
+
+
+def run_randomise(supercell, ratios, mode, seed, sublattice, species):
+    supercell.randomise(ratios, mode, seed, sublattice, species)
+
+
+def run_sort(supercell, curve, bits):
+    supercell.spatial_sort(curve, bits)
+
+
+def run_write(supercell, file_name, template, directory, chunk_size):
+    ff.stream_supercell(supercell, template, file_name, directory,
+                        chunk_size)
+
+
+def run_randomise_write(supercell, randomising, writing):
+    '''
+    Draws the randomised elements once and hands them straight to the
+    streaming writer, then stores them, without formatting the supercell
+    in between.
+    '''
+    elements = randomise.randomise_elements(
+        supercell.fractional['element'], randomising['ratios'],
+        randomising['species'], randomising['mode'], randomising['seed'],
+        randomising['sublattice'])
+    ff.stream_supercell(supercell, writing['template'], writing['file_name'],
+                        writing['directory'], writing['chunk_size'], elements)
+    supercell.fractional['element'] = elements
+    if supercell.cartesian is not None:
+        supercell.cartesian['element'] = elements
+
+
+OPERATIONS = {'cut': run_cut, 'transform': run_transform,
+              'randomise': run_randomise, 'sort': run_sort,
+              'write': run_write, 'randomise_write': run_randomise_write}
@@ -0,0 +1,307 @@
+'''
+Name:
+    Polycrystal
+Description:
+    Builds periodic Voronoi polycrystals: a box is split into the Voronoi cells
+    of a set of seed points, and each cell is filled with the lattice of a
+    unitcell under its own orientation.
+
+    Grains never build a box sized lattice. Each seed gets the radius of its
+    periodic Voronoi cell, only lattice points within that radius are made,
+    and they are kept if they lie inside the faces of the cell, so their seed
+    is the nearest. Atoms closer than an overlap distance across grain
+    boundaries are then removed with a KD-tree search, only testing atoms
+    close enough to a boundary to clash.
+'''
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from scipy import spatial
+from scipy.spatial.transform import Rotation as R
+import cartesian_edits as ce
+import crystallography
+
+# Number of candidate atoms handled at once by a grain builder.
+CHUNK_SIZE = 1000000
+# Default overlap distance as a fraction of the nearest neighbour distance.
+OVERLAP_FRACTION = 0.6
+
+
+class Polycrystal():
+
+    def __init__(self, box, seeds, orientations, elements, types, coordinates,
+                 grain_ids):
+        '''
+        Instantiate a polycrystal. Atoms are stored column wise for memory:
+        types index into the elements array, coordinates are cartesian and
+        wrapped into the periodic box, which starts at the origin and has the
+        given side lengths. Grain ids index into seeds and orientations.
+        '''
+        self.box = np.array(box, dtype=float)
+        self.seeds = seeds
+        self.orientations = orientations
+        self.elements = elements
+        self.types = types
+        self.coordinates = coordinates
+        self.grain_ids = grain_ids
+
+    def __repr__(self):
+        return (f"Polycrystal({self.box.tolist()}, <{self.seeds.shape[0]} "
+                f"grains>, <{self.coordinates.shape[0]} atoms>)")
+
+    @property
+    def number_of_atoms(self):
+        return self.coordinates.shape[0]
+
+    @property
+    def cartesian(self):
+        '''
+        The atoms as a structured array, in the format of SuperCell.cartesian.
+        '''
+        atoms = np.zeros(
+            self.number_of_atoms,
+            dtype=[('element', 'U10'), ('coordinates', 'f8', 3)])
+        atoms['element'] = self.elements[self.types]
+        atoms['coordinates'] = self.coordinates
+        return atoms
+
+
+def read_seeds(file_name):
+    '''
+    Reads a seed file with one grain per line: the cartesian seed point, x y z,
+    optionally followed by the Bunge (ZXZ) Euler angles of the grain in
+    degrees. Returns the seeds, and the orientations as rotation matrices, or
+    None if the file has no angles.
+    '''
+    data = np.loadtxt(file_name, ndmin=2)
+    if data.shape[1] not in [3, 6]:
+        raise ValueError(
+            f"Seed file {file_name} has {data.shape[1]} columns, expected 3 "
+            "(x y z) or 6 (x y z phi1 Phi phi2).")
+    orientations = None
+    if data.shape[1] == 6:
+        orientations = R.from_euler('ZXZ', data[:, 3:], degrees=True)
+        orientations = orientations.as_matrix()
+    return (data[:, :3], orientations)
+
+
+def seed_images(seeds, box, layers=1):
+    '''
+    Returns the periodic images of the seeds in the given number of layers of
+    boxes around the central box, one number or one per axis, the central
+    images first so image i is a copy of seed i % number of seeds.
+    '''
+    layers = np.broadcast_to(np.asarray(layers, dtype=int), (3,))
+    shifts = np.indices(2*layers + 1).reshape(3, -1).T - layers
+    shifts = shifts[np.argsort(np.any(shifts != 0, axis=1), kind='stable')]
+    return (seeds[None] + (shifts*box)[:, None]).reshape(-1, 3)
+
+
+def voronoi_cells(seeds, box):
+    '''
+    Finds the periodic Voronoi cell of every seed, from a Voronoi tessellation
+    of the seeds and their periodic images. Returns the radius of every cell,
+    the furthest its vertices are from its seed, and a list of the faces of
+    every cell. Faces are a tuple of unit normals pointing out of the cell,
+    the distances of the faces from the seed, and whether atoms lying exactly
+    on a face belong to the cell; exactly one of the two cells sharing a face
+    claims it.
+
+    Layers of images are added along every axis a central cell reaches out
+    of, until every central cell is closed and exact, so few seeds or
+    elongated boxes are handled.
+    '''
+    seeds = np.asarray(seeds, dtype=float)
+    box = np.asarray(box, dtype=float)
+    number = seeds.shape[0]
+    layers = np.ones(3, dtype=int)
+    while True:
+        images = seed_images(seeds, box, layers)
+        voronoi = spatial.Voronoi(images)
+        short = missing_layers(voronoi, seeds, box, layers)
+        if not np.any(short):
+            break
+        layers += short
+    ridges = voronoi.ridge_points
+    # Image shifts in boxes, ordered as in seed_images.
+    shifts = np.round((images - np.tile(seeds, (images.shape[0]//number, 1)))
+                      / box).astype(int)
+    radii = np.zeros(number)
+    cells = []
+    for index in range(number):
+        region = voronoi.regions[voronoi.point_region[index]]
+        vertices = voronoi.vertices[region]
+        radii[index] = np.max(np.linalg.norm(vertices - seeds[index], axis=1))
+        neighbours = np.concatenate((ridges[ridges[:, 0] == index, 1],
+                                     ridges[ridges[:, 1] == index, 0]))
+        separations = images[neighbours] - seeds[index]
+        distances = np.linalg.norm(separations, axis=1)
+        normals = separations/distances[:, None]
+        # Faces are claimed by the lower seed, or for faces with a seed's own
+        # image by the side facing the positive image.
+        owners = neighbours % number
+        image_shifts = shifts[neighbours]
+        positive = np.array([tuple(shift) > (0, 0, 0)
+                             for shift in image_shifts.tolist()], dtype=bool)
+        ties = (owners > index) | ((owners == index) & positive)
+        cells.append((normals, distances/2, ties))
+    # Pad so lattice points on a cell's vertices are not lost to rounding.
+    return (radii*(1 + 1e-6) + 1e-6, cells)
+
+
+def missing_layers(voronoi, seeds, box, layers):
+    '''
+    Axes along which the Voronoi cells of the seeds, the first points of the
+    tessellation, need another layer of images: a cell is unbounded, or the
+    empty sphere about one of its vertices, reaching the seeds defining the
+    vertex, leaves the images so a missing image could cut the cell.
+    '''
+    short = np.zeros(3, dtype=bool)
+    lower, upper = -layers*box, (layers + 1)*box
+    for index in range(seeds.shape[0]):
+        region = voronoi.regions[voronoi.point_region[index]]
+        if not region or -1 in region:
+            return np.ones(3, dtype=bool)
+        vertices = voronoi.vertices[region]
+        reach = np.linalg.norm(vertices - seeds[index], axis=1)[:, None]
+        short |= np.any((vertices - reach < lower)
+                        | (vertices + reach > upper), axis=0)
+    return short
+
+
+def lattice_ball(vector_space, basis, radius, chunk_size=CHUNK_SIZE):
+    '''
+    Yields chunks of the lattice positions, in cartesian, within a radius of
+    the lattice origin, along with the basis index of each position. Vector
+    space uses column vectors, the basis is in fractional coordinates.
+    Chunks are slabs of whole unitcells along the a lattice vector, so no
+    array larger than about chunk_size positions is made.
+    '''
+    inverse = np.linalg.inv(vector_space)
+    reach = radius*np.linalg.norm(inverse, axis=1)
+    lower = np.floor(-reach - np.max(basis, axis=0)).astype(int)
+    upper = np.ceil(reach - np.min(basis, axis=0)).astype(int)
+    cells_b = np.arange(lower[1], upper[1]+1)
+    cells_c = np.arange(lower[2], upper[2]+1)
+    per_slab = cells_b.shape[0]*cells_c.shape[0]*basis.shape[0]
+    slab_count = max(1, chunk_size//max(1, per_slab))
+    for start in range(lower[0], upper[0]+1, slab_count):
+        cells_a = np.arange(start, min(start+slab_count, upper[0]+1))
+        cells = np.stack(np.meshgrid(cells_a, cells_b, cells_c,
+                                     indexing='ij'), axis=-1).reshape(-1, 3)
+        positions = (cells[:, None] + basis).reshape(-1, 3) @ vector_space.T
+        basis_indexes = np.tile(np.arange(basis.shape[0]), cells.shape[0])
+        inside = np.einsum('ij,ij->i', positions, positions) <= radius**2
+        yield (positions[inside], basis_indexes[inside])
+
+
+def build_grains(job):
+    '''
+    Builds the atoms of a list of grains, used by the worker processes of
+    build_polycrystal. Returns the atom types, wrapped cartesian coordinates,
+    grain ids, and the distance of each atom to its grain's boundary.
+
+    Atoms are kept if they lie inside every face of their seed's Voronoi
+    cell, the same as their seed being the nearest, found with one matrix
+    product per chunk instead of a tree query. Faces include those between a
+    grain and its own periodic images.
+    '''
+    (grains, seeds, orientations, radii, cells, box, vector_space, basis,
+     basis_types, chunk_size) = job
+    types, coordinates, grain_ids, boundaries = [], [], [], []
+    for grain, (normals, offsets, ties) in zip(grains, cells):
+        for positions, basis_indexes in lattice_ball(
+                vector_space, basis, radii[grain], chunk_size):
+            positions = positions @ orientations[grain].T
+            # Positive distances are inside the cell.
+            distances = offsets - positions @ normals.T
+            on_face = np.abs(distances) <= 1e-8
+            inside = (distances > 0) | (on_face & ties)
+            keep = np.all(inside, axis=1)
+            types.append(basis_types[basis_indexes[keep]])
+            coordinates.append(ce.wrap(positions[keep] + seeds[grain], box))
+            grain_ids.append(np.full(np.sum(keep), grain))
+            boundaries.append(np.min(distances[keep], axis=1))
+    return (np.concatenate(types), np.concatenate(coordinates),
+            np.concatenate(grain_ids), np.concatenate(boundaries))
+
+
+def build_polycrystal(unitcell, box, seeds=None, number=None,
+                      orientations=None, seed=None, overlap=None,
+                      processes=1, chunk_size=CHUNK_SIZE):
+    '''
+    Fills a periodic box with Voronoi grains of a unitcell and returns a
+    Polycrystal.
+
+    unitcell: UnitCell whose lattice fills every grain.
+    box: Side lengths of the orthogonal periodic box, which starts at the
+        origin.
+    seeds: Numpy array of cartesian seed points, or the name of a seed file
+        read by read_seeds. Drawn uniformly at random when not given.
+    number: Number of random seeds, needed when seeds are not given.
+    orientations: Rotation matrices of the grains, shape (N, 3, 3). Drawn
+        uniformly at random when not given, or taken from the seed file.
+    seed: Seed of the random generator, used for seeds, orientations, and
+        choosing which atom of a clashing pair is removed.
+    overlap: Atoms of different grains closer than this are thinned until
+        none clash. Defaults to OVERLAP_FRACTION of the unitcell's nearest
+        neighbour distance, set to 0 to keep every atom.
+    processes: Number of worker processes grains are built in.
+    chunk_size: Number of candidate atoms generated at once by each worker.
+    '''
+    box = np.array(box, dtype=float)
+    rng = np.random.default_rng(seed)
+    if isinstance(seeds, str):
+        seeds, file_orientations = read_seeds(seeds)
+        if orientations is None: orientations = file_orientations
+    if seeds is None:
+        if number is None:
+            raise ValueError("Give either seeds or a number of grains.")
+        seeds = rng.uniform(0, 1, (number, 3))*box
+    seeds = ce.wrap(np.array(seeds, dtype=float), box)
+    if orientations is None:
+        orientations = R.random(seeds.shape[0], random_state=rng).as_matrix()
+    orientations = np.array(orientations, dtype=float)
+    if orientations.shape != (seeds.shape[0], 3, 3):
+        raise ValueError(
+            f"Orientations have shape {orientations.shape}, expected "
+            f"({seeds.shape[0]}, 3, 3).")
+    basis = np.concatenate([atom.fractional for atom in unitcell.atoms])
+    elements, basis_types = np.unique(basis['element'], return_inverse=True)
+    vector_space = np.array(unitcell.vector_space, dtype=float)
+    if overlap is None:
+        cell = np.indices((3, 3, 3)).reshape(3, -1).T
+        cell = (cell[:, None] + basis['coordinates']).reshape(-1, 3)
+        distances = crystallography.neighbour_distances(
+            cell @ vector_space.T, 1)[:, 1]
+        overlap = OVERLAP_FRACTION*np.min(distances[distances > 0])
+    radii, cells = voronoi_cells(seeds, box)
+    # Spread grains over jobs by size, so workers get similar loads.
+    grains = np.argsort(-radii)
+    job_count = max(1, min(seeds.shape[0], 4*processes))
+    jobs = []
+    for index in range(job_count):
+        job_grains = grains[index::job_count]
+        jobs.append((job_grains, seeds, orientations, radii,
+                     [cells[grain] for grain in job_grains], box,
+                     vector_space, basis['coordinates'], basis_types,
+                     chunk_size))
+    if processes > 1:
+        with ProcessPoolExecutor(processes) as executor:
+            results = list(executor.map(build_grains, jobs))
+    else:
+        results = [build_grains(job) for job in jobs]
+    types, coordinates, grain_ids, boundaries = [
+        np.concatenate(column) for column in zip(*results)]
+    order = np.argsort(grain_ids, kind='stable')
+    types, coordinates, grain_ids, boundaries = (
+        types[order], coordinates[order], grain_ids[order], boundaries[order])
+    if overlap > 0:
+        # Only atoms within the overlap of a boundary can clash across it.
+        near = np.flatnonzero(boundaries < overlap)
+        keep = np.ones(types.shape[0], dtype=bool)
+        keep[near] = ce.overlap_mask(
+            coordinates[near], overlap, policy='random', seed=rng, box=box)
+        types, coordinates, grain_ids = (
+            types[keep], coordinates[keep], grain_ids[keep])
+    return Polycrystal(box, seeds, orientations, elements, types, coordinates,
+                       grain_ids)
@@ -0,0 +1,141 @@
+'''
+Name:
+    Randomise
+Description:
+    Randomises the elements on the sites of a structure. Elements are drawn
+    for every site at once, either as an exact number of each element shuffled
+    over the sites, or independently for every site with the ratios as
+    probabilities. Randomisation can be restricted to sites of given elements,
+    e.g. one sublattice of an ordered alloy.
+
+    Generators are numpy.random.Generator objects made from a seed, and
+    spawn_generators gives independent streams for parallel workers.
+'''
+
+import numpy as np
+
+
+def generator(seed=None):
+    '''
+    Returns a numpy random Generator from a seed, a SeedSequence, or an
+    existing Generator, which is returned as it is.
+    '''
+    return np.random.default_rng(seed)
+
+
+def spawn_generators(seed, number):
+    '''
+    Returns a number of independent random Generators from one seed, one for
+    each parallel worker, so results do not depend on how work is split.
+    '''
+    sequence = np.random.SeedSequence(seed)
+    return [np.random.default_rng(child) for child in sequence.spawn(number)]
+
+
+def exact_counts(ratios, number):
+    '''
+    Splits a number of sites between elements as closely to the ratios as
+    whole numbers allow. Counts are rounded down, then the sites left over go
+    to the elements with the largest remainders.
+    '''
+    ratios = check_ratios(ratios)
+    wanted = ratios*number
+    counts = np.floor(wanted).astype(int)
+    remainders = np.argsort(counts - wanted, kind='stable')
+    counts[remainders[:number - np.sum(counts)]] += 1
+    return counts
+
+
+def check_ratios(ratios):
+    ratios = np.array(ratios, dtype=float)
+    if np.any(ratios < 0) or not np.isclose(np.sum(ratios), 1):
+        raise ValueError(f"Ratios: {ratios.tolist()}, must be positive and "
+                         "add to one.")
+    return ratios
+
+
+def random_types(number, ratios, mode='probabilistic', seed=None):
+    '''
+    Returns the indexes of the elements drawn for a number of sites.
+    'probabilistic' draws each site independently, so compositions only match
+    the ratios on average. 'exact' draws exactly exact_counts of each element,
+    with every arrangement equally likely.
+    '''
+    if mode not in ['exact', 'probabilistic']:
+        raise ValueError(f"Unknown randomisation mode: '{mode}'.")
+    rng = generator(seed)
+    ratios = check_ratios(ratios)
+    values = rng.random(number, dtype=np.float32)
+    # Few elements, so comparing with every boundary beats a binary search.
+    types = np.zeros(number, dtype=np.int32)
+    for boundary in np.cumsum(ratios)[:-1]:
+        types += values >= boundary
+    if mode == 'exact':
+        fix_counts(types, exact_counts(ratios, number), rng)
+    return types
+
+
+def fix_counts(types, counts, rng):
+    '''
+    Brings independently drawn types to exact counts in place, redrawing a
+    random choice of the sites of every element drawn too often as the
+    elements drawn too rarely. Only about the square root of the number of
+    sites change, and as every step treats all sites alike, every
+    arrangement with the exact counts stays equally likely.
+    '''
+    surplus = np.bincount(types, minlength=counts.shape[0]) - counts
+    redrawn = [np.flatnonzero(types == index)[
+        rng.choice(np.sum(types == index), extra, replace=False)]
+        for index, extra in enumerate(surplus) if extra > 0]
+    if not redrawn:
+        return
+    redrawn = rng.permutation(np.concatenate(redrawn))
+    deficits = np.maximum(-surplus, 0)
+    types[redrawn] = np.repeat(np.arange(counts.shape[0], dtype=np.int32),
+                               deficits)
+
+
+def unique_elements(elements):
+    '''
+    The sorted unique elements of an array. Structures hold few elements, so
+    removing one element at a time is much faster than sorting every site.
+    '''
+    found = []
+    remaining = elements
+    while remaining.shape[0]:
+        found.append(remaining[0])
+        remaining = remaining[remaining != remaining[0]]
+    return np.sort(np.array(found, dtype=elements.dtype))
+
+
+def randomise_elements(elements, ratios, species=None, mode='probabilistic',
+                       seed=None, sublattice=None):
+    '''
+    Returns a copy of an array of site elements with the chosen sites
+    randomised. Ratios are in the order of species, by default the elements
+    of the chosen sites sorted alphabetically.
+
+    sublattice: Element, or list of elements, whose sites are randomised, or a
+        boolean array of the sites. By default every site is.
+    '''
+    elements = np.asarray(elements)
+    if sublattice is None:
+        sites = slice(None)
+    elif np.asarray(sublattice).dtype == bool:
+        sites = np.asarray(sublattice)
+    else:
+        sites = np.zeros(elements.shape[0], dtype=bool)
+        for element in np.atleast_1d(sublattice):
+            sites |= elements == element
+    if species is None:
+        species = unique_elements(elements[sites])
+    species = np.asarray(species)
+    if len(ratios) != species.shape[0]:
+        raise ValueError(f"{len(ratios)} ratios given for "
+                         f"{species.shape[0]} elements: {species.tolist()}.")
+    types = random_types(elements[sites].shape[0], ratios, mode, seed)
+    if sublattice is None:
+        return species[types]
+    randomised = elements.astype(np.result_type(elements, species))
+    randomised[sites] = species[types]
+    return randomised
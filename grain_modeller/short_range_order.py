@@ -0,0 +1,292 @@
+'''
+Name:
+    Short Range Order
+Description:
+    Warren-Cowley chemical short range order (SRO) of alloys, and a swap Monte
+    Carlo that drives a configuration towards target SRO parameters. For
+    neighbour shell s the parameter between elements a and b is
+
+        alpha_ab = 1 - P(b | a)/c_b
+
+    where P(b | a) is the chance a neighbour of an a atom is b, and c_b the
+    fraction of b atoms: 0 for a random solid solution, negative for ordering,
+    positive for clustering.
+
+    Neighbours are held as padded (N, M) arrays of neighbour indexes and
+    shells. Sites are coloured so no two sites of one colour are neighbours,
+    then each Monte Carlo step proposes swaps between many sites of one
+    colour at once. Their changes to the pair counts cannot interact, so all
+    of them are scored, by the linearised objective, and accepted in one
+    vectorised step, checked against the exact change of the objective.
+'''
+import numpy as np
+from scipy import spatial
+import cartesian_edits as ce
+
+
+def shell_distances(coordinates, shells, box=None, tolerance=1e-3,
+                    sample=1000):
+    '''
+    Finds the distances of the first neighbour shells from a sample of atoms,
+    grouping distances within the relative tolerance.
+    '''
+    tree = spatial.cKDTree(coordinates, boxsize=box)
+    rng = np.random.default_rng(0)
+    picked = rng.choice(coordinates.shape[0],
+                        min(sample, coordinates.shape[0]), replace=False)
+    neighbours = min(coordinates.shape[0], 64)
+    distances = np.sort(tree.query(coordinates[picked],
+                                   neighbours)[0][:, 1:].ravel())
+    gaps = np.flatnonzero(np.diff(distances) > tolerance*distances[1:])
+    starts = distances[np.concatenate(([0], gaps + 1))]
+    if starts.shape[0] < shells:
+        raise ValueError(f"Found only {starts.shape[0]} neighbour shells.")
+    return starts[:shells]
+
+
+def neighbour_shells(coordinates, shells=2, box=None, tolerance=1e-3):
+    '''
+    Returns the neighbours of every atom in its first shells as padded
+    arrays: neighbour indexes of shape (N, M), -1 where an atom has fewer
+    than M, the shell of each neighbour, and the shell distances. Give the
+    side lengths of an orthogonal periodic box to use periodic boundaries.
+    '''
+    coordinates = np.asarray(coordinates, dtype=float)
+    if box is not None:
+        box = np.array(box, dtype=float)
+        coordinates = ce.wrap(coordinates, box)
+    distances = shell_distances(coordinates, shells, box, tolerance)
+    cutoff = distances[-1]*(1 + tolerance)
+    tree = spatial.cKDTree(coordinates, boxsize=box)
+    width = np.max(tree.query_ball_point(coordinates, cutoff,
+                                         return_length=True))
+    found, neighbours = tree.query(coordinates, width,
+                                   distance_upper_bound=cutoff)
+    found, neighbours = found[:, 1:], neighbours[:, 1:]
+    missing = np.invert(np.isfinite(found))
+    neighbours = np.where(missing, -1, neighbours).astype(np.int32)
+    shell_ids = np.searchsorted(distances*(1 - tolerance), found,
+                                side='right') - 1
+    shell_ids = np.where(missing, -1, shell_ids).astype(np.int8)
+    return (neighbours, shell_ids, distances)
+
+
+def pair_counts(types, neighbours, shell_ids, species, shells):
+    '''
+    Counts the ordered neighbour pairs of every pair of element types in
+    every shell, as an array of shape (shells, species, species).
+    '''
+    valid = neighbours >= 0
+    rows = np.broadcast_to(types[:, None], neighbours.shape)[valid]
+    keys = (shell_ids[valid].astype(np.int64)*species + rows)*species
+    keys += types[neighbours[valid]]
+    counts = np.bincount(keys, minlength=shells*species*species)
+    return counts.reshape(shells, species, species).astype(float)
+
+
+def warren_cowley(types, neighbours, shell_ids, species=None, counts=None):
+    '''
+    Returns the Warren-Cowley parameters alpha[s, a, b] of integer element
+    types, for every shell s and pair of types a, b.
+    '''
+    shells = int(np.max(shell_ids)) + 1
+    if species is None:
+        species = int(np.max(types)) + 1
+    if counts is None:
+        counts = pair_counts(types, neighbours, shell_ids, species, shells)
+    fractions = np.bincount(types, minlength=species)/types.shape[0]
+    return count_alpha(counts, fractions)
+
+
+def count_alpha(counts, fractions):
+    '''
+    Warren-Cowley parameters from the pair counts and the element fractions.
+    '''
+    totals = np.sum(counts, axis=2, keepdims=True)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return 1 - counts/(totals*fractions)
+
+
+def sro_distance(alpha, target, weights):
+    '''
+    Weighted squared distance of the parameters to the target, the objective
+    of order_supercell.
+    '''
+    return np.nansum(weights[:, None, None]*(alpha - target)**2)
+
+
+def colour_sites(neighbours, seed=None):
+    '''
+    Colours sites so no two neighbours share a colour, returning the colour
+    of every site. Every round, the uncoloured sites whose random priority
+    beats all their uncoloured neighbours take a new colour together.
+    '''
+    number = neighbours.shape[0]
+    priorities = np.random.default_rng(seed).permutation(number)
+    colours = np.full(number, -1)
+    valid = neighbours >= 0
+    padded = np.where(valid, neighbours, 0)
+    colour = 0
+    while np.any(colours < 0):
+        uncoloured = colours < 0
+        rivals = np.where(valid & uncoloured[padded], priorities[padded], -1)
+        winners = uncoloured & (priorities > np.max(rivals, axis=1,
+                                                    initial=-1))
+        colours[winners] = colour
+        colour += 1
+    return colours
+
+
+def sro_gradient(alpha, target, totals, fractions, weights):
+    '''
+    Derivative of the squared distance to the target SRO with respect to the
+    pair counts, symmetrised as every swap changes both orders of a pair.
+    '''
+    difference = np.nan_to_num(alpha - target)*weights[:, None, None]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        gradient = np.nan_to_num(-2*difference/(totals*fractions))
+    return gradient + gradient.transpose(0, 2, 1)
+
+
+def swap_changes(sites, old, new, types, neighbours, shell_ids, gradient):
+    '''
+    Linearised change of the objective for every site changing its type from
+    old to new, from the types of its neighbours.
+    '''
+    site_neighbours = neighbours[sites]
+    valid = site_neighbours >= 0
+    shells = np.where(valid, shell_ids[sites], 0)
+    others = types[np.where(valid, site_neighbours, 0)]
+    change = (gradient[shells, new[:, None], others]
+              - gradient[shells, old[:, None], others])
+    return np.sum(np.where(valid, change, 0), axis=1)
+
+
+def count_changes(sites, old, new, types, neighbours, shell_ids, species,
+                  shells):
+    '''
+    Exact change of the pair counts when sites, none of them neighbours of
+    each other, change type from old to new.
+    '''
+    site_neighbours = neighbours[sites]
+    valid = site_neighbours >= 0
+    shell = shell_ids[sites][valid].astype(np.int64)
+    others = types[site_neighbours[valid]]
+    old = np.broadcast_to(old[:, None], valid.shape)[valid]
+    new = np.broadcast_to(new[:, None], valid.shape)[valid]
+    size = shells*species*species
+    change = np.zeros(size)
+    for first, second, sign in [(old, others, -1), (others, old, -1),
+                                (new, others, 1), (others, new, 1)]:
+        change += sign*np.bincount((shell*species + first)*species + second,
+                                   minlength=size)
+    return change.reshape(shells, species, species)
+
+
+def target_array(target, shells, species):
+    '''
+    Target SRO as an array of shape (shells, species, species), NaN where
+    free. A value per shell sets every unlike pair of a binary alloy.
+    '''
+    target = np.array(target, dtype=float)
+    if target.ndim == 1:
+        if species != 2:
+            raise ValueError("Give a full target for more than two elements.")
+        full = np.full((shells, 2, 2), np.nan)
+        full[:, 0, 1] = full[:, 1, 0] = target
+        return full
+    if target.shape != (shells, species, species):
+        raise ValueError(f"Target has shape {target.shape}, expected "
+                         f"{(shells, species, species)}.")
+    return target
+
+
+def order_supercell(supercell, target, shells=None, steps=1000,
+                    temperature=0, weights=None, seed=None, box=None,
+                    tolerance=1e-4, neighbour_list=None):
+    '''
+    Swaps the elements of a supercell's atoms until their Warren-Cowley
+    parameters approach the target, keeping the composition. Each step
+    proposes swaps between pairs of sites of one colour. Acceptance is
+    linearised: each swap is scored by the gradient of the squared distance
+    to the target, and those bringing the parameters closer are accepted, or
+    with the Metropolis probability at a temperature above zero. Swaps of one
+    colour never share a neighbour pair, but their linearised scores still
+    add up to more than their exact effect, so the exact change of the
+    accepted batch is counted and, if the distance grows (beyond the
+    Metropolis probability at a temperature), the batch is halved, keeping
+    the best scored swaps, until it does not. Stops after the steps or once
+    the squared distance falls below the tolerance. Returns the reached
+    parameters, elements ordered alphabetically.
+
+    target: Array of shape (shells, elements, elements), NaN for parameters
+        left free, or for binary alloys one unlike parameter per shell.
+    weights: Weight of every shell in the squared distance.
+    box: Side lengths of an orthogonal periodic box.
+    neighbour_list: Output of neighbour_shells, to reuse between runs.
+    '''
+    rng = np.random.default_rng(seed)
+    if supercell.cartesian is None: supercell.set_cartesian()
+    atoms = supercell.cartesian
+    elements, types = np.unique(atoms['element'], return_inverse=True)
+    types = types.astype(np.int32)
+    species = elements.shape[0]
+    if shells is None:
+        shells = np.array(target).shape[0]
+    if neighbour_list is None:
+        neighbour_list = neighbour_shells(atoms['coordinates'], shells, box)
+    neighbours, shell_ids = neighbour_list[:2]
+    target = target_array(target, shells, species)
+    weights = np.ones(shells) if weights is None else np.array(weights)
+    colours = colour_sites(neighbours, rng)
+    classes = [np.flatnonzero(colours == colour)
+               for colour in range(np.max(colours) + 1)]
+    counts = pair_counts(types, neighbours, shell_ids, species, shells)
+    fractions = np.bincount(types, minlength=species)/types.shape[0]
+    totals = np.sum(counts, axis=2, keepdims=True)
+    alpha = count_alpha(counts, fractions)
+    distance = sro_distance(alpha, target, weights)
+    for step in range(steps):
+        if distance < tolerance:
+            break
+        gradient = sro_gradient(alpha, target, totals, fractions, weights)
+        sites = rng.permutation(classes[step % len(classes)])
+        half = sites.shape[0]//2
+        firsts, seconds = sites[:half], sites[half:2*half]
+        unlike = types[firsts] != types[seconds]
+        firsts, seconds = firsts[unlike], seconds[unlike]
+        first_types, second_types = types[firsts], types[seconds]
+        changes = (swap_changes(firsts, first_types, second_types, types,
+                                neighbours, shell_ids, gradient)
+                   + swap_changes(seconds, second_types, first_types, types,
+                                  neighbours, shell_ids, gradient))
+        if temperature > 0:
+            accepted = rng.random(changes.shape[0]) < np.exp(
+                np.minimum(0, -changes/temperature))
+        else:
+            accepted = changes < 0
+        accepted = np.flatnonzero(accepted)
+        accepted = accepted[np.argsort(changes[accepted], kind='stable')]
+        while accepted.shape[0] > 0:
+            sites = np.concatenate((firsts[accepted], seconds[accepted]))
+            old = np.concatenate((first_types[accepted],
+                                  second_types[accepted]))
+            new = np.concatenate((second_types[accepted],
+                                  first_types[accepted]))
+            changed = counts + count_changes(sites, old, new, types,
+                                             neighbours, shell_ids, species,
+                                             shells)
+            changed_alpha = count_alpha(changed, fractions)
+            changed_distance = sro_distance(changed_alpha, target, weights)
+            growth = changed_distance - distance
+            if growth <= 0 or (temperature > 0 and rng.random() < np.exp(
+                    -growth/temperature)):
+                counts, alpha, distance = changed, changed_alpha, (
+                    changed_distance)
+                types[sites] = new
+                break
+            accepted = accepted[:accepted.shape[0]//2]
+    atoms['element'] = elements[types]
+    supercell.cartesian = atoms
+    supercell.set_fractional()
+    return alpha
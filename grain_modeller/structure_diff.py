@@ -0,0 +1,120 @@
+'''
+Name:
+    Structure Diff
+Description:
+    Compares two structures atom by atom, e.g. a grain before and after
+    remove_surface_atoms, or a supercell before and after inserting defects.
+    Atoms of the first structure are matched to their nearest atom of the
+    second with a KD-tree query, in chunks, and pairs further apart than a
+    tolerance are left unmatched. Unmatched atoms were removed or added,
+    matched atoms may have moved or changed element.
+'''
+from dataclasses import dataclass
+import numpy as np
+from scipy import spatial
+import cartesian_edits as ce
+from fingerprint import structure_atoms
+
+
+@dataclass
+class StructureDiff():
+    '''
+    Differences between a structure before and after a change. Removed,
+    moved, and type_changed index atoms before, added indexes atoms after.
+    Matches holds the index after of every atom before, -1 if removed, and
+    displacements the moves of the moved atoms.
+    '''
+    removed: np.ndarray
+    added: np.ndarray
+    moved: np.ndarray
+    displacements: np.ndarray
+    type_changed: np.ndarray
+    matches: np.ndarray
+
+    def __repr__(self):
+        return (f"StructureDiff(<{self.removed.shape[0]} removed>, "
+                f"<{self.added.shape[0]} added>, <{self.moved.shape[0]} "
+                f"moved>, <{self.type_changed.shape[0]} type changed>)")
+
+    @property
+    def identical(self):
+        return not (self.removed.shape[0] or self.added.shape[0]
+                    or self.moved.shape[0] or self.type_changed.shape[0])
+
+
+def match_atoms(before, after, tolerance, box=None, chunk_size=ce.CHUNK_SIZE):
+    '''
+    Returns the index of the nearest atom after for every atom before, -1 if
+    none is within the tolerance. Where several atoms before share their
+    nearest atom after, only the closest is matched, the others are matched
+    again against the atoms after still unmatched, until none are left.
+    '''
+    matches = np.full(before.shape[0], -1, dtype=np.int64)
+    waiting = np.arange(before.shape[0])
+    free = np.arange(after.shape[0])
+    while waiting.shape[0] > 0 and free.shape[0] > 0:
+        tree = spatial.cKDTree(after[free], boxsize=box)
+        nearest = np.full(waiting.shape[0], -1, dtype=np.int64)
+        distances = np.full(waiting.shape[0], np.inf)
+        for start in range(0, waiting.shape[0], chunk_size):
+            chunk_distances, chunk_nearest = tree.query(
+                before[waiting[start:start+chunk_size]],
+                distance_upper_bound=tolerance)
+            found = np.isfinite(chunk_distances)
+            nearest[start:start+chunk_size][found] = chunk_nearest[found]
+            distances[start:start+chunk_size] = chunk_distances
+        candidates = np.flatnonzero(nearest >= 0)
+        if candidates.shape[0] == 0:
+            break
+        # Closest first, so the first of every shared match is kept.
+        candidates = candidates[np.argsort(distances[candidates],
+                                           kind='stable')]
+        first = np.unique(nearest[candidates], return_index=True)[1]
+        won = candidates[first]
+        matches[waiting[won]] = free[nearest[won]]
+        # Atoms without a match in range now never find one among fewer.
+        lost = np.ones(candidates.shape[0], dtype=bool)
+        lost[first] = False
+        waiting = waiting[np.sort(candidates[lost])]
+        taken = np.zeros(free.shape[0], dtype=bool)
+        taken[nearest[won]] = True
+        free = free[np.invert(taken)]
+    return matches
+
+
+def diff_structures(before, after, tolerance=0.5, move_threshold=1e-6,
+                    box=None, chunk_size=ce.CHUNK_SIZE):
+    '''
+    Compares two structures, SuperCells, built Grains, Polycrystals, or
+    tuples of elements and cartesian coordinates, and returns a
+    StructureDiff. Atoms further than the tolerance from every atom of the
+    other structure count as removed or added, matched atoms that moved more
+    than the move threshold as moved.
+
+    box: Side lengths of an orthogonal periodic box, by default the box of
+        periodic structures.
+    '''
+    elements_before, coordinates_before, box_before, _ = structure_atoms(
+        before)
+    elements_after, coordinates_after, _, _ = structure_atoms(after)
+    if box is None: box = box_before
+    if box is not None:
+        box = np.asarray(box, dtype=float)
+        coordinates_before = ce.wrap(coordinates_before, box)
+        coordinates_after = ce.wrap(coordinates_after, box)
+    matches = match_atoms(coordinates_before, coordinates_after, tolerance,
+                          box, chunk_size)
+    matched = np.flatnonzero(matches >= 0)
+    partners = matches[matched]
+    displacements = coordinates_after[partners] - coordinates_before[matched]
+    if box is not None:
+        displacements -= np.around(displacements/box)*box
+    lengths = np.linalg.norm(displacements, axis=1)
+    moved = lengths > move_threshold
+    type_changed = elements_before[matched] != elements_after[partners]
+    found = np.zeros(coordinates_after.shape[0], dtype=bool)
+    found[partners] = True
+    return StructureDiff(np.flatnonzero(matches < 0),
+                         np.flatnonzero(np.invert(found)),
+                         matched[moved], displacements[moved],
+                         matched[type_changed], matches)
@@ -8,20 +8,68 @@ Description:
 
 import numpy as np
 from scipy.linalg import norm
+import ordering
+import randomise
+import cache
+
+# Largest supercell, in atoms, kept in the cache. Bigger ones would evict
+# everything else from the memory tier for a build that is cheap anyway.
+CACHE_ATOMS = 2**20
+
+
+def _applied(name):
+    '''
+    Property for a supercell attribute that depends on its pending transform.
+    The transform is applied before the attribute is read or replaced.
+    '''
+    def getter(self):
+        self.apply_transform()
+        return getattr(self, name)
+
+    def setter(self, value):
+        self.apply_transform()
+        setattr(self, name, value)
+    return property(getter, setter)
 
 
 class SuperCell():
 
-    def __init__(self, unit_cell, x_repeat, y_repeat, z_repeat):
+    fractional = _applied('_fractional')
+    cartesian = _applied('_cartesian')
+    vector_space = _applied('_vector_space')
+    a_side_vector = _applied('_a_side_vector')
+    b_side_vector = _applied('_b_side_vector')
+    c_side_vector = _applied('_c_side_vector')
+    a_side_length = _applied('_a_side_length')
+    b_side_length = _applied('_b_side_length')
+    c_side_length = _applied('_c_side_length')
+
+    def __init__(self, unit_cell, x_repeat, y_repeat, z_repeat,
+                 use_cache=True):
         '''
         Instantiate a new supercell, with a unit_cell as a basis, and a number
         of repeats in the x, y, and z directions. Vector space uses column
         vectors.
+
+        Unless use_cache is False, supercells of up to CACHE_ATOMS atoms are
+        kept in the memory tier of the cache, as rebuilding is about as fast
+        as reading a file.
         '''
+        self._linear = None
+        self._offset = None
+        self.unitcell = unit_cell
+        number = len(unit_cell.atoms)*x_repeat*y_repeat*z_repeat
+        use_cache = use_cache and number <= CACHE_ATOMS
+        if use_cache:
+            key = cache.build_key('supercell', unit_cell, x_repeat, y_repeat,
+                                  z_repeat)
+        arrays = cache.load(key, disk=False) if use_cache else None
+        if arrays is not None:
+            self.set_arrays(arrays)
+            return
         self.x_repeat = x_repeat
         self.y_repeat = y_repeat
         self.z_repeat = z_repeat
-        self.unitcell = unit_cell
         self.vector_space = unit_cell.vector_space
         fractional = np.vstack([atom.fractional for atom in unit_cell.atoms])
         self.fractional = fractional
@@ -35,11 +83,56 @@ class SuperCell():
         self.a_side_length = norm(self.a_side_vector)
         self.b_side_length = norm(self.b_side_vector)
         self.c_side_length = norm(self.c_side_vector)
+        if use_cache: cache.store(key, self.get_arrays(), disk=False)
 
     def __repr__(self):
         return (f"SuperCell({repr(self.unitcell)}, {self.x_repeat}, "
                 + f"{self.y_repeat}, {self.z_repeat})")
 
+    @classmethod
+    def from_arrays(cls, unit_cell, arrays):
+        '''
+        Recreates a supercell of a unitcell from the arrays of get_arrays,
+        e.g. ones loaded from the cache, without building it again.
+        '''
+        supercell = cls.__new__(cls)
+        supercell._linear = None
+        supercell._offset = None
+        supercell.unitcell = unit_cell
+        supercell.set_arrays(arrays)
+        return supercell
+
+    def get_arrays(self):
+        '''
+        The state of the supercell, apart from its unitcell, as a dictionary
+        of arrays, with any pending transform applied.
+        '''
+        arrays = {'fractional': self.fractional,
+                  'vector_space': np.array(self.vector_space),
+                  'repeats': np.array([self.x_repeat, self.y_repeat,
+                                       self.z_repeat]),
+                  'side_vectors': np.array([self.a_side_vector,
+                                            self.b_side_vector,
+                                            self.c_side_vector])}
+        if self.cartesian is not None:
+            arrays['cartesian'] = self.cartesian
+        return arrays
+
+    def set_arrays(self, arrays):
+        '''
+        Replaces the state of the supercell with arrays from get_arrays.
+        '''
+        self.x_repeat, self.y_repeat, self.z_repeat = (
+            arrays['repeats'].tolist())
+        self.vector_space = arrays['vector_space']
+        self.fractional = arrays['fractional']
+        self.cartesian = arrays.get('cartesian')
+        self.a_side_vector, self.b_side_vector, self.c_side_vector = (
+            arrays['side_vectors'])
+        self.a_side_length = norm(self.a_side_vector)
+        self.b_side_length = norm(self.b_side_vector)
+        self.c_side_length = norm(self.c_side_vector)
+
     def repeat_atoms(self, vector, repeat):
         '''
         Repeats the atoms within the current supercell using a vector to define
@@ -58,18 +151,108 @@ class SuperCell():
             new_atom_array['coordinates'], 6)
         self.fractional = new_atom_array
 
-    def randomise(self, ratios):
+    def randomise(self, ratios, mode='probabilistic', seed=None,
+                  sublattice=None, species=None):
         '''
         Randomises the atoms in the supercell structure. Randomisation is based
         on the provided ratio list. Ratios should add to one and be input in
         the order of the elements arranged alphabetically.
         Example: elements = (Fe, Ti, Pt), ratios = (0.3, 0.2, 0.5)
                  gives: Fe = 0.3, Pt = 0.2, Ti = 0.5.
+
+        mode: 'probabilistic' draws every atom independently, 'exact' places
+            exactly the ratios of atoms, as near as whole numbers allow.
+        seed: Seed, or numpy Generator, see randomise.spawn_generators for
+            parallel workers.
+        sublattice: Element, or list of elements, whose sites are the only
+            ones randomised.
+        species: Elements the ratios refer to, when not the ones present.
         '''
-        unique_elements = np.unique(self.fractional['element'])
-        elements = np.random.choice(unique_elements, self.fractional.shape[0],
-                                    p=ratios)
+        elements = randomise.randomise_elements(
+            self.fractional['element'], ratios, species, mode, seed,
+            sublattice)
         self.fractional['element'] = elements
+        if self.cartesian is not None:
+            self.cartesian['element'] = elements
+
+    def spatial_sort(self, curve='hilbert', bits=10):
+        '''
+        Reorders the atoms of the supercell along a space filling curve,
+        'hilbert' or 'morton', so that atoms close in space are close in the
+        atom arrays. The permutation is found once from the cartesian
+        coordinates and applied to every per-atom column, in both the
+        fractional and cartesian arrays, so call it before writing files.
+        '''
+        cartesian = self.cartesian
+        if cartesian is None:
+            coordinates = self.fractional['coordinates'] @ self.vector_space.T
+        else:
+            coordinates = cartesian['coordinates']
+        order = ordering.curve_order(coordinates, curve, bits)
+        self.fractional = self.fractional[order]
+        if cartesian is not None:
+            self.cartesian = cartesian[order]
+        return order
+
+    def transform(self, matrix=None, vector=None, coordinates='cartesian'):
+        '''
+        Composes an affine transformation into the supercell's pending
+        transform: atoms are moved by the cartesian matrix, then translated by
+        the vector, given in cartesian or in fractional coordinates of the
+        transformed vector space. Nothing is applied to the atoms until they,
+        or the vector space, are next read, so a chain of transformations
+        costs a single pass over the atoms.
+
+        The pending transform is held as a linear map of the vector space and
+        a fractional offset, so fractional translations stay exact.
+        '''
+        if self._linear is None:
+            self._linear = np.identity(3)
+            self._offset = np.zeros(3)
+        if matrix is not None:
+            self._linear = np.array(matrix, dtype=float) @ self._linear
+        if vector is not None:
+            vector = np.array(vector, dtype=float)
+            if coordinates == 'cartesian':
+                vector_space = self._linear @ self._vector_space
+                vector = np.linalg.inv(vector_space) @ vector
+            self._offset = self._offset + vector
+
+    @property
+    def pending_transform(self):
+        '''
+        The transform waiting to be applied, as a 4x4 cartesian affine matrix,
+        the identity if there is none.
+        '''
+        affine = np.identity(4)
+        if self._linear is not None:
+            affine[:3, :3] = self._linear
+            affine[:3, 3] = self._linear @ self._vector_space @ self._offset
+        return affine
+
+    def apply_transform(self):
+        '''
+        Applies the pending transform in place. The vector space and side
+        vectors take the linear part, the offset is added to the fractional
+        coordinates, and cartesian coordinates are recalculated if they exist.
+        '''
+        if self._linear is None:
+            return
+        linear, offset = self._linear, self._offset
+        self._linear = None
+        self._offset = None
+        if not np.all(linear == np.identity(3)):
+            vector_space = linear @ self._vector_space
+            self._vector_space = vector_space
+            self._a_side_vector = self.x_repeat*vector_space[:, 0]
+            self._b_side_vector = self.y_repeat*vector_space[:, 1]
+            self._c_side_vector = self.z_repeat*vector_space[:, 2]
+            self._a_side_length = norm(self._a_side_vector)
+            self._b_side_length = norm(self._b_side_vector)
+            self._c_side_length = norm(self._c_side_vector)
+        if np.any(offset != 0):
+            self._fractional['coordinates'] += offset
+        if self._cartesian is not None: self.set_cartesian()
 
     def set_cartesian(self):
         '''
@@ -9,6 +9,7 @@ Description:
     generalised fairly easily.
 '''
 
+from warnings import warn
 import numpy as np
 import copy
 import transforms
@@ -19,6 +20,9 @@ import edits
 import grain_creation as gc
 import testing_tools
 import crystallography
+import csl
+from atom import Atom
+from unitcell import UnitCell
 
 
 @dataclass
@@ -66,6 +70,172 @@ def get_rotation_vector(vector1, vector2):
     return rotation_vector
 
 
+def oriented_unitcell(unitcell, plane, max_index=20):
+    '''
+    Builds the smallest periodic cell of the unitcell's lattice with lattice
+    vectors a and b in the given (hkl) plane and c along its normal, found
+    through a change of basis, and returns it as a new UnitCell with a along
+    x and the plane normal along z. Replicating it with SuperCell gives slabs
+    and interfaces that are exactly periodic in-plane.
+
+    The search runs on the Bravais lattice, including its centring, so the
+    cell of a centred lattice such as FCC is built from primitive vectors.
+    If no lattice vector along the normal is shorter than max_index
+    primitive vectors in each direction, as for most planes of non-cubic
+    lattices, c is the shortest lattice vector spanning one interplanar
+    spacing instead, which is tilted from the normal.
+    '''
+    plane = np.array(plane, dtype=int)
+    if not np.any(plane):
+        raise ValueError("The plane (000) has no normal.")
+    plane = plane//np.gcd.reduce(plane)
+    vector_space = np.array(unitcell.vector_space, dtype=float)
+    normal = linalg.normalise(np.linalg.inv(vector_space).T @ plane)
+    # Search in integer coordinates of a primitive basis, where the plane's
+    # indices are its conventional ones expressed on the primitive vectors.
+    primitive = primitive_basis(unitcell)
+    primitive_plane = integer_indices(plane @ primitive)
+    primitive_space = vector_space @ primitive
+    change = in_plane_basis(primitive_space, primitive_plane)
+    stacking = stacking_vector(primitive_space, primitive_plane, normal,
+                               change, max_index)
+    change = primitive @ np.vstack((change, stacking)).T
+    # Rotate so a lies along x and the plane normal along z.
+    cartesian = vector_space @ change
+    x_axis = linalg.normalise(cartesian[:, 0])
+    rotation = np.vstack((x_axis, np.cross(normal, x_axis), normal))
+    cartesian = np.round(rotation @ cartesian, 10)
+    atoms = change_of_basis_atoms(unitcell, change)
+    return UnitCell(atoms, *cartesian.T.tolist())
+
+
+def primitive_basis(unitcell):
+    '''
+    Returns a primitive basis of the unitcell's Bravais lattice as the
+    columns of a right-handed matrix in the unitcell's fractional
+    coordinates: the shortest lattice vectors spanning the conventional
+    volume divided by the number of centring translations.
+    '''
+    centring = csl.lattice_centring(unitcell)
+    if centring.shape[0] == 1:
+        return np.identity(3)
+    vector_space = np.array(unitcell.vector_space, dtype=float)
+    grid = np.indices((3, 3, 3)).reshape(3, -1).T - 1
+    grid = (grid[:, None] + centring[None]).reshape(-1, 3)
+    grid = grid[np.any(np.abs(grid) > 1e-8, axis=1)]
+    lengths = np.round(np.linalg.norm(grid @ vector_space.T, axis=1), 8)
+    grid = grid[np.argsort(lengths, kind='stable')]
+    volume = 1/centring.shape[0]
+    for i, first in enumerate(grid):
+        for j in range(i+1, grid.shape[0]):
+            second = grid[j]
+            if np.linalg.norm(np.cross(first, second)) < 1e-8:
+                continue
+            dets = np.cross(first, second) @ grid[j+1:].T
+            complete = np.isclose(np.abs(dets), volume)
+            if np.any(complete):
+                third = grid[j+1+np.argmax(complete)]
+                third = third*np.sign(dets[np.argmax(complete)])
+                return np.array([first, second, third]).T
+    raise ValueError("No primitive basis found for the unitcell's lattice.")
+
+
+def integer_indices(indices, max_denominator=100):
+    '''
+    Returns the rational indices scaled to the smallest coprime integers.
+    '''
+    for scale in range(1, max_denominator+1):
+        scaled = np.array(indices)*scale
+        if np.allclose(scaled, np.round(scaled), atol=1e-6):
+            scaled = np.round(scaled).astype(int)
+            return scaled//np.gcd.reduce(scaled)
+    raise ValueError(f"The indices {indices} are not rational.")
+
+
+def in_plane_basis(vector_space, plane):
+    '''
+    Returns the integer lattice vectors, as rows, of the shortest reduced
+    basis of the lattice vectors lying in the plane, ordered so that their
+    cross product points along the plane normal.
+    '''
+    bound = int(np.max(np.abs(plane))) + 1
+    while True:
+        grid = np.indices((2*bound+1,)*3).reshape(3, -1).T - bound
+        grid = grid[(grid @ plane == 0) & np.any(grid != 0, axis=1)]
+        lengths = np.linalg.norm(grid @ vector_space.T, axis=1)
+        grid = grid[np.argsort(lengths, kind='stable')]
+        first = grid[0]
+        # A second vector completes the basis if the cell area is primitive.
+        crosses = np.cross(first, grid)
+        complete = np.all(crosses == plane, axis=1)
+        if np.any(complete):
+            second = grid[np.argmax(complete)]
+            break
+        bound *= 2
+    # Gauss reduction in the cartesian metric.
+    metric = vector_space.T @ vector_space
+    while True:
+        if first @ metric @ first > second @ metric @ second:
+            first, second = second, -first
+        shift = int(np.round((first @ metric @ second)/(
+            first @ metric @ first)))
+        if shift == 0:
+            break
+        second = second - shift*first
+    return np.array([first, second])
+
+
+def stacking_vector(vector_space, plane, normal, in_plane, max_index):
+    '''
+    Returns the shortest integer lattice vector along the plane normal within
+    max_index, or otherwise the lattice vector one interplanar spacing up
+    whose in-plane component is smallest.
+    '''
+    grid = np.indices((2*max_index+1,)*3).reshape(3, -1).T - max_index
+    grid = grid[grid @ plane > 0]
+    cartesian = grid @ vector_space.T
+    # Within a small angle, lattice parameters are often given to 3 or 4
+    # significant figures.
+    along = np.linalg.norm(np.cross(cartesian, normal), axis=1) < 1e-3*(
+        np.linalg.norm(cartesian, axis=1))
+    if np.any(along):
+        vectors = grid[along]
+        return vectors[np.argmin(vectors @ plane)]
+    warn(f"No lattice vector along the ({' '.join(map(str, plane))}) normal "
+         "within max_index, c is tilted from the normal.")
+    # Any solution of h*u + k*v + l*w = 1 spans one interplanar spacing,
+    # bring its in-plane component back into the in-plane cell.
+    stacking = grid[grid @ plane == 1][0]
+    cartesian = vector_space @ stacking
+    projection = cartesian - (cartesian @ normal)*normal
+    shift = np.linalg.lstsq((vector_space @ in_plane.T), projection,
+                            rcond=None)[0]
+    return stacking - np.round(shift).astype(int) @ in_plane
+
+
+def change_of_basis_atoms(unitcell, change):
+    '''
+    Returns the atoms of the cell whose lattice vectors, in the unitcell's
+    fractional coordinates, are the columns of the change matrix, in the
+    fractional coordinates of the new cell.
+    '''
+    basis = np.concatenate([atom.fractional for atom in unitcell.atoms])
+    corners = np.indices((2, 2, 2)).reshape(3, -1).T @ change.T
+    lower = np.floor(np.min(corners, axis=0)).astype(int) - 1
+    upper = np.ceil(np.max(corners, axis=0)).astype(int) + 1
+    cells = np.stack(np.meshgrid(*[np.arange(low, high+1) for low, high
+                                   in zip(lower, upper)], indexing='ij'),
+                     axis=-1).reshape(-1, 3)
+    positions = (cells[:, None] + basis['coordinates']).reshape(-1, 3)
+    elements = np.tile(basis['element'], cells.shape[0])
+    fractional = np.round(positions @ np.linalg.inv(change).T, 8)
+    inside = np.all((fractional >= 0) & (fractional < 1), axis=1)
+    fractional = fractional[inside] % 1
+    return [Atom(str(element), float(x), float(y), float(z))
+            for element, (x, y, z) in zip(elements[inside],
+                                          fractional.tolist())]
+
+
 def cut_slab(supercell, thickness, minimum=0):
     '''
     Cut a slab from the given supercell with the given thickness if possible.
@@ -9,6 +9,7 @@ Description:
 '''
 import os
 import utility
+import cache
 
 
 def xyz_output(file_name, atom_list):
@@ -54,3 +55,18 @@ def plane_folder_creator(folder_number, planes):
     for key, plane in planes.items():
         name = 'planes_'+folder_number+'/'+key
         xyz_file_output(name, plane['Plane_Atoms'].tolist())
+
+
+def isolate_cache(directory=False):
+    '''
+    Swaps the package cache for an empty enabled one, in memory only unless
+    a directory is given, so tests neither share builds nor read the user's
+    cache. Returns the function restoring the previous cache, to pass to a
+    test's addCleanup in setUp.
+    '''
+    default = cache.CACHE
+    cache.CACHE = cache.Cache(directory, enabled=True)
+
+    def restore():
+        cache.CACHE = default
+    return restore
@@ -37,25 +37,57 @@ def rotate_atom(atom, matrix):
 def rotate_supercell(supercell, matrix):
     '''
     Rotates a SuperCell object using the given matrix to alter its vector
-    space, and to rotate it's vectors.
+    space, and to rotate it's vectors. The rotation is composed into the
+    supercell's pending transform, and applied when the supercell is next read.
     '''
-    vector_space = copy.deepcopy(supercell.vector_space)
-    vector_space = matrix @ vector_space
-    supercell.a_side_vector = supercell.x_repeat*vector_space[:, 0]
-    supercell.b_side_vector = supercell.y_repeat*vector_space[:, 1]
-    supercell.c_side_vector = supercell.z_repeat*vector_space[:, 2]
-    supercell.vector_space = vector_space
-    if supercell.cartesian is not None: supercell.set_cartesian()
+    supercell.transform(matrix)
 
 
 def translate(structure, vector, coordinates='fractional'):
     '''
     Translates the structured array via its fractional coordinates by default,
-    however can translate in cartesian also.
+    however can translate in cartesian also. Supercells compose the translation
+    into their pending transform.
     '''
     vector = np.array(vector)
+    if isinstance(structure, SuperCell):
+        structure.transform(vector=vector, coordinates=coordinates)
+        return
     if coordinates == 'cartesian':
         inverse_vector_space = np.linalg.inv(structure.vector_space)
         vector = inverse_vector_space @ vector
     structure.fractional['coordinates'] += vector
     if not structure.cartesian is None: structure.set_cartesian()
+
+
+def reflect(supercell, normal, point=(0, 0, 0)):
+    '''
+    Mirrors a supercell across the plane through the cartesian point with the
+    given cartesian normal. Unlike edits.reflect no atoms are added or removed,
+    the whole supercell, vector space included, is mirrored.
+    '''
+    normal = linalg.normalise(np.array(normal, dtype=float))
+    matrix = np.identity(3) - 2*np.outer(normal, normal)
+    vector = 2*np.dot(np.array(point, dtype=float), normal)*normal
+    supercell.transform(matrix, vector)
+
+
+def strain(supercell, strain):
+    '''
+    Strains a supercell homogeneously, moving every cartesian position x to
+    (I + strain) @ x. Strain is a 3x3 strain tensor, three normal strains along
+    x, y, and z, or one strain applied equally along all three.
+    '''
+    strain = np.array(strain, dtype=float)
+    if strain.ndim < 2:
+        strain = np.identity(3)*strain
+    supercell.transform(np.identity(3) + strain)
+
+
+def affine(supercell, matrix):
+    '''
+    Applies a 4x4 cartesian affine matrix to a supercell, the top left 3x3
+    block is the linear part and the last column the translation.
+    '''
+    matrix = np.array(matrix, dtype=float)
+    supercell.transform(matrix[:3, :3], matrix[:3, 3])
@@ -0,0 +1,105 @@
+import unittest
+import os
+import sys
+import numpy as np
+from scipy.spatial.transform import Rotation as R
+
+
+class TestAnalyse_Misorientation(unittest.TestCase):
+
+    def test_point_group_operators(self):
+        '''
+        Do the point groups have the right number of proper rotations, each
+        mapping the lattice onto itself?
+        '''
+        counts = {'cubic': 24, 'hexagonal': 12, 'trigonal': 6,
+                  'tetragonal': 8, 'orthorhombic': 4, 'triclinic': 1}
+        for system, count in counts.items():
+            operators = misorientation.point_group_operators(system)
+            self.assertEqual(operators.shape, (count, 3, 3))
+        cubic = misorientation.point_group_operators('cubic')
+        self.assertTrue(np.allclose(cubic, np.around(cubic)))
+        self.assertRaises(ValueError, misorientation.point_group_operators,
+                          'monoclinic')
+
+    def test_twin_disorientation(self):
+        '''
+        Is a Sigma 3 twin 60 degrees about <111> however it is described,
+        and the symmetry equivalent of a 100 degree [001] rotation 10
+        degrees?
+        '''
+        twin = R.from_rotvec(np.pi/3*np.array([1, 1, 1])/np.sqrt(3))
+        base = R.random(5, random_state=2)
+        cubic = R.from_matrix(misorientation.point_group_operators())
+        orientations = np.concatenate((
+            base.as_matrix(), (base*twin*cubic[7]).as_matrix()))
+        pairs = np.array([[index, index + 5] for index in range(5)])
+        angles, axes = misorientation.disorientations(orientations, pairs)
+        self.assertTrue(np.allclose(angles, np.pi/3))
+        self.assertTrue(np.allclose(axes, 1/np.sqrt(3)))
+        rotation = R.from_rotvec(np.radians(100)*np.array([0, 0, 1]))
+        angles, axes = misorientation.disorientations(
+            np.stack([np.identity(3), rotation.as_matrix()]))
+        self.assertTrue(np.allclose(np.degrees(angles), 10))
+        self.assertTrue(np.allclose(axes, [[1, 0, 0]]))
+
+    def test_random_disorientations(self):
+        '''
+        Are random cubic disorientations never above 62.8 degrees, and the
+        same when the grains of a pair are swapped?
+        '''
+        orientations = R.random(200, random_state=3).as_matrix()
+        angles = misorientation.disorientations(orientations)[0]
+        self.assertEqual(angles.shape[0], 200*199//2)
+        self.assertTrue(np.degrees(np.max(angles)) < 62.81)
+        pairs = np.array([[0, 1], [1, 0]])
+        angles, axes = misorientation.disorientations(orientations, pairs)
+        self.assertAlmostEqual(angles[0], angles[1])
+        self.assertTrue(np.allclose(axes[0], axes[1]))
+
+    def test_orientations_from_supercells_and_points(self):
+        '''
+        Is the rotation of a supercell recovered from its vector space, and
+        a rotation fitted from matched points?
+        '''
+        unitcell = UnitCell([Atom('Fe', 0, 0, 0), Atom('Fe', 0.5, 0.5, 0.5)],
+                            [2.87, 0, 0], [0, 2.87, 0], [0, 0, 2.87])
+        supercell = SuperCell(unitcell, 3, 3, 3)
+        rotation = R.random(random_state=4).as_matrix()
+        transforms.rotate(supercell, rotation)
+        self.assertTrue(np.allclose(
+            misorientation.supercell_orientation(supercell), rotation))
+        points = np.random.default_rng(4).normal(size=(12, 3))
+        fitted = misorientation.fit_orientation(points @ rotation.T, points)
+        self.assertTrue(np.allclose(fitted, rotation))
+
+    def test_polycrystal_disorientations(self):
+        '''
+        Are neighbouring grains of a polycrystal found, with disorientations
+        matching their orientations?
+        '''
+        unitcell = UnitCell([Atom('Fe', 0, 0, 0), Atom('Fe', 0.5, 0.5, 0.5)],
+                            [2.87, 0, 0], [0, 2.87, 0], [0, 0, 2.87])
+        structure = polycrystal.build_polycrystal(
+            unitcell, [40, 40, 40], number=6, seed=5)
+        pairs, angles, axes = misorientation.polycrystal_disorientations(
+            structure, 3)
+        self.assertTrue(pairs.shape[0] > 0)
+        self.assertTrue(np.all(pairs[:, 0] < pairs[:, 1]))
+        expected = misorientation.disorientations(structure.orientations,
+                                                  pairs)[0]
+        self.assertTrue(np.allclose(angles, expected))
+
+
+if __name__ == '__main__':
+    current_directory = os.getcwd()
+    package_directory_index = current_directory.index('grain_modeller')
+    package_directory = current_directory[:package_directory_index+14]
+    sys.path.append(package_directory+'/grain_modeller')
+    from atom import Atom
+    from unitcell import UnitCell
+    from supercell import SuperCell
+    import transforms
+    import polycrystal
+    from analyse.grains import misorientation
+    unittest.main()
@@ -8,6 +8,9 @@ import pandas as pd
 
 class TestAnalyse_SurfaceBase(unittest.TestCase):
 
+    def setUp(self):
+        self.addCleanup(test_tool.isolate_cache())
+
     def OFF_test_PlaneGroup(self):
         '''
         Tests the initialisation of the PlaneGroup class.
@@ -324,4 +327,5 @@ if __name__ == '__main__':
     from edits import Cut
     from atom import Atom
     from unitcell import UnitCell
+    import testing_tools as test_tool
     unittest.main()
@@ -0,0 +1,88 @@
+import unittest
+import os
+import sys
+import numpy as np
+
+
+class TestAssembly(unittest.TestCase):
+
+    def setUp(self):
+        self.addCleanup(test_tool.isolate_cache())
+        self.host_cell = UnitCell([Atom('Fe', 0, 0, 0)], [2, 0, 0],
+                                  [0, 2, 0], [0, 0, 2])
+        grain_cell = UnitCell([Atom('Pt', 0, 0, 0), Atom('Pt', 0.5, 0.5, 0)],
+                              [2.5, 0, 0], [0, 2.5, 0], [0, 0, 2.5])
+        cuts = [Cut('s', [0.5, 0.5, 0.5], radius=0.45, out=False)]
+        self.grain = gc.Grain('sphere', grain_cell, cuts, [1, 1, 1])
+        gc.build_grain(self.grain, 4)
+
+    def test_embed(self):
+        '''
+        Does embedding carve the grain's shape out of the host, keep every
+        grain atom, and leave no host atom overlapping the grain?
+        '''
+        host = SuperCell(self.host_cell, 10, 10, 10)
+        assembled, labels = assembly.embed(host, self.grain, overlap=1)
+        grain_atoms = self.grain.supercell.fractional.shape[0]
+        self.assertEqual(np.sum(labels == 1), grain_atoms)
+        self.assertEqual(labels.shape[0], assembled.fractional.shape[0])
+        self.assertTrue(np.all(assembled.fractional['element'][labels == 1]
+                               == 'Pt'))
+        assembled.set_cartesian()
+        coordinates = assembled.cartesian['coordinates']
+        # Sphere of radius 4.5 centred on the host centre, (9, 9, 9).
+        host_atoms = coordinates[labels == 0]
+        distances = np.linalg.norm(host_atoms - [9, 9, 9], axis=1)
+        self.assertTrue(np.all(distances >= 4.5))
+        self.assertTrue(np.sum(distances < 5.5) > 0)
+        pairs = ce.close_pairs(host_atoms, 1, coordinates[labels == 1])
+        self.assertEqual(pairs[0].shape[0], 0)
+        self.assertTrue(np.allclose(assembled.vector_space,
+                                    host.vector_space))
+        two, labels = assembly.embed(
+            SuperCell(self.host_cell, 10, 10, 10), [self.grain, self.grain],
+            positions=[[0, 0, 0], [2, 2, 2]], overlap=1)
+        self.assertTrue(set(np.unique(labels)) == {0, 1, 2})
+        self.assertTrue(np.sum(labels == 2) < grain_atoms)
+        with self.assertRaises(ValueError):
+            assembly.embed(host, gc.Grain('empty', self.host_cell, [],
+                                          [1, 1, 1]))
+        unscaled = gc.Grain('unscaled', self.host_cell, [], [1, 1, 1])
+        unscaled.supercell = SuperCell(self.host_cell, 2, 2, 2)
+        self.assertRaises(ValueError, assembly.grain_cuts, unscaled)
+
+    def test_core_shell(self):
+        '''
+        Is the core wrapped in a shell of the given thickness?
+        '''
+        assembled, labels = assembly.core_shell(
+            self.grain, self.host_cell, 3, overlap=1)
+        assembled.set_cartesian()
+        coordinates = assembled.cartesian['coordinates']
+        core = coordinates[labels == 1]
+        shell = coordinates[labels == 0]
+        self.assertEqual(core.shape[0],
+                         self.grain.supercell.fractional.shape[0])
+        self.assertTrue(np.all(assembled.fractional['element'][labels == 0]
+                               == 'Fe'))
+        centre = np.array([5, 5, 5])
+        distances = np.linalg.norm(shell - centre, axis=1)
+        self.assertTrue(np.all(distances >= 4.5))
+        self.assertTrue(np.all(distances < 4.5 + 3 + 1e-6))
+        self.assertEqual(ce.close_pairs(shell, 1, core)[0].shape[0], 0)
+
+
+if __name__ == '__main__':
+    current_directory = os.getcwd()
+    package_directory_index = current_directory.index('grain_modeller')
+    package_directory = current_directory[:package_directory_index+14]
+    sys.path.append(package_directory+'/grain_modeller')
+    from atom import Atom
+    from unitcell import UnitCell
+    from supercell import SuperCell
+    from edits import Cut
+    import grain_creation as gc
+    import cartesian_edits as ce
+    import assembly
+    import testing_tools as test_tool
+    unittest.main()
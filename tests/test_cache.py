@@ -0,0 +1,188 @@
+import unittest
+import os
+import sys
+import tempfile
+import numpy as np
+import pandas as pd
+
+
+class TestCache(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(test_tool.isolate_cache(self.directory.name))
+        basis = [Atom('Fe', 0.0, 0.0, 0.0), Atom('Fe', 0.5, 0.5, 0.0),
+                 Atom('Pt', 0.5, 0.0, 0.5), Atom('Pt', 0.0, 0.5, 0.5)]
+        self.unitcell = UnitCell(basis, [3, 0, 0], [0, 3, 0], [0, 0, 3.7])
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_build_key(self):
+        '''
+        Do equal build inputs share a key, and different ones not?
+        '''
+        cuts = [Cut('p', [0, 0, 0.5], plane=[0, 0, 1])]
+        key = cache.build_key('grain', self.unitcell, cuts, [1, 1, 1], 2)
+        same = cache.build_key(
+            'grain', self.unitcell, [Cut('p', [0, 0, 0.5], plane=[0, 0, 1])],
+            [1, 1, 1], 2)
+        self.assertEqual(key, same)
+        self.assertNotEqual(key, cache.build_key(
+            'grain', self.unitcell, cuts, [1, 1, 1], 3))
+        self.assertNotEqual(key, cache.build_key(
+            'grain', self.unitcell, [Cut('p', [0, 0, 0.6], plane=[0, 0, 1])],
+            [1, 1, 1], 2))
+        self.assertRaises(TypeError, cache.build_key, 'grain', {1, 2})
+
+    def test_memory_eviction(self):
+        '''
+        Are the least recently used entries evicted beyond the byte budget,
+        and are copies handed out?
+        '''
+        store = cache.Cache(False, memory_bytes=2000, enabled=True)
+        for key in ['a', 'b', 'c']:
+            store.store(key, {'values': np.zeros(100)})
+        self.assertIsNone(store.load('a'))
+        store.load('b')
+        store.store('d', {'values': np.zeros(100)})
+        self.assertIsNone(store.load('c'))
+        arrays = store.load('b')
+        arrays['values'][:] = 1
+        self.assertTrue(np.all(store.load('b')['values'] == 0))
+        self.assertTrue(store.memory_used == 1600)
+
+    def test_disk_tier(self):
+        '''
+        Are arrays read back from disk in a new process' cache, least
+        recently used files trimmed, and nothing kept when disabled?
+        '''
+        atoms = np.zeros(10, dtype=[('element', 'U10'),
+                                    ('coordinates', 'f8', 3)])
+        atoms['element'] = 'Fe'
+        cache.store('first', {'atoms': atoms})
+        fresh = cache.Cache(self.directory.name, enabled=True)
+        self.assertTrue(np.all(fresh.load('first')['atoms'] == atoms))
+        os.utime(fresh.path('first'), (0, 0))
+        size = os.path.getsize(fresh.path('first'))
+        fresh.disk_bytes = size + size//2
+        fresh.store('second', {'atoms': atoms})
+        self.assertFalse(os.path.exists(fresh.path('first')))
+        self.assertTrue(os.path.exists(fresh.path('second')))
+        off = cache.Cache(self.directory.name, enabled=False)
+        off.store('third', {'atoms': atoms})
+        self.assertIsNone(off.load('second'))
+        self.assertFalse(os.path.exists(off.path('third')))
+        os.environ['GRAIN_MODELLER_NO_CACHE'] = '1'
+        try:
+            self.assertFalse(cache.Cache(self.directory.name).enabled)
+        finally:
+            del os.environ['GRAIN_MODELLER_NO_CACHE']
+
+    def test_configure(self):
+        '''
+        Is the disk tier off unless a directory is given, and can the package
+        cache be changed at runtime?
+        '''
+        directory = os.environ.pop('GRAIN_MODELLER_CACHE_DIR', None)
+        try:
+            self.assertFalse(cache.Cache().directory)
+        finally:
+            if directory is not None:
+                os.environ['GRAIN_MODELLER_CACHE_DIR'] = directory
+        cache.configure(directory=False)
+        cache.store('memory', {'values': np.zeros(10)})
+        self.assertEqual(os.listdir(self.directory.name), [])
+        self.assertTrue(np.all(cache.load('memory')['values'] == 0))
+        cache.configure(directory=self.directory.name, memory_bytes=0)
+        self.assertEqual(cache.CACHE.memory_used, 0)
+        cache.store('disk', {'values': np.zeros(10)})
+        self.assertTrue(os.path.exists(cache.CACHE.path('disk')))
+        cache.configure(enabled=False)
+        self.assertIsNone(cache.load('disk'))
+
+    def test_cached_builds(self):
+        '''
+        Are built grains and supercells taken from the cache, unchanged by
+        edits to earlier copies?
+        '''
+        cuts = [Cut('p', [0, 0, 0.5], plane=[0, 0, 1])]
+        grain = gc.Grain('test', self.unitcell, cuts, [1, 1, 1])
+        built = gc.build_grain(grain, 4)
+        expected = built.fractional.copy()
+        built.fractional['element'] = 'Cu'
+        self.assertEqual(len(os.listdir(self.directory.name)), 1)
+        cache.CACHE.clear(disk=False)
+        cached = gc.build_grain(grain, 4)
+        self.assertTrue(np.all(cached.fractional == expected))
+        self.assertTrue(cached.a_side_length == 12)
+        self.assertTrue(cached.unitcell is self.unitcell)
+        gc.build_grain(grain, 5, use_cache=False)
+        self.assertEqual(len(os.listdir(self.directory.name)), 1)
+        first = SuperCell(self.unitcell, 3, 2, 1)
+        first.fractional['element'] = 'Cu'
+        second = SuperCell(self.unitcell, 3, 2, 1)
+        self.assertTrue(np.all(second.fractional['element'] != 'Cu'))
+        self.assertTrue(second.fractional.shape[0] == 24)
+        self.assertTrue(np.allclose(second.c_side_vector, [0, 0, 3.7]))
+        stored = len(cache.CACHE.memory)
+        SuperCell(self.unitcell, 2, 2, 2, use_cache=False)
+        self.assertEqual(len(cache.CACHE.memory), stored)
+        default = supercell.CACHE_ATOMS
+        supercell.CACHE_ATOMS = 24
+        try:
+            SuperCell(self.unitcell, 4, 2, 1)
+            self.assertEqual(len(cache.CACHE.memory), stored)
+            SuperCell(self.unitcell, 1, 2, 3)
+            self.assertEqual(len(cache.CACHE.memory), stored + 1)
+        finally:
+            supercell.CACHE_ATOMS = default
+
+    def test_cached_match(self):
+        '''
+        Does a repeated compositional match give the same grains from the
+        cache, with every attribute set by matching?
+        '''
+        cuts = [Cut('p', [0, 0, 0.5], plane=[0, 0, 1])]
+        cuts_2 = [Cut('p', [1, 1, 0.5], plane=[1, 1, 1])]
+        grains = [gc.Grain('test', self.unitcell, cuts, [1, 1, 1]),
+                  gc.Grain('test_2', self.unitcell, cuts_2, [1, 2, 1])]
+        matched = gc.compositionally_match(grains, 2000)
+        expected = [grain.supercell.fractional.copy() for grain in matched]
+        again = [gc.Grain('test', self.unitcell, cuts, [1, 1, 1]),
+                 gc.Grain('test_2', self.unitcell, cuts_2, [1, 2, 1])]
+        cache.CACHE.clear(disk=False)
+        again = gc.compositionally_match(again, 2000)
+        for grain, fractional in zip(again, expected):
+            self.assertTrue(np.all(grain.supercell.fractional == fractional))
+        self.assertTrue(again[1].scale_factor == matched[1].scale_factor)
+        self.assertTrue(np.all(again[0].best_composition.values
+                               == matched[0].best_composition.values))
+        self.assertTrue(list(again[0].best_composition.columns)
+                        == ['Fe', 'Pt'])
+        for grain, original in zip(again, matched):
+            self.assertTrue(np.all(grain.surface_atoms
+                                   == original.surface_atoms))
+            self.assertTrue(np.all(grain.distance_symmetries
+                                   == original.distance_symmetries))
+            pd.testing.assert_frame_equal(grain.composition_deltas,
+                                          original.composition_deltas)
+        files = len(os.listdir(self.directory.name))
+        gc.compositionally_match(grains, 3000, use_cache=False)
+        self.assertEqual(len(os.listdir(self.directory.name)), files)
+
+
+if __name__ == '__main__':
+    current_directory = os.getcwd()
+    package_directory_index = current_directory.index('grain_modeller')
+    package_directory = current_directory[:package_directory_index+14]
+    sys.path.append(package_directory+'/grain_modeller')
+    import cache
+    import testing_tools as test_tool
+    import supercell
+    import grain_creation as gc
+    from atom import Atom
+    from unitcell import UnitCell
+    from supercell import SuperCell
+    from edits import Cut
+    unittest.main()
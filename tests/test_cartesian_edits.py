@@ -86,6 +86,179 @@ class TestCartesianEdits(unittest.TestCase):
             r"Please read the box_select description for more details."
         )
 
+    def test_regions(self):
+        '''
+        Do the basic regions contain the expected points?
+        '''
+        points = np.array([[0, 0, 0], [1, 1, 1], [2, 0, 0], [0, 0, 3],
+                           [-1, 0.5, 0.5]], dtype=float)
+        box = ce.Box([-0.5, -0.5, -0.5], [1.5, 1.5, 1.5])
+        self.assertTrue(box.contains(points).tolist()
+                        == [True, True, False, False, False])
+        sphere = ce.Sphere([0, 0, 0], 2)
+        self.assertTrue(sphere.contains(points).tolist()
+                        == [True, True, True, False, True])
+        cylinder = ce.Cylinder([0, 0, 0], [0, 0, 2], 0.5, length=3)
+        self.assertTrue(cylinder.contains(points).tolist()
+                        == [True, False, False, True, False])
+        half_space = ce.HalfSpace([1, 0, 0], [1, 0, 0])
+        self.assertTrue(half_space.contains(points).tolist()
+                        == [True, True, False, True, True])
+        self.assertTrue(half_space.bounds()[1].tolist() == [1, np.inf, np.inf])
+        wedge = ce.Prism([[-2, 0], [3, 0], [-2, 2]], -1, 2)
+        wedge_points = np.array([[0, 0.5, 0], [1, 1, 1], [2, -0.1, 0],
+                                 [0, 0.5, 3], [-1, 0.5, 0.5]])
+        self.assertTrue(wedge.contains(wedge_points).tolist()
+                        == [True, False, False, False, True])
+
+    def test_region_composition(self):
+        '''
+        Do unions, intersections and differences of regions combine the
+        points they contain correctly?
+        '''
+        points = np.random.default_rng(1).uniform(-5, 5, (2000, 3))
+        sphere = ce.Sphere([0, 0, 0], 3)
+        box = ce.Box([0, -5, -5], [5, 5, 5])
+        in_sphere = sphere.contains(points)
+        in_box = box.contains(points)
+        self.assertTrue(np.all((sphere | box).contains(points)
+                               == (in_sphere | in_box)))
+        self.assertTrue(np.all((sphere & box).contains(points)
+                               == (in_sphere & in_box)))
+        self.assertTrue(np.all((sphere - box).contains(points)
+                               == (in_sphere & np.invert(in_box))))
+        minimum, maximum = (sphere & box).bounds()
+        self.assertTrue(minimum.tolist() == [0, -3, -3])
+        self.assertTrue(maximum.tolist() == [3, 3, 3])
+
+    def test_bin_index_select_matches_full_scan(self):
+        '''
+        Does selecting through a bin index give the same result as testing
+        every point, for bounded and unbounded regions?
+        '''
+        basis = [Atom('Fe', 0, 0, 0), Atom('Fe', 0.5, 0.5, 0.5)]
+        unitcell = UnitCell(basis, [2.8, 0, 0], [0, 2.8, 0], [0, 0, 2.8])
+        supercell = SuperCell(unitcell, 20, 20, 20)
+        supercell.set_cartesian()
+        atoms = supercell.cartesian['coordinates']
+        index = ce.BinIndex(atoms)
+        regions = [
+            ce.Box([10, 10, 10], [30, 20, 40]),
+            ce.Sphere([28, 28, 28], 12.5),
+            ce.Cylinder([0, 0, 0], [1, 1, 1], 6),
+            ce.HalfSpace([5, 5, 5], [1, 2, 3]) & ce.Sphere([5, 5, 5], 9),
+            ce.Prism([[0, 0], [20, 0], [0, 20]], 3, 9) - ce.Box(
+                [0, 0, 0], [5, 5, 50]),
+            ce.Sphere([-100, 0, 0], 1)]
+        for region in regions:
+            expected = region.contains(atoms)
+            self.assertTrue(np.all(index.select(region) == expected))
+        self.assertTrue(
+            np.all(ce.region_select(atoms, regions[1])
+                   == regions[1].contains(atoms)))
+        empty = ce.BinIndex(np.zeros((0, 3)))
+        self.assertTrue(empty.select(regions[1]).shape == (0,))
+        self.assertTrue(empty.label(regions).shape == (0,))
+        self.assertRaises(TypeError, ce.Region)
+
+    def test_label_regions(self):
+        '''
+        Does labelling give every point the first region containing it, and
+        the default label otherwise?
+        '''
+        points = np.random.default_rng(2).uniform(0, 10, (5000, 3))
+        regions = [ce.Sphere([5, 5, 5], 2), ce.Box([0, 0, 0], [6, 6, 6]),
+                   ce.HalfSpace([0, 0, 8], [0, 0, -1])]
+        labels = ce.label_regions(points, regions)
+        expected = np.full(points.shape[0], -1)
+        for region_id in reversed(range(len(regions))):
+            expected[regions[region_id].contains(points)] = region_id
+        self.assertTrue(np.all(labels == expected))
+        self.assertTrue(set(np.unique(labels)) == {-1, 0, 1, 2})
+
+
+    def test_close_pairs_matches_full_scan(self):
+        '''
+        Are all pairs within the cutoff found, including points with more
+        close neighbours than first queried and pairs across periodic edges?
+        '''
+        points = np.random.default_rng(3).uniform(0, 10, (300, 3))
+        for box in [None, [10, 10, 10]]:
+            firsts, seconds, distances = ce.close_pairs(
+                points, 2, box=box, chunk_size=100, neighbours=1)
+            separations = points[:, None] - points
+            if box is not None:
+                separations -= np.around(separations/10)*10
+            separations = np.linalg.norm(separations, axis=2)
+            expected = np.argwhere(np.triu(separations < 2, k=1))
+            found = np.array(sorted(zip(firsts, seconds)))
+            self.assertTrue(np.all(found == expected))
+            self.assertTrue(np.allclose(
+                distances, separations[firsts, seconds]))
+
+    def test_overlap_mask_policies(self):
+        '''
+        Do overlap policies keep the earlier point, the point of the first
+        set, or a reproducible random point, leaving no overlaps behind, and
+        are empty sets handled?
+        '''
+        points = np.array([[0, 0, 0], [0.1, 0, 0], [0.2, 0, 0], [5, 5, 5],
+                           [5.05, 5, 5]])
+        keep = ce.overlap_mask(points, 0.15)
+        self.assertTrue(np.all(keep == [True, False, True, True, False]))
+        keep_a, keep_b = ce.overlap_mask(
+            points[:3], 0.15, points[3:]+[[-4.95, -5, -5], [0, 0, 0]],
+            policy='a')
+        self.assertTrue(np.all(keep_a))
+        self.assertTrue(np.all(keep_b == [False, True]))
+        # Overlaps within either set are only resolved keeping the first.
+        keep_a, keep_b = ce.overlap_mask(points[:3], 0.15, points[3:],
+                                         policy='first')
+        self.assertTrue(np.all(keep_a == [True, False, True]))
+        self.assertTrue(np.all(keep_b == [True, False]))
+        keep_a, keep_b = ce.overlap_mask(points[:3], 0.15, points[3:],
+                                         policy='a')
+        self.assertTrue(np.all(keep_a) and np.all(keep_b))
+        keep_a, keep_b = ce.overlap_mask(points, 0.15, np.zeros((0, 3)),
+                                         policy='a')
+        self.assertTrue(np.all(keep_a) and keep_b.shape == (0,))
+        self.assertEqual(ce.close_pairs(points, 1, np.zeros((0, 3)))[0].shape,
+                         (0,))
+        cloud = np.random.default_rng(4).uniform(0, 5, (2000, 3))
+        keep = ce.overlap_mask(cloud, 0.3, policy='random', seed=7)
+        self.assertTrue(np.all(
+            keep == ce.overlap_mask(cloud, 0.3, policy='random', seed=7)))
+        self.assertEqual(ce.close_pairs(cloud[keep], 0.3)[0].shape[0], 0)
+        survivors = ce.overlap_survivors(cloud, 0.3)
+        kept = survivors == np.arange(cloud.shape[0])
+        self.assertTrue(np.all(kept[survivors]))
+        with self.assertRaises(ValueError):
+            ce.overlap_mask(points, 0.15, policy='a')
+        with self.assertRaises(ValueError):
+            ce.overlap_mask(points, 0.15, policy='last')
+
+    def test_separated_sample_matches_sequential(self):
+        '''
+        Does batched sampling pick the same points as trying them one at a
+        time in the same random order, with and without a periodic box?
+        '''
+        rng = np.random.default_rng(4)
+        points = rng.uniform(0, 20, (3000, 3))
+        for box in [None, np.array([20, 20, 20])]:
+            picked = ce.separated_sample(points, 200, 2.5, seed=5, box=box,
+                                         batch_size=64)
+            order = np.random.default_rng(5).permutation(points.shape[0])
+            expected = []
+            for index in order:
+                if len(expected) == 200:
+                    break
+                separations = points[expected] - points[index]
+                if box is not None:
+                    separations -= np.around(separations/box)*box
+                if np.all(np.linalg.norm(separations, axis=1) >= 2.5):
+                    expected.append(index)
+            self.assertTrue(np.array_equal(picked, expected))
+        self.assertEqual(ce.separated_sample(points, 10, seed=1).shape[0], 10)
 
 
 if __name__ == '__main__':
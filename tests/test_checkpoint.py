@@ -0,0 +1,128 @@
+import unittest
+import os
+import sys
+import tempfile
+import numpy as np
+import pandas as pd
+
+
+class TestCheckpoint(unittest.TestCase):
+
+    def setUp(self):
+        self.addCleanup(test_tool.isolate_cache())
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, 'checkpoint')
+        basis = [Atom('Fe', 0.0, 0.0, 0.0), Atom('Fe', 0.5, 0.5, 0.0),
+                 Atom('Pt', 0.5, 0.0, 0.5), Atom('Pt', 0.0, 0.5, 0.5)]
+        self.unitcell = UnitCell(basis, [3, 0, 0], [0, 3, 0], [0, 0, 3.7])
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_supercell_round_trip(self):
+        '''
+        Is a transformed supercell loaded back identically, memory mapped
+        copy on write, with tuples kept apart from lists?
+        '''
+        supercell = SuperCell(self.unitcell, 4, 3, 2)
+        supercell.set_cartesian()
+        supercell.transform(vector=[0.25, 0, 0], coordinates='fractional')
+        supercell.notes = {'shape': (4, [3, (2,)]), 'repeats': [4, 3, 2]}
+        checkpoint.save_checkpoint(supercell, self.path)
+        loaded = checkpoint.load_checkpoint(self.path)
+        self.assertTrue(loaded.notes == supercell.notes)
+        self.assertTrue(isinstance(loaded.notes['shape'][1][1], tuple))
+        self.assertTrue(isinstance(loaded.notes['repeats'], list))
+        self.assertTrue(isinstance(loaded, SuperCell))
+        self.assertTrue(isinstance(loaded.fractional, np.memmap))
+        self.assertTrue(np.all(loaded.fractional == supercell.fractional))
+        self.assertTrue(np.all(loaded.cartesian == supercell.cartesian))
+        self.assertTrue(np.all(loaded.vector_space == supercell.vector_space))
+        self.assertTrue(loaded.b_side_length == supercell.b_side_length)
+        self.assertEqual(repr(loaded), repr(supercell))
+        loaded.fractional['element'] = 'Cu'
+        again = checkpoint.load_checkpoint(self.path, mmap_mode=None)
+        self.assertTrue(np.all(again.fractional['element'] != 'Cu'))
+        loaded.transform(vector=[1, 0, 0])
+        self.assertTrue(np.allclose(loaded.cartesian['coordinates'][:, 0],
+                                    supercell.cartesian['coordinates'][:, 0]
+                                    + 1))
+
+    def test_grain_round_trip(self):
+        '''
+        Are a matched grain's supercell, cuts, compositions, surface atoms,
+        and shared unitcell restored?
+        '''
+        cuts = [Cut('p', [0, 0, 0.5], plane=[0, 0, 1]),
+                Cut('s', [0, 0, 0], radius=1)]
+        grain = gc.Grain('test', self.unitcell, cuts, [1, 1, 1])
+        gc.build_grain(grain, 4)
+        grain = gc.get_surface_atoms(grain)
+        grain.best_composition = gc.get_composition(grain)
+        checkpoint.save_checkpoint(grain, self.path)
+        loaded = checkpoint.load_checkpoint(self.path)
+        self.assertEqual(repr(loaded), repr(grain))
+        self.assertTrue(loaded.supercell.unitcell is loaded.unitcell)
+        self.assertTrue(loaded.scale_factor == 4)
+        self.assertTrue(np.all(loaded.surface_atoms == grain.surface_atoms))
+        self.assertTrue(np.all(loaded.distance_symmetries
+                               == grain.distance_symmetries))
+        pd.testing.assert_frame_equal(loaded.best_composition,
+                                      grain.best_composition)
+        self.assertTrue(list(loaded.best_composition.columns) == ['Fe', 'Pt'])
+        self.assertTrue(loaded.cuts[1].radius == 1)
+        self.assertTrue(np.all(loaded.supercell.fractional
+                               == grain.supercell.fractional))
+        self.assertTrue(loaded.unitcell.atoms[2].element == 'Pt')
+        gc.build_grain(loaded, 3)
+        gc.build_grain(grain, 3)
+        self.assertTrue(np.all(loaded.supercell.fractional
+                               == grain.supercell.fractional))
+
+    def test_unsupported(self):
+        '''
+        Are objects that cannot be saved losslessly refused, leaving the
+        checkpoint already there whole, and are checkpoints of other versions
+        and directories that are not checkpoints?
+        '''
+        supercell = SuperCell(self.unitcell, 1, 1, 1)
+        checkpoint.save_checkpoint(supercell, self.path)
+        supercell.extra = {'notes': object()}
+        self.assertRaises(ValueError, checkpoint.save_checkpoint, supercell,
+                          self.path)
+        supercell.extra = np.array([object()])
+        self.assertRaises(ValueError, checkpoint.save_checkpoint, supercell,
+                          self.path)
+        self.assertTrue(os.listdir(self.directory.name) == ['checkpoint'])
+        loaded = checkpoint.load_checkpoint(self.path)
+        self.assertTrue(np.all(loaded.fractional == supercell.fractional))
+        del supercell.extra
+        checkpoint.save_checkpoint(supercell, self.path)
+        self.assertTrue(os.listdir(self.directory.name) == ['checkpoint'])
+        with open(os.path.join(self.path, 'header.json'), 'r') as file:
+            header = file.read().replace('"format": 2', '"format": 0')
+        with open(os.path.join(self.path, 'header.json'), 'w') as file:
+            file.write(header)
+        self.assertRaises(ValueError, checkpoint.load_checkpoint, self.path)
+        other = os.path.join(self.directory.name, 'other')
+        os.makedirs(other)
+        with open(os.path.join(other, 'notes.txt'), 'w') as file:
+            file.write('notes')
+        self.assertRaises(ValueError, checkpoint.save_checkpoint, supercell,
+                          other)
+        self.assertTrue(os.listdir(other) == ['notes.txt'])
+
+
+if __name__ == '__main__':
+    current_directory = os.getcwd()
+    package_directory_index = current_directory.index('grain_modeller')
+    package_directory = current_directory[:package_directory_index+14]
+    sys.path.append(package_directory+'/grain_modeller')
+    import checkpoint
+    import grain_creation as gc
+    from atom import Atom
+    from unitcell import UnitCell
+    from supercell import SuperCell
+    from edits import Cut
+    import testing_tools as test_tool
+    unittest.main()
@@ -173,10 +173,43 @@ class TestCrystallography(unittest.TestCase):
         expected_distances = np.array([[0, 1.414214], [0, 3], [0, 1.414214]])
         self.assertTrue(np.all(distances == expected_distances))
 
-
-
-
-
+    def test_surface_mask(self):
+        '''
+        Does surface mask find the outer layer of atoms of a cubic supercell,
+        and only the outer layer?
+        '''
+        unitcell = UnitCell([Atom('Fe', 0, 0, 0)], [1, 0, 0], [0, 1, 0],
+                            [0, 0, 1])
+        supercell = SuperCell(unitcell, 8, 8, 8)
+        surface = crystallography.surface_mask(supercell)
+        coordinates = supercell.fractional['coordinates']
+        expected_surface = np.any((coordinates == 0) | (coordinates == 7),
+                                  axis=1)
+        self.assertTrue(np.all(surface == expected_surface))
+
+    def test_surface_depth(self):
+        '''
+        Does surface depth give the distance to the nearest surface atom and
+        the right shell for every atom?
+        '''
+        unitcell = UnitCell([Atom('Fe', 0, 0, 0)], [2, 0, 0], [0, 2, 0],
+                            [0, 0, 2])
+        supercell = SuperCell(unitcell, 9, 9, 9)
+        depths, shells = crystallography.surface_depth(supercell)
+        coordinates = supercell.fractional['coordinates']
+        layers = np.min(np.minimum(coordinates, 8-coordinates), axis=1)
+        self.assertTrue(np.allclose(depths, 2*layers))
+        self.assertTrue(np.all(shells == layers))
+        self.assertTrue(np.max(shells) == 4)
+        # Explicit mask, shell width, and chunking for a coordinate array.
+        atoms = supercell.cartesian['coordinates']
+        surface = shells == 0
+        depths_2, shells_2 = crystallography.surface_depth(
+            atoms, surface, shell_width=4, chunk_size=50)
+        self.assertTrue(np.allclose(depths_2, depths))
+        self.assertTrue(np.all(shells_2 == np.ceil(layers/2)))
+        self.assertRaises(
+            ValueError, crystallography.surface_depth, atoms)
 
 
 if __name__ == '__main__':
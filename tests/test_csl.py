@@ -0,0 +1,146 @@
+import unittest
+import os
+import sys
+import numpy as np
+from scipy import spatial
+
+
+class TestCSL(unittest.TestCase):
+
+    def setUp(self):
+        test_basis = [Atom('Fe', 0, 0, 0), Atom('Fe', 0.5, 0.5, 0.5)]
+        self.unitcell = UnitCell(
+            test_basis, [2.87, 0, 0], [0, 2.87, 0], [0, 0, 2.87])
+        self.nearest = 2.87*np.sqrt(3)/2
+
+    def test_csl_table(self):
+        '''
+        Are the well known Sigma values and angles found for common axes?
+        '''
+        table = csl.csl_table([0, 0, 1], 30)
+        self.assertEqual(table['sigma'].tolist(), [5, 13, 17, 25, 29])
+        self.assertAlmostEqual(np.degrees(table['angle'][0]), 36.8699, 4)
+        table = csl.csl_table([1, 1, 0], 11)
+        self.assertEqual(table['sigma'].tolist(), [3, 9, 11])
+        self.assertAlmostEqual(np.degrees(table['angle'][0]), 70.5288, 4)
+        table = csl.csl_table([1, 1, 1], 7)
+        self.assertEqual(table['sigma'].tolist(), [3, 7])
+        self.assertAlmostEqual(np.degrees(table['angle'][0]), 60, 4)
+
+    def test_bicrystal(self):
+        '''
+        Is the bicrystal cell filled at the crystal's density, and is each
+        half a perfect, periodic crystal misoriented by the CSL angle?
+        '''
+        for axis, sigma, boundary in [([0, 0, 1], 5, 'tilt'),
+                                      ([1, 1, 0], 3, 'tilt'),
+                                      ([1, 1, 1], 7, 'twist')]:
+            cell = csl.bicrystal(self.unitcell, axis, sigma,
+                                 boundary=boundary, repeats=2)
+            lengths = np.diag(cell.vector_space)
+            self.assertAlmostEqual(len(cell.atoms),
+                                   2*np.prod(lengths)/2.87**3, 6)
+            coordinates = np.concatenate(
+                [atom.fractional['coordinates'] for atom in cell.atoms])
+            coordinates *= lengths
+            # Doubled along x and y, as centred lattices give cells as thin
+            # as one bond, which a periodic search would miss.
+            coordinates = np.concatenate([
+                coordinates + [x*lengths[0], y*lengths[1], 0]
+                for x in range(2) for y in range(2)])
+            lengths = lengths*[2, 2, 1]
+            upper = coordinates[:, 2] >= lengths[2]/2
+            for half in [upper, np.invert(upper)]:
+                tree = spatial.cKDTree(coordinates[half])
+                pairs = tree.query_pairs(self.nearest - 0.01)
+                self.assertEqual(len(pairs), 0)
+            # Periodic cell, no atoms closer than the nearest neighbours
+            # except across the two boundaries.
+            tree = spatial.cKDTree(coordinates, boxsize=lengths)
+            pairs = np.array(list(tree.query_pairs(self.nearest - 0.01)))
+            if pairs.size:
+                self.assertTrue(np.all(upper[pairs[:, 0]]
+                                       != upper[pairs[:, 1]]))
+            # Nearest neighbour bonds of each half, misoriented by the angle.
+            angle = csl.csl_table(axis)
+            angle = angle[angle['sigma'] == sigma]['angle'][0]
+            bonds = []
+            for half in [np.invert(upper), upper]:
+                tree = spatial.cKDTree(coordinates[half], boxsize=lengths)
+                pairs = np.array(list(tree.query_pairs(self.nearest + 0.01)))
+                bond = coordinates[half][pairs[:, 1]] - coordinates[half][
+                    pairs[:, 0]]
+                bond -= np.around(bond/lengths)*lengths
+                bonds.append(np.concatenate((bond, -bond)))
+            unit_axis = np.array(axis)/np.linalg.norm(axis)
+            rotation = linalg.vector_rotation_matrix(angle, unit_axis)
+            directions = linalg.normalise(
+                csl.boundary_cell(axis, rotation, sigma, boundary,
+                                  csl.lattice_centring(self.unitcell)))
+            rotation = directions @ rotation @ directions.T
+            tree = spatial.cKDTree(bonds[1])
+            distances = tree.query(bonds[0] @ rotation.T)[0]
+            self.assertTrue(np.all(distances < 1e-6))
+
+    def test_centred_cells(self):
+        '''
+        Are boundary cells found from the Bravais lattice of centred cubic
+        crystals, and are every CSL angle of a Sigma accepted?
+        '''
+        fcc = UnitCell([Atom('Cu', 0, 0, 0), Atom('Cu', 0.5, 0.5, 0.0),
+                        Atom('Cu', 0.5, 0, 0.5), Atom('Cu', 0, 0.5, 0.5)],
+                       [3.6, 0, 0], [0, 3.6, 0], [0, 0, 3.6])
+        self.assertEqual(csl.lattice_centring(fcc).shape[0], 4)
+        self.assertTrue(np.all(csl.lattice_centring(self.unitcell)
+                               == [[0, 0, 0], [0.5, 0.5, 0.5]]))
+        # Sigma 7 [111] twist: 7 in-plane primitive cells twice over, one
+        # FCC period along [111].
+        cell = csl.bicrystal(fcc, [1, 1, 1], 7, boundary='twist')
+        self.assertEqual(len(cell.atoms), 42)
+        self.assertTrue(np.allclose(np.diag(cell.vector_space),
+                                    [3.6*np.sqrt(3.5), 3.6*np.sqrt(10.5),
+                                     3.6*np.sqrt(3)]))
+        cell = csl.bicrystal(self.unitcell, [0, 0, 1], 5)
+        self.assertEqual(len(cell.atoms), 10)
+        other = csl.bicrystal(self.unitcell, [0, 0, 1],
+                              angle=2*np.arctan(1/2))
+        self.assertEqual(len(other.atoms), 10)
+        table = csl.csl_table([0, 0, 1], 5, unique=False)
+        self.assertEqual(table['sigma'].tolist(), [5, 5, 5, 5])
+        self.assertAlmostEqual(np.degrees(table['angle'][1]), 53.1301, 4)
+
+    def test_overlap(self):
+        '''
+        Are atoms of crystal 2 too close to crystal 1 deleted?
+        '''
+        cell = csl.bicrystal(self.unitcell, [0, 0, 1], 13)
+        removed = csl.bicrystal(self.unitcell, [0, 0, 1], 13,
+                                overlap=self.nearest*0.9)
+        lengths = np.diag(removed.vector_space)
+        coordinates = np.concatenate(
+            [atom.fractional['coordinates'] for atom in removed.atoms])
+        tree = spatial.cKDTree(coordinates*lengths, boxsize=lengths)
+        self.assertEqual(len(tree.query_pairs(self.nearest*0.9)), 0)
+        self.assertLess(len(removed.atoms), len(cell.atoms))
+
+    def test_errors(self):
+        hexagonal = UnitCell([Atom('Ti', 0, 0, 0)], [2.95, 0, 0],
+                             [-1.475, 2.555, 0], [0, 0, 4.68])
+        with self.assertRaises(ValueError):
+            csl.bicrystal(hexagonal, [0, 0, 1], 7)
+        with self.assertRaises(ValueError):
+            csl.bicrystal(self.unitcell, [0, 0, 1], 3)
+        with self.assertRaises(ValueError):
+            csl.bicrystal(self.unitcell, [0, 0, 1], 5, boundary='mixed')
+
+
+if __name__ == '__main__':
+    current_directory = os.getcwd()
+    package_directory_index = current_directory.index('grain_modeller')
+    package_directory = current_directory[:package_directory_index+14]
+    sys.path.append(package_directory+'/grain_modeller')
+    from atom import Atom
+    from unitcell import UnitCell
+    import csl
+    import linear_algebra as linalg
+    unittest.main()
@@ -2,6 +2,7 @@ import unittest
 import os
 import sys
 import numpy as np
+from scipy import spatial
 
 #from grain_modeller.linear_algebra import rotation_matrix
 
@@ -239,6 +240,111 @@ class TestEdits(unittest.TestCase):
         self.assertTrue(np.all(np.isclose(
             cartesian_coordinates, expected_coordinates, atol=1e-8)))
 
+    def test_reflect_merges_overlapping_atoms(self):
+        '''
+        Are atoms just off the reflection plane merged with their reflections
+        when an overlap distance is given?
+        '''
+        test_basis = [Atom('Fe', 0, 0, 0), Atom('Pt', 0.49, 0.5, 0.5)]
+        unitcell = UnitCell(test_basis, [1, 0, 0], [0, 1, 0], [0, 0, 1])
+        supercell = SuperCell(unitcell, 1, 1, 1)
+        reflection = edits.Reflection(
+            np.array([0.5, 0, 0]), np.array([1, 0, 0]), out=True)
+        edits.reflect(supercell, reflection, overlap=0.1)
+        coordinates = supercell.fractional['coordinates']
+        expected_coordinates = np.array(
+            [[0, 0, 0], [0.5, 0.5, 0.5], [1, 0, 0]])
+        self.assertTrue(np.allclose(coordinates, expected_coordinates))
+
+    def twin_cell(self):
+        # Pt a quarter along y marks which way up the crystal is.
+        return UnitCell([Atom('Fe', 0, 0, 0), Atom('Pt', 0, 0.25, 0)],
+                        [1, 0, 0], [0, 1, 0], [0, 0, 1])
+
+    def test_create_twin(self):
+        '''
+        Is the crystal beyond a twin plane replaced by the crystal before it
+        rotated about the twin axis, merging atoms on the plane and keeping
+        atoms within the supercell's extent, with fractional or cartesian
+        twin points?
+        '''
+        supercell = SuperCell(self.twin_cell(), 4, 4, 10)
+        twin = edits.Twin(np.array([0, 1.5, 4]), np.array([0, 0, 1]),
+                          np.array([1, 0, 0]), np.pi)
+        edits.create_twin(supercell, twin)
+        atoms = supercell.cartesian
+        coordinates = atoms['coordinates']
+        self.assertEqual(coordinates.shape[0], 5*32 + 4*28)
+        self.assertTrue(np.all((coordinates > -1e-8)
+                               & (coordinates < np.array([3, 3.25, 9]) + 1e-8)))
+        platinum = coordinates[atoms['element'] == 'Pt']
+        lower = platinum[platinum[:, 2] <= 4]
+        upper = platinum[platinum[:, 2] > 4]
+        self.assertTrue(np.allclose(lower[:, 1] % 1, 0.25))
+        self.assertTrue(np.allclose(upper[:, 1] % 1, 0.75))
+        self.assertTrue(np.allclose(np.unique(np.around(upper[:, 2], 6)),
+                                    [5, 6, 7, 8]))
+        scaled = UnitCell(self.twin_cell().atoms, [2, 0, 0], [0, 2, 0],
+                          [0, 0, 2])
+        cartesian = SuperCell(scaled, 4, 4, 10)
+        edits.create_twin(cartesian, edits.Twin(
+            np.array([0, 3, 8]), np.array([0, 0, 1]), np.array([1, 0, 0]),
+            np.pi), overlap=0.02, coordinates='cartesian')
+        self.assertTrue(np.allclose(
+            np.sort(cartesian.fractional['coordinates'], axis=0),
+            np.sort(supercell.fractional['coordinates'], axis=0)))
+        # Mirrored sideways out of the supercell, only the axis row stays.
+        sideways = SuperCell(self.twin_cell(), 4, 4, 10)
+        edits.create_twin(sideways, edits.Twin(
+            np.array([0, 0, 4]), np.array([0, 0, 1]), np.array([1, 0, 0]),
+            np.pi))
+        coordinates = sideways.cartesian['coordinates']
+        self.assertTrue(np.all(coordinates[:, 1] > -1e-8))
+        self.assertTrue(np.allclose(coordinates[coordinates[:, 2] > 4, 1], 0))
+
+    def test_create_polysynthetic_twin(self):
+        '''
+        Do parallel twin planes alternate the crystal between twin and
+        matrix orientations in a single pass?
+        '''
+        supercell = SuperCell(self.twin_cell(), 4, 4, 10)
+        twins = [edits.Twin(np.array([0, 1.5, point]), np.array([0, 0, 1]),
+                            np.array([1, 0, 0]), np.pi) for point in [6, 4]]
+        edits.create_twin(supercell, twins)
+        atoms = supercell.cartesian
+        self.assertEqual(atoms.shape[0], 5*32 + 2*28 + 3*32)
+        platinum = atoms['coordinates'][atoms['element'] == 'Pt']
+        heights = platinum[:, 2]
+        middle = platinum[(heights > 4.5) & (heights < 5.5)]
+        top = platinum[heights > 6.5]
+        self.assertTrue(np.allclose(middle[:, 1] % 1, 0.75))
+        self.assertTrue(np.allclose(top[:, 1] % 1, 0.25))
+        with self.assertRaises(ValueError):
+            edits.create_twin(supercell, [twins[0], edits.Twin(
+                np.array([0, 0, 2]), np.array([0, 1, 0]),
+                np.array([1, 0, 0]), np.pi)])
+
+    def test_merge_supercells(self):
+        '''
+        Does merging two supercells keep every atom of the first and only the
+        atoms of the second that do not overlap it?
+        '''
+        unitcell = UnitCell([Atom('Fe', 0, 0, 0)], [1, 0, 0], [0, 1, 0],
+                            [0, 0, 1])
+        supercell = SuperCell(unitcell, 2, 2, 2)
+        other = SuperCell(UnitCell([Atom('Pt', 0, 0, 0)], [1, 0, 0],
+                                   [0, 1, 0], [0, 0, 1]), 2, 2, 2)
+        transforms.translate(other, np.array([1.02, 0, 0]))
+        removed = edits.merge_supercells(supercell, other, 0.1)
+        self.assertEqual(removed, 4)
+        elements = supercell.fractional['element']
+        self.assertEqual(np.sum(elements == 'Fe'), 8)
+        self.assertEqual(np.sum(elements == 'Pt'), 4)
+        self.assertTrue(np.all(
+            supercell.fractional['coordinates'][elements == 'Pt'][:, 0] > 2))
+        removed = edits.remove_overlaps(supercell, 0.1)
+        self.assertEqual(removed, 0)
+
     def OFF_test_reflect_very_complicated_rt12_supercell(self):
         '''
         Tests that the complicated ndfe12 unitcell with a complicated (011)
@@ -303,6 +409,272 @@ class TestEdits(unittest.TestCase):
 
 
 
+    def simple_cubic(self, x, y, z):
+        unitcell = UnitCell([Atom('Fe', 0, 0, 0)], [1, 0, 0], [0, 1, 0],
+                            [0, 0, 1])
+        supercell = SuperCell(unitcell, x, y, z)
+        supercell.set_cartesian()
+        return supercell
+
+    def nearest_distances(self, coordinates, mask):
+        tree = spatial.cKDTree(coordinates[mask])
+        return tree.query(coordinates[mask], 2)[0][:, 1]
+
+    def test_insert_edge_dislocation(self):
+        '''
+        Does an edge dislocation add or remove a half-plane of atoms, leaving
+        a perfect crystal away from its core?
+        '''
+        point = np.array([15.25, 15.25, 0])
+        for half_plane, change in [(None, 0), ('insert', 28),
+                                   ('remove', -32)]:
+            supercell = self.simple_cubic(30, 30, 2)
+            dislocation = edits.Dislocation(point, [0, 0, 1], [1, 0, 0],
+                                            half_plane=half_plane)
+            self.assertEqual(
+                edits.insert_dislocations(supercell, dislocation), change)
+            coordinates = supercell.cartesian['coordinates']
+            radii = np.linalg.norm((coordinates - point)[:, :2], axis=1)
+            distances = self.nearest_distances(coordinates, radii > 2.5)
+            self.assertGreater(np.min(distances), 0.95)
+            inner = np.all(np.abs(coordinates[radii > 2.5][:, :2] - 15) < 10,
+                           axis=1)
+            self.assertTrue(np.allclose(distances[inner], 1, atol=0.05))
+
+    def test_insert_screw_dislocation(self):
+        '''
+        Are atoms around a screw dislocation displaced along the line by the
+        Burgers vector times the fraction of a turn around it?
+        '''
+        supercell = self.simple_cubic(20, 20, 4)
+        before = supercell.cartesian['coordinates'].copy()
+        point = np.array([10.25, 10.25, 0])
+        edits.insert_dislocations(
+            supercell, edits.Dislocation(point, [0, 0, 1], [0, 0, 1]))
+        after = supercell.cartesian['coordinates']
+        angles = np.arctan2(before[:, 1] - point[1], before[:, 0] - point[0])
+        self.assertTrue(np.allclose(after[:, :2], before[:, :2]))
+        self.assertTrue(np.allclose(after[:, 2] - before[:, 2],
+                                    angles/(2*np.pi), atol=1e-6))
+
+    def test_insert_dislocation_loops(self):
+        '''
+        Do prismatic loops remove or insert the disc of atoms their sense
+        requires, and do shear loops only move atoms?
+        '''
+        centre = np.array([12.25, 12.25, 12.25])
+        for burgers, change in [([0, 0, 1], -79), ([0, 0, -1], 79),
+                                ([1, 0, 0], 0)]:
+            supercell = self.simple_cubic(24, 24, 24)
+            loop = edits.Dislocation(centre, [0, 0, 1], burgers, radius=5)
+            self.assertEqual(edits.insert_dislocations(supercell, loop),
+                             change)
+            coordinates = supercell.cartesian['coordinates']
+            radii = np.linalg.norm((coordinates - centre)[:, :2], axis=1)
+            far = ((np.abs(radii - 5) > 2)
+                   | (np.abs(coordinates[:, 2] - centre[2]) > 2))
+            distances = self.nearest_distances(coordinates, far)
+            self.assertGreater(np.min(distances), 0.9)
+        with self.assertRaises(ValueError):
+            loop = edits.Dislocation(centre, [0, 0, 1], [0, 0, 1], radius=5,
+                                     half_plane='insert')
+            edits.insert_dislocations(self.simple_cubic(24, 24, 24), loop)
+
+    def test_insert_dislocations_superposes(self):
+        '''
+        Are several dislocations in one call the sum of their fields, and
+        does chunking change nothing?
+        '''
+        dislocations = [
+            edits.Dislocation([5.25, 10.25, 0], [0, 0, 1], [1, 0, 1]),
+            edits.Dislocation([15.25, 10.25, 0], [0, 0, 1], [0, 0, -1]),
+            edits.Dislocation([10.1, 10.2, 2.3], [1, 1, 1], [1, -1, 0],
+                              radius=3)]
+        together = self.simple_cubic(20, 20, 4)
+        edits.insert_dislocations(together, dislocations, chunk_size=777)
+        apart = self.simple_cubic(20, 20, 4)
+        before = apart.cartesian['coordinates'].copy()
+        displacements = np.zeros(before.shape)
+        for dislocation in dislocations:
+            single = self.simple_cubic(20, 20, 4)
+            edits.insert_dislocations(single, dislocation)
+            displacements += single.cartesian['coordinates'] - before
+        self.assertTrue(np.allclose(together.cartesian['coordinates'],
+                                    before + displacements, atol=1e-6))
+
+    def test_loop_displacement_matches_straight_line(self):
+        '''
+        Close to a large loop, is its field that of a straight dislocation
+        along the line's tangent?
+        '''
+        rng = np.random.default_rng(0)
+        burgers = np.array([0.3, 0.5, 0.8])
+        loop = edits.Dislocation([0, 0, 0], [0, 0, 1], burgers, radius=2000)
+        straight = edits.Dislocation([2000, 0, 0], [0, 1, 0], burgers)
+        points = np.array([2000, 0, 0]) + rng.uniform(-5, 5, (50, 3))
+        from_loop = edits.loop_displacement(points, loop, 0.3, 2000)
+        # The loop's cut is the disc, towards its centre.
+        frame = edits.dislocation_frame(straight)
+        cut = frame[:2] @ np.array([-1, 0, 0])
+        from_line = edits.straight_displacement(points, straight, 0.3, cut)
+        difference = from_loop - from_line
+        self.assertTrue(np.allclose(difference, difference[0], atol=5e-3))
+
+    def fcc(self, x, y, z, elements=('Fe', 'Fe', 'Fe', 'Fe')):
+        positions = [[0, 0, 0], [0.5, 0.5, 0], [0.5, 0, 0.5], [0, 0.5, 0.5]]
+        atoms = [Atom(element, *position)
+                 for element, position in zip(elements, positions)]
+        unitcell = UnitCell(atoms, [4, 0, 0], [0, 4, 0], [0, 0, 4])
+        supercell = SuperCell(unitcell, x, y, z)
+        supercell.set_cartesian()
+        return supercell
+
+    def test_interstitial_sites(self):
+        '''
+        Are the largest holes of FCC its octahedral sites, and of BCC its
+        tetrahedral sites?
+        '''
+        sites, radius = edits.interstitial_sites(self.fcc(1, 1, 1).unitcell)
+        expected = np.array([[0, 0, 0.5], [0, 0.5, 0], [0.5, 0, 0],
+                             [0.5, 0.5, 0.5]])
+        self.assertTrue(np.allclose(sites, expected))
+        self.assertAlmostEqual(radius, 2)
+        bcc = UnitCell([Atom('Fe', 0, 0, 0), Atom('Fe', 0.5, 0.5, 0.5)],
+                       [2, 0, 0], [0, 2, 0], [0, 0, 2])
+        sites, radius = edits.interstitial_sites(bcc)
+        self.assertEqual(sites.shape[0], 12)
+        self.assertAlmostEqual(radius, np.sqrt(5)/2)
+
+    def test_insert_point_defects(self):
+        '''
+        Are vacancies, antisites, and interstitials placed at their
+        concentrations, no closer than the separation, keeping the
+        composition for antisites and reproducibly from the seed?
+        '''
+        elements = ('Fe', 'Fe', 'Pt', 'Pt')
+        supercell = self.fcc(10, 10, 10, elements)
+        before = supercell.cartesian.copy()
+        defects = edits.insert_point_defects(
+            supercell, vacancies=0.01, antisites=0.01, interstitials=0.005,
+            interstitial_element='C', separation=6, seed=3)
+        self.assertEqual(defects['vacancies'].shape[0], 40)
+        self.assertEqual(defects['antisites'].shape[0], 40)
+        self.assertEqual(defects['interstitials'].shape[0], 20)
+        self.assertEqual(supercell.fractional.shape[0], 4000 - 40 + 20)
+        positions = np.concatenate(list(defects.values()))
+        self.assertTrue(np.all(spatial.distance.pdist(positions) >= 6))
+        species, counts = np.unique(supercell.fractional['element'],
+                                    return_counts=True)
+        self.assertTrue(np.array_equal(species, ['C', 'Fe', 'Pt']))
+        self.assertEqual(np.sum(counts[1:]), 3960)
+        # Antisites swap elements, so every one has changed.
+        supercell.set_cartesian()
+        tree = spatial.cKDTree(before['coordinates'])
+        indexes = tree.query(defects['antisites'])[1]
+        after = spatial.cKDTree(supercell.cartesian['coordinates']).query(
+            defects['antisites'])[1]
+        self.assertTrue(np.all(before['element'][indexes]
+                               != supercell.cartesian['element'][after]))
+        self.assertEqual(np.sum(before['element'][indexes] == 'Fe'), 20)
+        # Interstitials sit in octahedral holes, 2 from their neighbours.
+        distances = tree.query(defects['interstitials'], 7)[0]
+        self.assertTrue(np.allclose(distances[:, :6], 2))
+        self.assertTrue(np.all(distances[:, 6] > 2.5))
+        again = edits.insert_point_defects(
+            self.fcc(10, 10, 10, elements), vacancies=0.01, antisites=0.01,
+            interstitials=0.005, interstitial_element='C', separation=6,
+            seed=3)
+        for kind in defects:
+            self.assertTrue(np.array_equal(defects[kind], again[kind]))
+        self.assertRaisesRegex(
+            ValueError, "Give the element of the interstitials.",
+            edits.insert_point_defects, supercell, interstitials=0.01)
+
+    def test_insert_planar_faults(self):
+        '''
+        Is an antiphase boundary in L1_0 FePt the same made by a fault
+        vector, wrapped back into a periodic supercell, or by swapping the
+        elements, and are atoms clashing across a fault or the supercell's
+        edge removed, keeping the unmoved ones?
+        '''
+        elements = ('Fe', 'Fe', 'Pt', 'Pt')
+        displaced = self.fcc(6, 6, 6, elements)
+        swapped = self.fcc(6, 6, 6, elements)
+        removed = edits.insert_planar_faults(
+            displaced, edits.PlanarFault([3, 0, 0], [1, 0, 0],
+                                         vector=[0, 0.5, 0.5]), periodic=True)
+        self.assertEqual(removed, 0)
+        edits.insert_planar_faults(
+            swapped, [edits.PlanarFault([3, 0, 0], [1, 0, 0],
+                                        swap={'Fe': 'Pt', 'Pt': 'Fe'})])
+        displaced.set_cartesian()
+        swapped.set_cartesian()
+
+        def ordered(atoms):
+            return atoms[np.lexsort(np.round(atoms['coordinates'], 8).T)]
+        first, second = ordered(displaced.cartesian), ordered(
+            swapped.cartesian)
+        self.assertTrue(np.all((first['coordinates'] >= 0)
+                               & (first['coordinates'] < 24)))
+        self.assertTrue(np.array_equal(first['element'], second['element']))
+        self.assertTrue(np.allclose(first['coordinates'],
+                                    second['coordinates']))
+        above = second['coordinates'][:, 0] > 12
+        self.assertTrue(np.all(second['element'][above & np.isclose(
+            second['coordinates'][:, 2] % 4, 0)] == 'Pt'))
+        self.assertRaisesRegex(ValueError,
+                               "A planar fault needs a vector or a swap.",
+                               edits.PlanarFault, [0, 0, 0], [1, 1, 1])
+        clashing = self.fcc(6, 6, 6)
+        before = clashing.cartesian.copy()
+        fault = edits.PlanarFault([0, 0, 3], [0, 0, 1],
+                                  vector=[0.5, 0, -0.5])
+        # The moved layer lands on the one below, its edge row wrapping.
+        self.assertEqual(edits.insert_planar_faults(clashing, fault, 0.5,
+                                                    periodic=True), 72)
+        clashing.set_cartesian()
+        distances = spatial.cKDTree(clashing.cartesian['coordinates']).query(
+            before['coordinates'][before['coordinates'][:, 2] <= 12])[0]
+        self.assertTrue(np.allclose(distances, 0))
+        sheared = SuperCell(UnitCell([Atom('Fe', 0, 0, 0)], [4, 0, 0],
+                                     [2, 4, 0], [0, 0, 4]), 4, 4, 4)
+        self.assertRaises(ValueError, edits.insert_planar_faults, sheared,
+                          fault, 0.5, True)
+
+    def test_insert_planar_faults_open(self):
+        '''
+        Are the atoms of an open structure left in place, only the moved ones
+        wrapped in a translated periodic supercell, and clashes found only
+        across the fault when open?
+        '''
+        fault = edits.PlanarFault([0, 0, 3], [0, 0, 1], vector=[0.5, 0, -0.5])
+        open_cell = self.fcc(6, 6, 6)
+        before = open_cell.cartesian.copy()
+        # The moved layer still lands on the one below, but not across the
+        # edges, where the atoms leave the supercell instead.
+        removed = edits.insert_planar_faults(open_cell, fault, 0.5)
+        self.assertEqual(removed, 72 - 6)
+        open_cell.set_cartesian()
+        coordinates = open_cell.cartesian['coordinates']
+        self.assertTrue(np.any(coordinates[:, 0] >= 24))
+        unmoved = before['coordinates'][before['coordinates'][:, 2] <= 12]
+        self.assertTrue(np.allclose(spatial.cKDTree(coordinates).query(
+            unmoved)[0], 0))
+        shifted = self.fcc(6, 6, 6)
+        shifted.transform(vector=[10, 10, 10])
+        shifted.apply_transform()
+        shifted.set_cartesian()
+        before = shifted.cartesian.copy()
+        fault = edits.PlanarFault([0, 0, 5.5], [0, 0, 1],
+                                  vector=[0.5, 0.5, 0])
+        edits.insert_planar_faults(shifted, fault, periodic=True)
+        shifted.set_cartesian()
+        coordinates = shifted.cartesian['coordinates']
+        self.assertTrue(np.all((coordinates >= 10) & (coordinates < 34)))
+        below = before['coordinates'][:, 2] <= 22
+        self.assertTrue(np.array_equal(coordinates[below],
+                                       before['coordinates'][below]))
+
 if __name__ == '__main__':
     current_directory = os.getcwd()
     package_directory_index = current_directory.index('grain_modeller')
@@ -0,0 +1,109 @@
+import unittest
+import os
+import sys
+import numpy as np
+
+
+class TestEnergy(unittest.TestCase):
+
+    def test_read_morse(self):
+        '''
+        Are the Morse parameters of the Potentials file read for both orders
+        of every pair?
+        '''
+        parameters = energy.read_morse()
+        self.assertTrue(parameters[('Fe', 'Fe')] == [0.764, 1.5995, 2.7361, 12])
+        self.assertTrue(parameters[('Ti', 'Fe')] == parameters[('Fe', 'Ti')])
+        self.assertRaisesRegex(ValueError,
+                               "There is no Morse potential for Nd Ti.",
+                               energy.Morse, ['Nd', 'Ti'])
+
+    def test_dimer_energy_and_forces(self):
+        '''
+        Is a dimer at the equilibrium distance bound by the well depth with no
+        force, and do forces match the numerical gradient elsewhere?
+        '''
+        potential = energy.Morse(['Fe', 'Ti'])
+        coordinates = np.array([[0, 0, 0], [2.914, 0, 0]])
+        atom_energies, total, forces = energy.morse_energy(
+            coordinates, ['Fe', 'Ti'], potential, forces=True)
+        self.assertTrue(np.allclose(atom_energies, -0.8162/2))
+        self.assertAlmostEqual(total, -0.8162)
+        self.assertTrue(np.allclose(forces, 0))
+        rng = np.random.default_rng(0)
+        coordinates = rng.uniform(0, 8, (40, 3))
+        elements = np.where(np.arange(40) % 3, 'Fe', 'Ti')
+        forces = energy.morse_energy(coordinates, elements, potential,
+                                     forces=True, chunk_size=7)[2]
+        step = 1e-6
+        for atom, axis in [(3, 0), (10, 2), (31, 1)]:
+            shifted = coordinates.copy()
+            shifted[atom, axis] += step
+            higher = energy.morse_energy(shifted, elements, potential)[1]
+            shifted[atom, axis] -= 2*step
+            lower = energy.morse_energy(shifted, elements, potential)[1]
+            self.assertAlmostEqual(forces[atom, axis],
+                                   -(higher - lower)/(2*step), places=5)
+
+    def test_coincident_atoms(self):
+        '''
+        Are coincident atoms given a finite energy and no force between them?
+        '''
+        potential = energy.Morse(['Fe'])
+        coordinates = np.array([[0, 0, 0], [0, 0, 0], [3, 0, 0]])
+        atom_energies, total, forces = energy.morse_energy(
+            coordinates, ['Fe']*3, potential, forces=True)
+        self.assertTrue(np.all(np.isfinite(atom_energies)))
+        self.assertTrue(np.all(np.isfinite(forces)))
+        self.assertAlmostEqual(forces[0, 0], forces[1, 0])
+        self.assertTrue(np.allclose(forces[:, 1:], 0))
+
+    def test_periodic_crystal(self):
+        '''
+        Does every atom of a periodic crystal have the same energy, which
+        matches an open cluster's central atom, with no net forces?
+        '''
+        side = 2.8665
+        unitcell = UnitCell([Atom('Fe', 0, 0, 0), Atom('Fe', 0.5, 0.5, 0.5)],
+                            [side, 0, 0], [0, side, 0], [0, 0, side])
+        supercell = SuperCell(unitcell, 10, 10, 10)
+        atom_energies, total, forces = energy.supercell_energy(
+            supercell, box=[10*side]*3, forces=True)
+        self.assertTrue(np.allclose(atom_energies, atom_energies[0]))
+        self.assertTrue(np.allclose(forces, 0))
+        coordinates = supercell.cartesian['coordinates']
+        centre = np.argmin(np.linalg.norm(coordinates - 5*side, axis=1))
+        cluster = energy.morse_energy(coordinates, supercell.cartesian[
+            'element'])[0]
+        self.assertAlmostEqual(cluster[centre], atom_energies[0])
+
+    def test_interaction_energies(self):
+        '''
+        Is the interaction of two blocks the total energy less the energy of
+        each block, for every shift?
+        '''
+        rng = np.random.default_rng(1)
+        fixed = (rng.uniform(0, 10, (30, 3)), np.array(['Fe']*30))
+        moving = (rng.uniform(0, 10, (20, 3)) + [0, 0, 10],
+                  np.array(['Ti']*20))
+        shifts = np.array([[0, 0, 0], [1, 0, -2]])
+        interactions = energy.interaction_energies(fixed, moving, shifts)
+        for shift, interaction in zip(shifts, interactions):
+            coordinates = np.concatenate((fixed[0], moving[0] + shift))
+            elements = np.concatenate((fixed[1], moving[1]))
+            total = energy.morse_energy(coordinates, elements)[1]
+            total -= energy.morse_energy(*fixed)[1]
+            total -= energy.morse_energy(moving[0] + shift, moving[1])[1]
+            self.assertAlmostEqual(interaction, total)
+
+
+if __name__ == '__main__':
+    current_directory = os.getcwd()
+    package_directory_index = current_directory.index('grain_modeller')
+    package_directory = current_directory[:package_directory_index+14]
+    sys.path.append(package_directory+'/grain_modeller')
+    from atom import Atom
+    from unitcell import UnitCell
+    from supercell import SuperCell
+    import energy
+    unittest.main()
@@ -0,0 +1,69 @@
+import unittest
+import os
+import sys
+import tempfile
+import numpy as np
+
+
+class TestEnsemble(unittest.TestCase):
+
+    def setUp(self):
+        test_basis = [Atom('Fe', 0, 0, 0), Atom('Pt', 0.5, 0.5, 0.5)]
+        unitcell = UnitCell(test_basis, [2, 0, 0], [0, 2, 0], [0, 0, 2])
+        self.supercell = SuperCell(unitcell, 3, 2, 2)
+
+    def test_members_match_rotated_supercells(self):
+        '''
+        Do lazy members, batches, and member supercells all give the same
+        coordinates as rotating a copy of the supercell?
+        '''
+        ensemble = OrientationEnsemble.random(self.supercell, 5, seed=1)
+        self.assertEqual(len(ensemble), 5)
+        batched = np.concatenate(
+            [batch for start, batch in ensemble.batches(batch_size=2)])
+        self.assertEqual(batched.shape, (5, 24, 3))
+        for index in range(len(ensemble)):
+            rotated = SuperCell(self.supercell.unitcell, 3, 2, 2)
+            transforms.rotate(rotated, ensemble.rotations[index])
+            rotated.set_cartesian()
+            expected = rotated.cartesian['coordinates']
+            self.assertTrue(np.allclose(ensemble.member(index), expected))
+            self.assertTrue(np.allclose(batched[index], expected))
+            member = ensemble.member_supercell(index)
+            member.set_cartesian()
+            self.assertTrue(np.allclose(
+                member.cartesian['coordinates'], expected))
+        # Members must not share atoms with the base supercell.
+        transforms.translate(member, [1, 0, 0])
+        member.apply_transform()
+        self.assertTrue(np.all(
+            self.supercell.fractional['coordinates'][0] == [0, 0, 0]))
+        with self.assertRaises(ValueError):
+            OrientationEnsemble(self.supercell, np.identity(4))
+
+    def test_write(self):
+        '''
+        Does write produce one data file per member?
+        '''
+        ensemble = OrientationEnsemble.random(self.supercell, 3, seed=2)
+        with tempfile.TemporaryDirectory() as folder:
+            names = ensemble.write(
+                folder+'/member_{}.lmp',
+                directory='../grain_modeller/file_templates')
+            self.assertEqual(len(names), 3)
+            for name in names:
+                with open(name) as file:
+                    self.assertIn('24 atoms', file.read())
+
+
+if __name__ == '__main__':
+    current_directory = os.getcwd()
+    package_directory_index = current_directory.index('grain_modeller')
+    package_directory = current_directory[:package_directory_index+14]
+    sys.path.append(package_directory+'/grain_modeller')
+    from atom import Atom
+    from unitcell import UnitCell
+    from supercell import SuperCell
+    from ensemble import OrientationEnsemble
+    import transforms
+    unittest.main()
@@ -5,10 +5,14 @@ import sys
 from itertools import combinations
 import numpy as np
 import re
+import tempfile
 
 
 class TestFileFormatter(unittest.TestCase):
 
+    def setUp(self):
+        self.addCleanup(test_tool.isolate_cache())
+
     def test_format_file(self):
         '''
         Does format_file correctly format and produce files for the LAMMPS
@@ -178,6 +182,24 @@ class TestFileFormatter(unittest.TestCase):
         self.assertTrue(formatting_object['Number_of_Atoms'] == 2000)
         self.assertTrue(formatting_object['Y_Box_Maximum'] == 28.5)
 
+    def test_stream_supercell(self):
+        '''
+        Does streaming a supercell to a file in chunks write what format_file
+        returns?
+        '''
+        test_basis = [Atom('Fe', 0, 0, 0), Atom('Pt', 0.5, 0.5, 0.5)]
+        unitcell = UnitCell(test_basis, [3, 0, 0], [0, 3, 0], [0, 0, 3])
+        supercell = SuperCell(unitcell, 4, 3, 2)
+        directory = '../grain_modeller/file_templates'
+        with tempfile.TemporaryDirectory() as temporary:
+            file_name = os.path.join(temporary, 'supercell.data')
+            ff.stream_supercell(supercell, 'LAMMPS_data_file', file_name,
+                                directory, chunk_size=5)
+            with open(file_name, 'r') as file:
+                written = file.read()
+        expected = ff.format_file(supercell, 'LAMMPS_data_file', directory)
+        self.assertTrue(written == expected)
+
 
 
 
@@ -201,4 +223,5 @@ if __name__ == '__main__':
     from unitcell import UnitCell
     from supercell import SuperCell
     from edits import Cut
+    import testing_tools as test_tool
     unittest.main()
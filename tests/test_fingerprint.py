@@ -0,0 +1,105 @@
+import unittest
+import os
+import sys
+import copy
+import numpy as np
+from scipy.spatial.transform import Rotation as R
+
+
+class TestFingerprint(unittest.TestCase):
+
+    def setUp(self):
+        basis = [Atom('Fe', 0.0, 0.0, 0.0), Atom('Fe', 0.5, 0.5, 0.0),
+                 Atom('Pt', 0.5, 0.0, 0.5), Atom('Pt', 0.0, 0.5, 0.5)]
+        self.unitcell = UnitCell(basis, [3.83, 0, 0], [0, 3.83, 0],
+                                 [0, 0, 3.711])
+
+    def test_fingerprint_ignores_order_and_translation(self):
+        '''
+        Do shuffled, translated, and slightly perturbed copies share the
+        fingerprint, while a changed element or removed atom does not?
+        '''
+        supercell = SuperCell(self.unitcell, 4, 4, 4)
+        supercell.set_cartesian()
+        atoms = supercell.cartesian
+        rng = np.random.default_rng(0)
+        order = rng.permutation(atoms.shape[0])
+        elements = atoms['element'][order]
+        coordinates = atoms['coordinates'][order] + [10.5, -3, 2]
+        coordinates += rng.uniform(-1e-6, 1e-6, coordinates.shape)
+        original = fingerprint.fingerprint((atoms['element'],
+                                            atoms['coordinates']))
+        self.assertEqual(original,
+                         fingerprint.fingerprint((elements, coordinates)))
+        changed = elements.copy()
+        changed[5] = 'Pt' if changed[5] == 'Fe' else 'Fe'
+        self.assertNotEqual(original,
+                            fingerprint.fingerprint((changed, coordinates)))
+        self.assertNotEqual(original, fingerprint.fingerprint(
+            (elements[1:], coordinates[1:])))
+
+    def test_fingerprint_includes_vector_space(self):
+        '''
+        Do supercells with the same atoms in different vector spaces have
+        different fingerprints?
+        '''
+        primitive = SuperCell(UnitCell([Atom('Fe', 0, 0, 0)], [2, 0, 0],
+                                       [0, 2, 0], [0, 0, 2]), 2, 2, 2)
+        doubled = SuperCell(UnitCell([Atom('Fe', 0, 0, 0),
+                                      Atom('Fe', 0.5, 0, 0)], [4, 0, 0],
+                                     [0, 2, 0], [0, 0, 2]), 1, 2, 2)
+        primitive.set_cartesian()
+        doubled.set_cartesian()
+        self.assertEqual(
+            fingerprint.fingerprint((primitive.cartesian['element'],
+                                     primitive.cartesian['coordinates'])),
+            fingerprint.fingerprint((doubled.cartesian['element'],
+                                     doubled.cartesian['coordinates'])))
+        self.assertNotEqual(fingerprint.fingerprint(primitive),
+                            fingerprint.fingerprint(doubled))
+
+    def test_descriptor_is_rotation_invariant(self):
+        '''
+        Does a rotated copy share the descriptor fingerprint but not the
+        canonical fingerprint?
+        '''
+        supercell = SuperCell(self.unitcell, 3, 3, 3)
+        rotated = copy.deepcopy(supercell)
+        transforms.rotate(rotated, R.random(random_state=1).as_matrix())
+        self.assertNotEqual(fingerprint.fingerprint(supercell),
+                            fingerprint.fingerprint(rotated))
+        self.assertEqual(fingerprint.descriptor_fingerprint(supercell),
+                         fingerprint.descriptor_fingerprint(rotated))
+        species, histogram = fingerprint.distance_descriptor(supercell, 4)
+        self.assertTrue(species.tolist() == ['Fe', 'Pt'])
+        self.assertEqual(histogram.shape[0], 3)
+
+    def test_find_duplicates(self):
+        '''
+        Are duplicates pointed to the first identical structure?
+        '''
+        first = SuperCell(self.unitcell, 2, 2, 2)
+        second = SuperCell(self.unitcell, 2, 2, 3)
+        moved = copy.deepcopy(first)
+        transforms.translate(moved, [1, 0, 0])
+        rotated = copy.deepcopy(second)
+        transforms.rotate(rotated, R.random(random_state=2).as_matrix())
+        structures = [first, second, moved, rotated]
+        duplicates = fingerprint.find_duplicates(structures)
+        self.assertTrue(duplicates.tolist() == [0, 1, 0, 3])
+        duplicates = fingerprint.find_duplicates(structures,
+                                                 rotation_invariant=True)
+        self.assertTrue(duplicates.tolist() == [0, 1, 0, 1])
+
+
+if __name__ == '__main__':
+    current_directory = os.getcwd()
+    package_directory_index = current_directory.index('grain_modeller')
+    package_directory = current_directory[:package_directory_index+14]
+    sys.path.append(package_directory+'/grain_modeller')
+    from atom import Atom
+    from unitcell import UnitCell
+    from supercell import SuperCell
+    import transforms
+    import fingerprint
+    unittest.main()
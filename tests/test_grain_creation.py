@@ -11,6 +11,9 @@ import copy
 
 class TestGrainCreation(unittest.TestCase):
 
+    def setUp(self):
+        self.addCleanup(test_tool.isolate_cache())
+
     def test_Grain_class_instantiation(self):
         cut_list = [[[1, 1, 1], [0, 0, 1]], [[1, 0, 1], [1, 0, 0]]]
         name = 'test'
@@ -288,6 +291,23 @@ class TestGrainCreation(unittest.TestCase):
                            grain.supercell.fractional.shape[0])
         self.assertTrue(np.isclose(percent_surface, 0.3, atol=0.05))
 
+    def test_get_surface_atoms_cube(self):
+        '''
+        Is the bulk pattern taken only from atoms with every neighbour
+        present, so that the edge and face atoms of a cube are surface atoms
+        along with its corners?
+        '''
+        unitcell = UnitCell([Atom('Fe', 0, 0, 0)], [2, 0, 0], [0, 2, 0],
+                            [0, 0, 2])
+        grain = gc.Grain('cube', unitcell, [], [1, 1, 1])
+        grain.supercell = SuperCell(unitcell, 4, 4, 4)
+        fractional = grain.supercell.fractional['coordinates']
+        outside = np.sum((fractional == 0) | (fractional == 3), axis=1)
+        gc.get_surface_atoms(grain)
+        self.assertEqual(grain.distance_symmetries.shape[0], 1)
+        self.assertTrue(np.all(np.sort(grain.surface_atoms['index'])
+                               == np.flatnonzero(outside > 0)))
+
     def test_get_composition(self):
         '''
         Is the correct composition of a given grain returned?
@@ -302,90 +322,64 @@ class TestGrainCreation(unittest.TestCase):
         composition = gc.get_composition(grain)
         self.assertTrue(composition.values.tolist() == [[600, 500, 500]])
 
-    def test_remove_atoms(self):
+    def test_bond_scores(self):
         '''
-        Are the correct atoms recorded for removal in the grain when various
-        vertices are provided?
+        Do bond scores count the neighbours of corner, edge, face, and bulk
+        atoms of a cube, and fall as neighbours are deleted?
         '''
-        test_basis = [Atom('Fe', 0, 0, 0), Atom('Pt', 0.5, 0.5, 0.5),
-                      Atom('Zn', 0.1, 0.4, 0.5)]
-        unitcell = UnitCell(test_basis, [3, 0, 0], [0, 3, 0], [0, 0, 3])
-        cuts = [Cut('p', [0, 0, 0.5], plane=[0, 0, 1])]
-        repeat_ratio = [1, 1, 1]
-        grain = gc.Grain('test', unitcell, cuts, repeat_ratio)
-        grain.supercell = gc.build_grain(grain, 10)
-        surface_atoms = gc.get_surface_atoms(grain).surface_atoms
-        vertices = np.array([400, 413])
-        composition = np.array([(550, 450, 450)],
-                               dtype=[('Fe', 'i8'), ('Pt', 'i8'),
-                                      ('Zn', 'i8')])
-        composition = pd.DataFrame(composition, index=[0])
-        grain.composition_deltas = composition
-        breaking = gc.remove_atoms(grain, surface_atoms, vertices)
-        composition = grain.composition_deltas.values.tolist()[0]
-        # Test few vertices many deletions.
-        self.assertTrue(composition == [550, 450, 448])
-        self.assertFalse(breaking)
-        self.assertTrue(grain.surface_atoms[400]['removed'])
-        self.assertTrue(grain.surface_atoms[413]['removed'])
-        self.assertTrue(np.sum(grain.surface_atoms['removed']) == 2)
-        # Test vertices of all types with many deletions
-        vertices = np.array([33, 35, 320, 321, 405])
-        breaking = gc.remove_atoms(grain, surface_atoms, vertices)
-        composition = grain.composition_deltas.values.tolist()[0]
-
-        self.assertTrue(composition == [548, 448, 447])
-        self.assertFalse(breaking)
-        self.assertTrue(grain.surface_atoms[33]['removed'])
-        self.assertTrue(grain.surface_atoms[35]['removed'])
-        self.assertTrue(grain.surface_atoms[320]['removed'])
-        self.assertTrue(grain.surface_atoms[321]['removed'])
-        self.assertTrue(grain.surface_atoms[405]['removed'])
-        self.assertTrue(np.sum(grain.surface_atoms['removed']) == 7)
-        # Test removal of vertices leading to correct composition
-        vertices = np.array([401])
-        composition = np.array([(0, 0, 1)],
-                               dtype=[('Fe', 'i8'), ('Pt', 'i8'),
-                                      ('Zn', 'i8')])
-        composition = pd.DataFrame(composition, index=[0])
-        grain.composition_deltas = composition
-        breaking = gc.remove_atoms(grain, surface_atoms, vertices)
-        composition = grain.composition_deltas.values.tolist()[0]
-        self.assertTrue(composition == [0, 0, 0])
-        self.assertTrue(breaking)
-        self.assertTrue(grain.surface_atoms[401]['removed'])
-        self.assertTrue(np.sum(grain.surface_atoms['removed']) == 8)
-        # Test inability to remove any vertices leading to new surface
-        vertices = np.array([403])
-        composition = np.array([(1, 0, 0)],
-                               dtype=[('Fe', 'i8'), ('Pt', 'i8'),
-                                      ('Zn', 'i8')])
-        composition = pd.DataFrame(composition, index=[0])
-        grain.composition_deltas = composition
-        breaking = gc.remove_atoms(grain, surface_atoms, vertices)
-        composition = grain.composition_deltas.values.tolist()[0]
-        self.assertTrue(composition == [1, 0, 0])
-        self.assertTrue(breaking)
-        self.assertTrue(np.sum(grain.surface_atoms['removed']) == 8)
+        unitcell = UnitCell([Atom('Fe', 0, 0, 0)], [2, 0, 0], [0, 2, 0],
+                            [0, 0, 2])
+        supercell = SuperCell(unitcell, 4, 4, 4)
+        supercell.set_cartesian()
+        distances = gc.bond_shells(supercell, 2)
+        self.assertTrue(np.allclose(distances, [2, np.sqrt(8)]))
+        scores, neighbours = gc.bond_scores(
+            supercell.cartesian['coordinates'], distances[:1], [1])
+        fractional = supercell.fractional['coordinates']
+        outside = np.sum((fractional == 0) | (fractional == 3), axis=1)
+        self.assertTrue(np.all(scores == 6 - outside))
+        corner = np.flatnonzero(outside == 3)[0]
+        before = scores.copy()
+        gc.lower_scores(scores, neighbours, np.array([corner]))
+        self.assertEqual(np.sum(before - scores), 3)
+        self.assertTrue(np.all(scores[neighbours[1][
+            neighbours[0][corner]:neighbours[0][corner+1]]] == 3))
 
-    def test_update_supercell(self):
+    def test_remove_surface_atoms_weakest_first(self):
         '''
-        Does the function correctly transfer a change in the surface atoms of
-        the grain to its supercell?
+        Are the corners of a cube removed first, then the atoms bared by
+        their removal, and are the surface and removed atoms recorded?
         '''
-        test_basis = [Atom('Fe', 0, 0, 0), Atom('Pt', 0.5, 0.5, 0.5),
-                      Atom('Zn', 0.1, 0.4, 0.5)]
-        unitcell = UnitCell(test_basis, [3, 0, 0], [0, 3, 0], [0, 0, 3])
-        cuts = [Cut('p', [0, 0, 0.5], plane=[0, 0, 1])]
-        repeat_ratio = [1, 1, 1]
-        grain = gc.Grain('test', unitcell, cuts, repeat_ratio)
-        gc.build_grain(grain, 10)
-        gc.get_surface_atoms(grain)
-        grain.surface_atoms[4]['removed'] = True
-        index = grain.surface_atoms[4]['index']
-        previous_atom = grain.supercell.fractional[index]
-        gc.update_supercell(grain)
-        self.assertFalse(grain.supercell.fractional[index] == previous_atom)
+        unitcell = UnitCell([Atom('Fe', 0, 0, 0)], [2, 0, 0], [0, 2, 0],
+                            [0, 0, 2])
+        grain = gc.Grain('cube', unitcell, [], [1, 1, 1])
+        grain.supercell = SuperCell(unitcell, 4, 4, 4)
+        before = grain.supercell.fractional['coordinates']
+        outside = np.sum((before == 0) | (before == 3), axis=1)
+        grain.best_composition = pd.DataFrame(
+            np.array([(56,)], dtype=[('Fe', 'i8')]), index=[0])
+        gc.remove_surface_atoms(grain)
+        fractional = grain.supercell.fractional['coordinates']
+        self.assertEqual(fractional.shape[0], 56)
+        removed = grain.surface_atoms['index'][grain.surface_atoms['removed']]
+        self.assertTrue(np.all(np.sort(removed)
+                               == np.flatnonzero(outside == 3)))
+        self.assertTrue(np.all(np.sort(grain.surface_atoms['index'])
+                               == np.flatnonzero(outside > 0)))
+        # The 48 atoms after the corners are the edges and faces they bared,
+        # leaving the 8 bulk atoms.
+        grain.supercell = SuperCell(unitcell, 4, 4, 4)
+        grain.best_composition = pd.DataFrame(
+            np.array([(8,)], dtype=[('Fe', 'i8')]), index=[0])
+        gc.remove_surface_atoms(grain)
+        removed = grain.surface_atoms['index'][grain.surface_atoms['removed']]
+        self.assertTrue(np.all(np.sort(removed)
+                               == np.flatnonzero(outside > 0)))
+        fractional = grain.supercell.fractional['coordinates']
+        self.assertTrue(np.all((fractional == 1) | (fractional == 2)))
+        grain.best_composition = pd.DataFrame(
+            np.array([(60,)], dtype=[('Fe', 'i8')]), index=[0])
+        self.assertRaises(ValueError, gc.remove_surface_atoms, grain)
 
 
 
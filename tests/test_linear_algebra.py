@@ -421,6 +421,18 @@ class TestLinearAlgebra(unittest.TestCase):
                 np.all(expected_grouped_normals[index] ==
                        grouped_normals[index]))
 
+    def test_match_rows_exact(self):
+        '''
+        Does match rows exact find the rows of an array which are exactly
+        equal to a row of the match array?
+        '''
+        match_rows = np.array([[0, 1, 1, 1], [0, 2, 2, 2]])
+        rows = np.array([[0, 1, 1, 1], [0, 1, 2, 2], [0, 2, 2, 2],
+                         [0, 1, 1, 1.0000001]])
+        matches = linalg.match_rows_exact(rows, match_rows)
+        expected_matches = [True, False, True, False]
+        self.assertTrue(expected_matches == matches.tolist())
+
 
 if __name__ == '__main__':
     current_directory = os.getcwd()
@@ -0,0 +1,68 @@
+import unittest
+import os
+import sys
+import numpy as np
+
+
+class TestOrdering(unittest.TestCase):
+
+    def test_morton_keys(self):
+        '''
+        Do morton keys interleave the binned coordinate bits with x as the
+        most significant?
+        '''
+        points = np.array([[0, 0, 0], [1, 0, 0], [0, 1, 0], [0, 0, 1],
+                           [1, 1, 1]])
+        keys = ordering.morton_keys(points, bits=1)
+        self.assertTrue(keys.tolist() == [0, 4, 2, 1, 7])
+        points = np.array([[3, 0, 0], [0, 3, 3]])
+        keys = ordering.morton_keys(points, bits=2)
+        self.assertTrue(keys.tolist() == [36, 27])
+
+    def test_hilbert_keys_visit_every_cell_once_in_adjacent_steps(self):
+        '''
+        On a full grid do hilbert keys form a permutation in which every step
+        moves to a neighbouring cell?
+        '''
+        for bits in [1, 2, 3]:
+            side = 2**bits
+            grid = np.indices((side, side, side)).reshape(3, -1).T
+            keys = ordering.hilbert_keys(grid, bits)
+            self.assertTrue(np.all(np.sort(keys) == np.arange(side**3)))
+            path = grid[np.argsort(keys)]
+            steps = np.sum(np.abs(np.diff(path, axis=0)), axis=1)
+            self.assertTrue(np.all(steps == 1))
+
+    def test_curve_order(self):
+        '''
+        Does curve order return a permutation for both curves, and reject
+        unknown curves?
+        '''
+        points = np.random.default_rng(3).uniform(0, 50, (1000, 3))
+        for curve in ['hilbert', 'morton']:
+            order = ordering.curve_order(points, curve)
+            self.assertTrue(np.all(np.sort(order) == np.arange(1000)))
+        self.assertRaisesRegex(ValueError, "Unknown curve: 'peano'.",
+                               ordering.curve_order, points, 'peano')
+        self.assertRaises(ValueError, ordering.curve_order, points,
+                          'hilbert', 30)
+
+    def test_order_atom_list(self):
+        '''
+        Does ordering an interface style atom list keep every atom intact?
+        '''
+        atom_list = [['Fe', 0.0, 0.0, 5.0], ['Pt', 0.0, 0.0, 0.0],
+                     ['Fe', 0.0, 0.0, 1.0], ['Pt', 0.0, 0.0, 4.0]]
+        ordered = ordering.order_atom_list(atom_list)
+        self.assertTrue(ordered == [atom_list[1], atom_list[2],
+                                    atom_list[3], atom_list[0]])
+        self.assertTrue(ordering.order_atom_list([]) == [])
+
+
+if __name__ == '__main__':
+    current_directory = os.getcwd()
+    package_directory_index = current_directory.index('grain_modeller')
+    package_directory = current_directory[:package_directory_index+14]
+    sys.path.append(package_directory+'/grain_modeller')
+    import ordering
+    unittest.main()
@@ -0,0 +1,78 @@
+import unittest
+import os
+import sys
+import warnings
+import numpy as np
+
+
+class TestPacking(unittest.TestCase):
+
+    def setUp(self):
+        self.addCleanup(test_tool.isolate_cache())
+        unitcell = UnitCell([Atom('Fe', 0, 0, 0), Atom('Pt', 0.5, 0.5, 0.5)],
+                            [2.5, 0, 0], [0, 2.5, 0], [0, 0, 2.5])
+        cuts = [Cut('s', [0.5, 0.5, 0.5], radius=0.45, out=False)]
+        self.sphere = gc.Grain('sphere', unitcell, cuts, [1, 1, 1])
+        gc.build_grain(self.sphere, 4)
+        cuts = [Cut('p', [0.5, 0.5, 0.5], plane=[1, 1, 1])]
+        self.wedge = gc.Grain('wedge', unitcell, cuts, [1, 1, 1])
+        gc.build_grain(self.wedge, 3)
+
+    def test_pack_grains_keeps_clearance(self):
+        '''
+        Are grains placed without any atoms of different grains closer than
+        the clearance, across periodic boundaries too?
+        '''
+        box = [60, 60, 60]
+        packed, sources = packing.pack_grains(
+            [self.sphere, self.wedge], box, number=40, clearance=2, seed=4)
+        self.assertEqual(packed.seeds.shape[0], 40)
+        self.assertTrue(np.all(sources == np.arange(40) % 2))
+        firsts, seconds, distances = ce.close_pairs(
+            packed.coordinates, 2, box=box)
+        self.assertTrue(np.all(
+            packed.grain_ids[firsts] == packed.grain_ids[seconds]))
+        self.assertTrue(np.all(packed.coordinates < box))
+        sizes = np.bincount(packed.grain_ids)
+        expected = [self.sphere.supercell.fractional.shape[0],
+                    self.wedge.supercell.fractional.shape[0]]
+        self.assertTrue(np.all(sizes == np.array(expected)[sources]))
+        again, sources = packing.pack_grains(
+            [self.sphere, self.wedge], box, number=40, clearance=2, seed=4)
+        self.assertTrue(np.all(again.coordinates == packed.coordinates))
+
+    def test_pack_grains_to_packing_fraction(self):
+        '''
+        Does packing stop at the target fraction, keep grains inside an open
+        box, and warn when the target cannot be reached?
+        '''
+        box = [40, 40, 40]
+        template = packing.GrainTemplate(self.sphere)
+        packed, sources = packing.pack_grains(
+            self.sphere, box, packing_fraction=0.1, periodic=False, seed=1)
+        fraction = packed.seeds.shape[0]*template.volume/np.prod(box)
+        self.assertTrue(0.1 <= fraction < 0.1 + template.volume/np.prod(box))
+        self.assertTrue(np.all(packed.coordinates > 0))
+        self.assertTrue(np.all(packed.coordinates < 40))
+        with warnings.catch_warnings(record=True) as caught:
+            warnings.simplefilter('always')
+            packing.pack_grains(self.sphere, [15, 15, 15], number=5,
+                                max_attempts=50, seed=1)
+        self.assertEqual(len(caught), 1)
+        with self.assertRaises(ValueError):
+            packing.pack_grains(self.sphere, box)
+
+
+if __name__ == '__main__':
+    current_directory = os.getcwd()
+    package_directory_index = current_directory.index('grain_modeller')
+    package_directory = current_directory[:package_directory_index+14]
+    sys.path.append(package_directory+'/grain_modeller')
+    from atom import Atom
+    from unitcell import UnitCell
+    from edits import Cut
+    import grain_creation as gc
+    import cartesian_edits as ce
+    import packing
+    import testing_tools as test_tool
+    unittest.main()
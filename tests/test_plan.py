@@ -0,0 +1,167 @@
+import unittest
+import os
+import sys
+import tempfile
+import numpy as np
+
+
+class TestPlan(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(test_tool.isolate_cache(self.directory.name))
+        basis = [Atom('Fe', 0.0, 0.0, 0.0), Atom('Fe', 0.5, 0.5, 0.0),
+                 Atom('Pt', 0.5, 0.0, 0.5), Atom('Pt', 0.0, 0.5, 0.5)]
+        self.unitcell = UnitCell(basis, [3, 0, 0], [0, 3, 0], [0, 0, 3.7])
+        self.cuts = [Cut('p', [0, 0, 3.5], plane=[0, 0, 1]),
+                     Cut('s', [0, 0, 0], radius=2),
+                     Cut('cp', [9, 0, 0], plane=[1, 0, 0])]
+        self.rotation = linalg.rotation_matrix('z', 0.3)
+        self.templates = '../grain_modeller/file_templates'
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def imperative(self):
+        supercell = SuperCell(self.unitcell, 5, 5, 5)
+        for cut in self.cuts:
+            edits.make_cut(supercell, cut)
+        transforms.rotate(supercell, self.rotation)
+        transforms.translate(supercell, [0.5, 0, 0])
+        transforms.translate(supercell, [0, 0, 2], 'cartesian')
+        supercell.randomise([0.25, 0.75], seed=3)
+        supercell.set_cartesian()
+        return supercell
+
+    def recipe(self):
+        plan = plan_module.Plan(self.unitcell, 5, 5, 5)
+        plan.cut(*self.cuts[:2]).cut(self.cuts[2]).rotate(self.rotation)
+        plan.translate([0.5, 0, 0]).transform(vector=[0, 0, 2])
+        return plan.randomise([0.25, 0.75], seed=3)
+
+    def test_optimise(self):
+        '''
+        Are adjacent cuts and transforms fused, and randomising fused with a
+        following write?
+        '''
+        plan = self.recipe()
+        self.assertEqual([step.operation for step in plan.optimise()],
+                         ['lattice', 'cut', 'transform', 'randomise'])
+        self.assertTrue(len(plan.optimise()[1].arguments['cuts']) == 3)
+        plan.write('grain.data', 'LAMMPS_data_file').sort()
+        self.assertEqual([step.operation for step in plan.optimise()],
+                         ['lattice', 'cut', 'transform', 'randomise_write',
+                          'sort'])
+        self.assertTrue(plan.steps[-1].operation == 'sort')
+
+    def test_execute_matches_imperative(self):
+        '''
+        Does a fused plan build the same supercell as the separate calls,
+        caching only the final structure, and the same again from the cache?
+        '''
+        expected = self.imperative()
+        built = self.recipe().execute()
+        built.set_cartesian()
+        self.assertTrue(np.all(built.fractional['element']
+                               == expected.fractional['element']))
+        self.assertTrue(np.allclose(built.fractional['coordinates'],
+                                    expected.fractional['coordinates']))
+        self.assertTrue(np.allclose(built.cartesian['coordinates'],
+                                    expected.cartesian['coordinates']))
+        self.assertTrue(np.allclose(built.vector_space,
+                                    expected.vector_space))
+        plan_keys = [key for key in cache.CACHE.memory
+                     if key.startswith('plan')]
+        self.assertEqual(plan_keys, [self.recipe().keys(
+            self.recipe().optimise())[-1]])
+        cache.CACHE.clear(disk=False)
+        again = self.recipe().execute()
+        self.assertTrue(np.all(again.fractional == built.fractional))
+        self.assertTrue(again.vector_space.tolist()
+                        == built.vector_space.tolist())
+        uncached = self.recipe().execute(use_cache=False)
+        self.assertTrue(np.all(uncached.fractional == built.fractional))
+
+    def test_execute_cache_settings(self):
+        '''
+        Do plans without the cache store nothing, plans without the disk
+        tier store only in memory, and plans by default follow the cache?
+        '''
+        plan = self.recipe()
+        self.assertIsNone(plan.disk)
+        plan.use_cache = False
+        plan.execute()
+        self.assertEqual(os.listdir(self.directory.name), [])
+        self.assertFalse(any(key.startswith('plan')
+                             for key in cache.CACHE.memory))
+        plan.disk = False
+        plan.execute(use_cache=True)
+        self.assertEqual(os.listdir(self.directory.name), [])
+        self.assertEqual(len([key for key in cache.CACHE.memory
+                              if key.startswith('plan')]), 1)
+        unseeded = plan_module.Plan(self.unitcell, 2, 2, 2).cut(
+            self.cuts[0]).randomise([0.5, 0.5])
+        unseeded.execute()
+        self.assertEqual(len(os.listdir(self.directory.name)), 1)
+
+    def test_fuse_transforms(self):
+        '''
+        Is the fused affine the same as composing each transform in turn?
+        '''
+        moves = [(self.rotation, [0.5, 0, 0], 'fractional'),
+                 (None, [0, 1, 2], 'cartesian'),
+                 (np.diag([1, 1.1, 1]), [0, 0.25, 0], 'fractional')]
+        supercell = SuperCell(self.unitcell, 2, 2, 2)
+        affine = plan_module.fuse_transforms(moves, supercell.vector_space)
+        for matrix, vector, coordinates in moves:
+            supercell.transform(matrix, vector, coordinates)
+        self.assertTrue(np.allclose(affine, supercell.pending_transform))
+
+    def test_stream_write(self):
+        '''
+        Does the streamed write give the file format_file gives, with the
+        randomised elements of a fused step, written in chunks, and is the
+        seeded randomised structure cached, still written when resumed?
+        '''
+        file_name = os.path.join(self.directory.name, 'grain.data')
+        plan = plan_module.Plan(self.unitcell, 3, 3, 3).cut(self.cuts[0])
+        plan.randomise([0.5, 0.5], seed=1).write(
+            file_name, 'LAMMPS_data_file', self.templates, chunk_size=7)
+        supercell = plan.execute()
+        with open(file_name, 'r') as file:
+            written = file.read()
+        expected = ff.format_file(supercell, 'LAMMPS_data_file',
+                                  self.templates)
+        self.assertEqual(written, expected)
+        self.assertTrue(np.all(supercell.cartesian['element']
+                               == supercell.fractional['element']))
+        randomised = plan_module.Plan(self.unitcell, 3, 3, 3).cut(
+            self.cuts[0]).randomise([0.5, 0.5], seed=1)
+        key = randomised.keys(randomised.optimise())[-1]
+        self.assertTrue(key in cache.CACHE.memory)
+        self.assertTrue(np.all(randomised.execute().fractional
+                               == supercell.fractional))
+        os.remove(file_name)
+        self.assertTrue(np.all(plan.execute().fractional
+                               == supercell.fractional))
+        with open(file_name, 'r') as file:
+            self.assertEqual(file.read(), expected)
+
+
+if __name__ == '__main__':
+    current_directory = os.getcwd()
+    package_directory_index = current_directory.index('grain_modeller')
+    package_directory = current_directory[:package_directory_index+14]
+    sys.path.append(package_directory+'/grain_modeller')
+    import plan as plan_module
+    import cache
+    import testing_tools as test_tool
+    import edits
+    import transforms
+    import linear_algebra as linalg
+    import file_formatter as ff
+    from atom import Atom
+    from unitcell import UnitCell
+    from supercell import SuperCell
+    from edits import Cut
+    unittest.main()
@@ -0,0 +1,113 @@
+import unittest
+import os
+import sys
+import tempfile
+import numpy as np
+from scipy import spatial
+
+
+class TestPolycrystal(unittest.TestCase):
+
+    def setUp(self):
+        test_basis = [Atom('Fe', 0, 0, 0), Atom('Fe', 0.5, 0.5, 0.5)]
+        self.unitcell = UnitCell(
+            test_basis, [2.87, 0, 0], [0, 2.87, 0], [0, 0, 2.87])
+        self.box = [30, 25, 20]
+
+    def test_voronoi_cells(self):
+        '''
+        Are all points of a periodic Voronoi cell within its radius, and do
+        its faces select exactly the points whose nearest seed it is, also
+        for a few seeds in an elongated box?
+        '''
+        rng = np.random.default_rng(0)
+        for box, number in [(self.box, 12), ([60, 4, 5], 2)]:
+            box = np.array(box)
+            seeds = rng.uniform(0, 1, (number, 3))*box
+            radii, cells = polycrystal.voronoi_cells(seeds, box)
+            points = rng.uniform(0, 1, (200000, 3))*box
+            tree = spatial.cKDTree(seeds, boxsize=box)
+            distances, indexes = tree.query(points)
+            furthest = np.zeros(number)
+            np.maximum.at(furthest, indexes, distances)
+            self.assertTrue(np.all(furthest <= radii))
+            for index, (normals, offsets, ties) in enumerate(cells):
+                self.assertTrue(np.allclose(np.linalg.norm(normals, axis=1),
+                                            1))
+                separations = points - seeds[index]
+                separations -= np.around(separations/box)*box
+                inside = np.all(separations @ normals.T < offsets, axis=1)
+                self.assertTrue(np.all(inside == (indexes == index)))
+
+    def test_build_polycrystal(self):
+        '''
+        Does every atom belong to the grain of its nearest seed, with no atoms
+        clashing across boundaries and the bulk density preserved?
+        '''
+        crystal = polycrystal.build_polycrystal(
+            self.unitcell, self.box, number=6, seed=3)
+        self.assertEqual(crystal.seeds.shape, (6, 3))
+        self.assertEqual(crystal.orientations.shape, (6, 3, 3))
+        self.assertTrue(set(np.unique(crystal.grain_ids)) == set(range(6)))
+        tree = spatial.cKDTree(crystal.seeds, boxsize=self.box)
+        self.assertTrue(np.all(
+            tree.query(crystal.coordinates)[1] == crystal.grain_ids))
+        self.assertTrue(np.all(crystal.coordinates >= 0))
+        self.assertTrue(np.all(crystal.coordinates < self.box))
+        nearest = 2.87*np.sqrt(3)/2
+        pairs = ce.close_pairs(crystal.coordinates, 0.6*nearest,
+                               box=self.box)
+        self.assertEqual(pairs[0].shape[0], 0)
+        full = polycrystal.build_polycrystal(
+            self.unitcell, self.box, number=6, seed=3, overlap=0)
+        expected = 2*np.prod(self.box)/2.87**3
+        self.assertTrue(0.99 < full.number_of_atoms/expected < 1.01)
+        self.assertTrue(full.number_of_atoms > crystal.number_of_atoms)
+        parallel = polycrystal.build_polycrystal(
+            self.unitcell, self.box, number=6, seed=3, processes=2,
+            chunk_size=1000)
+        self.assertTrue(np.all(parallel.coordinates == crystal.coordinates))
+        with self.assertRaises(ValueError):
+            polycrystal.build_polycrystal(self.unitcell, self.box)
+
+    def test_seed_file_and_writing(self):
+        '''
+        Are seeds and euler angles read from a seed file, and can the
+        polycrystal be written as a LAMMPS data file?
+        '''
+        with tempfile.TemporaryDirectory() as folder:
+            file_name = folder+'/seeds.txt'
+            with open(file_name, 'w') as file:
+                file.write('5 5 5 0 0 0\n20 15 12 90 0 0\n')
+            crystal = polycrystal.build_polycrystal(
+                self.unitcell, self.box, seeds=file_name, seed=1)
+        self.assertTrue(np.allclose(crystal.orientations[0], np.identity(3)))
+        self.assertTrue(np.allclose(
+            crystal.orientations[1], [[0, -1, 0], [1, 0, 0], [0, 0, 1]]))
+        text = ff.format_file(crystal, 'LAMMPS_data_file',
+                              '../grain_modeller/file_templates')
+        self.assertIn(f'{crystal.number_of_atoms} atoms', text)
+        self.assertIn('0 30.0 xlo xhi', text)
+        self.assertIn('\n1 1 ', text)
+        # Lattice sites on shared faces are claimed by one grain only.
+        with tempfile.TemporaryDirectory() as folder:
+            file_name = folder+'/seeds.txt'
+            with open(file_name, 'w') as file:
+                file.write('0 0 0 0 0 0\n15 0 0 0 0 0\n')
+            crystal = polycrystal.build_polycrystal(
+                self.unitcell, [28.7, 28.7, 28.7], seeds=file_name, overlap=0)
+        self.assertEqual(crystal.number_of_atoms, 2000)
+
+
+
+if __name__ == '__main__':
+    current_directory = os.getcwd()
+    package_directory_index = current_directory.index('grain_modeller')
+    package_directory = current_directory[:package_directory_index+14]
+    sys.path.append(package_directory+'/grain_modeller')
+    from atom import Atom
+    from unitcell import UnitCell
+    import polycrystal
+    import cartesian_edits as ce
+    import file_formatter as ff
+    unittest.main()
@@ -0,0 +1,71 @@
+import unittest
+import os
+import sys
+import numpy as np
+
+
+class TestRandomise(unittest.TestCase):
+
+    def test_exact_counts(self):
+        '''
+        Do exact counts add up to the number of sites, giving the left over
+        sites to the largest remainders?
+        '''
+        counts = randomise.exact_counts([1/3, 1/3, 1/3], 10)
+        self.assertTrue(counts.tolist() == [4, 3, 3])
+        counts = randomise.exact_counts([0.25, 0.75], 7)
+        self.assertTrue(counts.tolist() == [2, 5])
+        self.assertRaises(ValueError, randomise.exact_counts, [0.5, 0.6], 10)
+
+    def test_random_types_modes(self):
+        '''
+        Does the exact mode give exact counts in an unbiased order, and the
+        probabilistic mode the ratios on average, both reproducible from a
+        seed?
+        '''
+        types = randomise.random_types(1001, [0.2, 0.3, 0.5], 'exact', 3)
+        self.assertTrue(np.bincount(types).tolist() == [200, 300, 501])
+        self.assertTrue(np.array_equal(
+            types, randomise.random_types(1001, [0.2, 0.3, 0.5], 'exact', 3)))
+        totals = np.zeros(4)
+        for seed in range(4000):
+            totals += randomise.random_types(4, [0.5, 0.5], 'exact', seed)
+        self.assertTrue(np.allclose(totals/4000, 0.5, atol=0.03))
+        types = randomise.random_types(100000, [0.2, 0.8], seed=3)
+        self.assertTrue(np.isclose(np.mean(types), 0.8, atol=0.01))
+        self.assertRaisesRegex(
+            ValueError, "Unknown randomisation mode: 'other'.",
+            randomise.random_types, 10, [0.5, 0.5], mode='other')
+
+    def test_randomise_elements_sublattice(self):
+        '''
+        Are only the sites of the sublattice randomised, over the given
+        species?
+        '''
+        elements = np.array(['Fe', 'Pt']*500)
+        randomised = randomise.randomise_elements(
+            elements, [0.5, 0.5], species=['Cu', 'Pt'], mode='exact',
+            seed=1, sublattice='Pt')
+        self.assertTrue(np.all(randomised[::2] == 'Fe'))
+        self.assertEqual(np.sum(randomised == 'Cu'), 250)
+        self.assertTrue(np.all(elements[1::2] == 'Pt'))
+        self.assertRaises(ValueError, randomise.randomise_elements,
+                          elements, [0.2, 0.3, 0.5])
+
+    def test_spawn_generators(self):
+        '''
+        Are spawned generators reproducible and independent of each other?
+        '''
+        first = [rng.random(5) for rng in randomise.spawn_generators(7, 3)]
+        second = [rng.random(5) for rng in randomise.spawn_generators(7, 3)]
+        self.assertTrue(np.array_equal(first, second))
+        self.assertFalse(np.array_equal(first[0], first[1]))
+
+
+if __name__ == '__main__':
+    current_directory = os.getcwd()
+    package_directory_index = current_directory.index('grain_modeller')
+    package_directory = current_directory[:package_directory_index+14]
+    sys.path.append(package_directory+'/grain_modeller')
+    import randomise
+    unittest.main()
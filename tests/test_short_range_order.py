@@ -0,0 +1,110 @@
+import unittest
+import os
+import sys
+import numpy as np
+
+
+class TestShortRangeOrder(unittest.TestCase):
+
+    def l10(self, repeats):
+        basis = [Atom('Fe', 0.0, 0.0, 0.0), Atom('Fe', 0.5, 0.5, 0.0),
+                 Atom('Pt', 0.5, 0.0, 0.5), Atom('Pt', 0.0, 0.5, 0.5)]
+        unitcell = UnitCell(basis, [4, 0, 0], [0, 4, 0], [0, 0, 4])
+        supercell = SuperCell(unitcell, repeats, repeats, repeats)
+        supercell.set_cartesian()
+        return supercell
+
+    def test_neighbour_shells(self):
+        '''
+        Does every atom of a periodic FCC crystal have 12 first and 6 second
+        shell neighbours at the right distances?
+        '''
+        supercell = self.l10(4)
+        neighbours, shell_ids, distances = sro.neighbour_shells(
+            supercell.cartesian['coordinates'], 2, [16, 16, 16])
+        self.assertTrue(np.allclose(distances, [np.sqrt(8), 4]))
+        self.assertEqual(neighbours.shape, (256, 18))
+        self.assertTrue(np.all(np.sum(shell_ids == 0, axis=1) == 12))
+        self.assertTrue(np.all(np.sum(shell_ids == 1, axis=1) == 6))
+        self.assertTrue(np.all(neighbours >= 0))
+
+    def test_warren_cowley_of_ordered_alloy(self):
+        '''
+        Are the Warren-Cowley parameters of L1_0 FePt -1/3 for unlike first
+        neighbours and 1 for unlike second neighbours?
+        '''
+        supercell = self.l10(4)
+        neighbours, shell_ids = sro.neighbour_shells(
+            supercell.cartesian['coordinates'], 2, [16, 16, 16])[:2]
+        types = np.unique(supercell.cartesian['element'],
+                          return_inverse=True)[1]
+        alpha = sro.warren_cowley(types, neighbours, shell_ids)
+        self.assertTrue(np.allclose(alpha[:, 0, 1], [-1/3, 1]))
+        self.assertTrue(np.allclose(alpha[:, 1, 0], [-1/3, 1]))
+        self.assertTrue(np.allclose(alpha[:, 0, 0], [1/3, -1]))
+
+    def test_colour_sites(self):
+        '''
+        Are no two neighbouring sites given the same colour?
+        '''
+        supercell = self.l10(4)
+        neighbours = sro.neighbour_shells(
+            supercell.cartesian['coordinates'], 2, [16, 16, 16])[0]
+        colours = sro.colour_sites(neighbours, seed=0)
+        self.assertTrue(np.all(colours >= 0))
+        self.assertFalse(np.any(colours[neighbours] == colours[:, None]))
+
+    def test_order_supercell_reaches_target(self):
+        '''
+        Does swap Monte Carlo drive a random alloy to the target parameters,
+        keeping the composition, with the tracked pair counts matching a
+        fresh count?
+        '''
+        supercell = self.l10(8)
+        supercell.randomise([0.5, 0.5], 'exact', seed=1)
+        box = [32, 32, 32]
+        neighbour_list = sro.neighbour_shells(
+            supercell.cartesian['coordinates'], 2, box)
+        alpha = sro.order_supercell(supercell, [-0.15, 0.1], steps=2000,
+                                    seed=2, neighbour_list=neighbour_list)
+        self.assertTrue(np.allclose(alpha[:, 0, 1], [-0.15, 0.1], atol=0.01))
+        elements = supercell.fractional['element']
+        self.assertEqual(np.sum(elements == 'Fe'), 1024)
+        supercell.set_cartesian()
+        types = np.unique(supercell.cartesian['element'],
+                          return_inverse=True)[1]
+        fresh = sro.warren_cowley(types, *neighbour_list[:2])
+        self.assertTrue(np.allclose(alpha, fresh))
+        self.assertRaises(ValueError, sro.target_array, [[0.1]], 2, 2)
+
+    def test_order_supercell_never_worsens(self):
+        '''
+        At zero temperature, does the exact distance to the target never grow
+        from one step to the next, despite the linearised acceptance?
+        '''
+        neighbour_list = None
+        distances = []
+        for steps in [1, 2, 4, 8, 16, 32]:
+            supercell = self.l10(4)
+            supercell.randomise([0.5, 0.5], 'exact', seed=3)
+            if neighbour_list is None:
+                neighbour_list = sro.neighbour_shells(
+                    supercell.cartesian['coordinates'], 2, [16, 16, 16])
+            alpha = sro.order_supercell(supercell, [-0.3, 0.3], steps=steps,
+                                        seed=4, neighbour_list=neighbour_list)
+            distances.append(sro.sro_distance(
+                alpha, sro.target_array([-0.3, 0.3], 2, 2), np.ones(2)))
+        self.assertTrue(np.all(np.diff(distances) <= 1e-12))
+        self.assertTrue(distances[-1] < distances[0])
+
+
+if __name__ == '__main__':
+    current_directory = os.getcwd()
+    package_directory_index = current_directory.index('grain_modeller')
+    package_directory = current_directory[:package_directory_index+14]
+    sys.path.append(package_directory+'/grain_modeller')
+    from atom import Atom
+    from unitcell import UnitCell
+    from supercell import SuperCell
+    import short_range_order as sro
+    unittest.main()
@@ -0,0 +1,79 @@
+import unittest
+import os
+import sys
+import copy
+import numpy as np
+
+
+class TestStructureDiff(unittest.TestCase):
+
+    def setUp(self):
+        unitcell = UnitCell([Atom('Fe', 0, 0, 0), Atom('Pt', 0.5, 0.5, 0.5)],
+                            [3, 0, 0], [0, 3, 0], [0, 0, 3])
+        self.supercell = SuperCell(unitcell, 5, 5, 5)
+        self.supercell.set_cartesian()
+
+    def test_diff_finds_every_change(self):
+        '''
+        Are removed, added, moved, and type changed atoms reported, with the
+        displacements of the moved atoms?
+        '''
+        atoms = self.supercell.cartesian
+        changed = atoms.copy()
+        changed['coordinates'][10] += [0.1, 0, 0]
+        changed['element'][20] = 'Cu'
+        added = np.zeros(1, dtype=atoms.dtype)
+        added['element'] = 'C'
+        added['coordinates'] = [1.5, 1.5, 0]
+        changed = np.concatenate((np.delete(changed, [3, 40]), added))
+        changed = changed[::-1]
+        diff = structure_diff.diff_structures(
+            self.supercell, (changed['element'], changed['coordinates']))
+        self.assertTrue(diff.removed.tolist() == [3, 40])
+        self.assertTrue(diff.added.tolist() == [0])
+        self.assertTrue(diff.moved.tolist() == [10])
+        self.assertTrue(np.allclose(diff.displacements, [[0.1, 0, 0]]))
+        self.assertTrue(diff.type_changed.tolist() == [20])
+        self.assertEqual(changed['element'][diff.matches[20]], 'Cu')
+        self.assertFalse(diff.identical)
+        same = copy.deepcopy(self.supercell)
+        self.assertTrue(structure_diff.diff_structures(
+            self.supercell, same, chunk_size=7).identical)
+
+    def test_diff_periodic_and_shared_matches(self):
+        '''
+        Are atoms moved across a periodic boundary matched to their images,
+        and is an atom after matched to only the closest atom before, the
+        others matching their next closest?
+        '''
+        coordinates = np.array([[0.05, 1, 1], [5, 5, 5], [5.3, 5, 5]])
+        elements = np.array(['Fe', 'Fe', 'Fe'])
+        moved = np.array([[9.95, 1, 1], [5.2, 5, 5]])
+        diff = structure_diff.diff_structures(
+            (elements, coordinates), (elements[:2], moved), tolerance=0.5,
+            box=[10, 10, 10])
+        self.assertTrue(diff.removed.tolist() == [1])
+        self.assertTrue(diff.matches.tolist() == [0, -1, 1])
+        self.assertTrue(np.allclose(diff.displacements,
+                                    [[-0.1, 0, 0], [-0.1, 0, 0]]))
+        # The atom losing the shared match is matched to the next closest.
+        moved = np.array([[9.95, 1, 1], [5.2, 5, 5], [5.45, 5, 5]])
+        diff = structure_diff.diff_structures(
+            (elements, coordinates), (elements, moved), tolerance=0.5,
+            box=[10, 10, 10])
+        self.assertTrue(diff.removed.tolist() == [])
+        self.assertTrue(diff.added.tolist() == [])
+        self.assertTrue(diff.matches.tolist() == [0, 2, 1])
+        self.assertTrue(diff.moved.tolist() == [0, 1, 2])
+
+
+if __name__ == '__main__':
+    current_directory = os.getcwd()
+    package_directory_index = current_directory.index('grain_modeller')
+    package_directory = current_directory[:package_directory_index+14]
+    sys.path.append(package_directory+'/grain_modeller')
+    from atom import Atom
+    from unitcell import UnitCell
+    from supercell import SuperCell
+    import structure_diff
+    unittest.main()
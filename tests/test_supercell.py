@@ -70,6 +70,21 @@ class TestSuperCell(unittest.TestCase):
         randomised_atoms = test_supercell.fractional['element']
         fe_ratio = np.sum(randomised_atoms == 'Fe')/randomised_atoms.shape[0]
         self.assertTrue(np.isclose(0.9, fe_ratio, rtol=0, atol=0.02))
+        test_supercell.randomise([0.3, 0.7], 'exact', seed=4)
+        randomised_atoms = test_supercell.fractional['element'].copy()
+        self.assertEqual(np.sum(randomised_atoms == 'Fe'), 1200)
+        test_supercell.randomise([0.3, 0.7], 'exact', seed=4)
+        self.assertTrue(np.array_equal(
+            randomised_atoms, test_supercell.fractional['element']))
+        test_supercell.fractional['element'] = atoms
+        test_supercell.set_cartesian()
+        test_supercell.randomise([0.5, 0.5], 'exact', sublattice='Pt',
+                                 species=['Cu', 'Pt'])
+        randomised_atoms = test_supercell.fractional['element']
+        self.assertTrue(np.all(randomised_atoms[atoms == 'Fe'] == 'Fe'))
+        self.assertEqual(np.sum(randomised_atoms == 'Cu'), 1000)
+        self.assertTrue(np.array_equal(
+            test_supercell.cartesian['element'], randomised_atoms))
 
     def test_set_cartesian(self):
         '''
@@ -132,17 +147,36 @@ class TestSuperCell(unittest.TestCase):
         self.assertTrue(
             np.all(np.isclose(expected_coordinates, coordinates, atol=1e-8)))
 
-
-
-
-
-
-
-
-
-
-
-
+    def test_spatial_sort(self):
+        '''
+        Does spatial sort reorder every per-atom column together, and improve
+        the locality of consecutive atoms?
+        '''
+        test_basis = [
+            Atom('Fe', 0.0, 0.0, 0.0), Atom('Fe', 0.5, 0.5, 0.0),
+            Atom('Pt', 0.5, 0.0, 0.5), Atom('Pt', 0.0, 0.5, 0.5)]
+        test_unitcell = UnitCell(
+            test_basis, [3.83, 0, 0], [0, 3.83, 0], [0, 0, 3.711])
+        test_supercell = SuperCell(test_unitcell, 12, 12, 12)
+        test_supercell.set_cartesian()
+        before = test_supercell.cartesian.copy()
+        order = test_supercell.spatial_sort()
+        self.assertTrue(np.all(test_supercell.cartesian == before[order]))
+        fractional = test_supercell.fractional.copy()
+        test_supercell.set_cartesian()
+        self.assertTrue(np.all(test_supercell.fractional == fractional))
+        self.assertTrue(np.allclose(test_supercell.cartesian['coordinates'],
+                                    before[order]['coordinates']))
+
+        def step(atoms):
+            steps = np.diff(atoms['coordinates'], axis=0)
+            return np.mean(np.linalg.norm(steps, axis=1))
+
+        self.assertTrue(step(test_supercell.cartesian) < step(before)/2)
+        # Sorting without cartesian coordinates leaves them unset.
+        test_supercell = SuperCell(test_unitcell, 4, 4, 4)
+        test_supercell.spatial_sort('morton')
+        self.assertTrue(test_supercell.cartesian is None)
 
 
 if __name__ == '__main__':
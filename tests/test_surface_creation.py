@@ -9,6 +9,7 @@ import unittest
 import os
 import sys
 import numpy as np
+from scipy import spatial
 import cProfile
 import pstats
 from pstats import SortKey
@@ -134,6 +135,56 @@ class TestSurfaceCreation(unittest.TestCase):
         self.assertTrue(np.around(np.min(atoms[:, 1]), 4) == -51.7685)
         self.assertTrue(np.around(np.max(atoms[:, 1]), 4) == 56.1524)
 
+    def test_oriented_unitcell(self):
+        '''
+        Does the oriented cell have a and b in the plane, c along its normal,
+        the smallest volume on the centred lattice, and replicate into a
+        perfect crystal?
+        '''
+        basis_list = [Atom('Cu', 0, 0, 0), Atom('Cu', 0.5, 0.5, 0),
+                      Atom('Cu', 0.5, 0, 0.5), Atom('Cu', 0, 0.5, 0.5)]
+        unitcell = UnitCell(basis_list, [3.6, 0, 0], [0, 3.6, 0], [0, 0, 3.6])
+        for plane, atoms in [((1, 1, 1), 3), ((1, 1, 0), 2),
+                             ((3, 2, 1), 14)]:
+            oriented = surface_creation.oriented_unitcell(unitcell, plane)
+            vector_space = oriented.vector_space
+            self.assertEqual(len(oriented.atoms), atoms)
+            self.assertTrue(np.allclose(vector_space[2, :2], 0))
+            self.assertTrue(np.allclose(vector_space[:2, 2], 0))
+            # One atom per primitive volume of the FCC lattice.
+            self.assertAlmostEqual(np.linalg.det(vector_space),
+                                   atoms*3.6**3/4, 6)
+            # The c vector spans the planes, a multiple of their spacing,
+            # which halves for mixed-parity indices of FCC.
+            spacing = 3.6/np.linalg.norm(plane)/2
+            layers = vector_space[2, 2]/spacing
+            self.assertAlmostEqual(layers, np.round(layers), 6)
+            supercell = SuperCell(oriented, 4, 4, 4)
+            supercell.set_cartesian()
+            coordinates = supercell.cartesian['coordinates']
+            centre = np.mean(coordinates, axis=0)
+            tree = spatial.cKDTree(coordinates)
+            inner = np.linalg.norm(coordinates - centre, axis=1) < 2
+            neighbours = tree.query_ball_point(
+                coordinates[inner], 3.6/np.sqrt(2) + 0.01)
+            self.assertTrue(all(len(near) == 13 for near in neighbours))
+            self.assertEqual(len(tree.query_pairs(3.6/np.sqrt(2) - 0.01)), 0)
+
+    def test_oriented_unitcell_tilted(self):
+        '''
+        Without a lattice vector along the normal, is c the shortest vector
+        spanning one interplanar spacing?
+        '''
+        basis_list = [Atom('Ti', 1/3, 2/3, 0.25), Atom('Ti', 2/3, 1/3, 0.75)]
+        unitcell = UnitCell(basis_list, [2.95, 0, 0], [-1.475, 2.555, 0],
+                            [0, 0, 4.68])
+        with self.assertWarns(UserWarning):
+            oriented = surface_creation.oriented_unitcell(unitcell, (1, 0, 1))
+        self.assertEqual(len(oriented.atoms), 2)
+        self.assertAlmostEqual(np.linalg.det(oriented.vector_space),
+                               np.linalg.det(unitcell.vector_space), 6)
+        self.assertTrue(np.allclose(oriented.vector_space[2, :2], 0))
+
     def test_select_working_volume_selects_the_correct_slab(self):
         '''
         Is the correct slab selected to be the volume which is fit to the
@@ -120,6 +120,7 @@ class TestTransfroms(unittest.TestCase):
         # True for simple cartesian move
         self.assertTrue(np.all(array == expected_array))
         transforms.translate(supercell, [1.5, 3, 1], coordinates='cartesian')
+        array = supercell.fractional
         expected_array = np.array(
             [('Fe', [1.75, 2.5, 1.5]), ('Pt', [2.25, 3.0, 2.0])],
             dtype=[('element', 'U10'), ('coordinates', 'f8', 3)])
@@ -137,6 +138,67 @@ class TestTransfroms(unittest.TestCase):
         # True for complex move with complex vector space and cartesian update
         self.assertTrue(np.all(array == expected_array))
 
+    def test_transforms_are_deferred_and_composed(self):
+        '''
+        Are chained transforms held as one pending affine, and applied once
+        to give the same atoms as applying them step by step?
+        '''
+        test_atoms = [Atom('Fe', 0, 0, 0), Atom('Pt', 0.5, 0.5, 0.5)]
+        unitcell = UnitCell(test_atoms, [2, 0, 0], [1, 2, 0], [1, 1, 2])
+        steps = [
+            lambda cell: transforms.rotate(
+                cell, linalg.rotation_matrix('z', 0.3)),
+            lambda cell: transforms.translate(cell, [0.5, 0, 1]),
+            lambda cell: transforms.strain(cell, [0.01, 0, -0.02]),
+            lambda cell: transforms.reflect(cell, [1, 1, 0], [1, 0, 0]),
+            lambda cell: transforms.translate(
+                cell, [1, 2, 3], coordinates='cartesian'),
+            lambda cell: transforms.rotate(
+                cell, linalg.rotation_matrix('x', -1.1))]
+        stepped = SuperCell(unitcell, 2, 2, 2)
+        stepped.set_cartesian()
+        for step in steps:
+            step(stepped)
+            stepped.apply_transform()
+        deferred = SuperCell(unitcell, 2, 2, 2)
+        deferred.set_cartesian()
+        original = deferred.cartesian['coordinates'].copy()
+        for step in steps:
+            step(deferred)
+        affine = deferred.pending_transform
+        self.assertIsNotNone(deferred._linear)
+        coordinates = deferred.cartesian['coordinates']
+        self.assertIsNone(deferred._linear)
+        self.assertTrue(np.allclose(
+            coordinates, stepped.cartesian['coordinates'], atol=1e-7))
+        self.assertTrue(np.allclose(
+            coordinates, original @ affine[:3, :3].T + affine[:3, 3],
+            atol=1e-7))
+        self.assertTrue(np.allclose(
+            deferred.a_side_vector, stepped.a_side_vector))
+
+    def test_reflect_strain_and_affine(self):
+        '''
+        Do reflect, strain, and affine move cartesian positions as expected?
+        '''
+        test_atoms = [Atom('Fe', 0, 0, 0), Atom('Pt', 0.5, 0.5, 0.5)]
+        unitcell = UnitCell(test_atoms, [2, 0, 0], [0, 2, 0], [0, 0, 2])
+        supercell = SuperCell(unitcell, 1, 1, 1)
+        transforms.reflect(supercell, [1, 0, 0], [3, 0, 0])
+        supercell.set_cartesian()
+        expected = np.array([[6, 0, 0], [5, 1, 1]])
+        self.assertTrue(np.allclose(
+            supercell.cartesian['coordinates'], expected))
+        transforms.strain(supercell, 0.5)
+        self.assertTrue(np.allclose(
+            supercell.cartesian['coordinates'], expected*1.5))
+        self.assertTrue(np.isclose(supercell.a_side_length, 3))
+        matrix = np.identity(4)
+        matrix[:3, 3] = [1, -1, 0]
+        transforms.affine(supercell, matrix)
+        self.assertTrue(np.allclose(
+            supercell.cartesian['coordinates'], expected*1.5+[1, -1, 0]))
+
 
 if __name__ == '__main__':
     current_directory = os.getcwd()